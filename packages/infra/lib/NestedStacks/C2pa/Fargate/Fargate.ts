@@ -6,6 +6,7 @@ import * as ecsPatterns from "aws-cdk-lib/aws-ecs-patterns";
 import * as ecs from "aws-cdk-lib/aws-ecs";
 import * as ec2 from "aws-cdk-lib/aws-ec2";
 import * as iam from "aws-cdk-lib/aws-iam";
+import * as logs from "aws-cdk-lib/aws-logs";
 import * as s3 from "aws-cdk-lib/aws-s3";
 
 import * as path from "path";
@@ -47,6 +48,13 @@ export class Fargate extends Construct {
       vpc,
     });
 
+    // The awslogs driver ships stdout as plain log events, so the EMF
+    // documents go to a CloudWatch agent sidecar that turns them into metrics
+    const metricsLogGroup = new logs.LogGroup(this, "Metrics", {
+      retention: logs.RetentionDays.ONE_MONTH,
+      removalPolicy: cdk.RemovalPolicy.DESTROY,
+    });
+
     const fastApi = new ecsPatterns.ApplicationLoadBalancedFargateService(
       this,
       "Fast API Service",
@@ -69,13 +77,39 @@ export class Fargate extends Construct {
           }),
           environment: {
             output_bucket: backendStorageBucket.bucketName,
+            input_bucket: uiStorageBucket.bucketName,
             certificate: certificate.secretName,
             private_key: private_key.secretName,
+            // Per-phase timings as CloudWatch metrics, sent to the agent sidecar
+            metrics_exporters: "emf",
+            metrics_emf_endpoint: "udp://127.0.0.1:25888",
+            metrics_log_group: metricsLogGroup.logGroupName,
           },
         },
         publicLoadBalancer: false,
       }
     );
+    fastApi.taskDefinition.addContainer("CloudWatchAgent", {
+      image: ecs.ContainerImage.fromRegistry(
+        "public.ecr.aws/cloudwatch-agent/cloudwatch-agent:latest"
+      ),
+      // Metrics are best effort: the service keeps running without the agent
+      essential: false,
+      memoryReservationMiB: 128,
+      environment: {
+        CW_CONFIG_CONTENT: JSON.stringify({
+          logs: { metrics_collected: { emf: {} } },
+        }),
+      },
+      logging: ecs.LogDrivers.awsLogs({ streamPrefix: "cloudwatch-agent" }),
+    });
+    metricsLogGroup.grantWrite(fastApi.taskDefinition.taskRole);
+    fastApi.taskDefinition.addToTaskRolePolicy(
+      new iam.PolicyStatement({
+        actions: ["logs:DescribeLogStreams"],
+        resources: [metricsLogGroup.logGroupArn],
+      })
+    );
     fastApi.taskDefinition.addToTaskRolePolicy(
       new iam.PolicyStatement({
         actions: ["secretsmanager:GetSecretValue"],
@@ -84,13 +118,27 @@ export class Fargate extends Construct {
     );
     fastApi.taskDefinition.addToTaskRolePolicy(
       new iam.PolicyStatement({
-        actions: ["s3:PutObject", "s3:GetObject"],
+        actions: [
+          "s3:PutObject",
+          "s3:GetObject",
+          // Streaming signs abort their upload to fall back to spooling
+          "s3:AbortMultipartUpload",
+        ],
         resources: [
           backendStorageBucket.bucketArn,
           `${backendStorageBucket.bucketArn}/*`,
         ],
       })
     );
+    // Without ListBucket a missing key is a 403 rather than a 404, and the
+    // service reads a missing fMP4 stream state as "no state yet" and a
+    // missing job as a 404
+    fastApi.taskDefinition.addToTaskRolePolicy(
+      new iam.PolicyStatement({
+        actions: ["s3:ListBucket"],
+        resources: [backendStorageBucket.bucketArn],
+      })
+    );
     uiStorageBucket.grantRead(fastApi.taskDefinition.taskRole);
     fastApi.taskDefinition.applyRemovalPolicy(cdk.RemovalPolicy.DESTROY);
     this.alb = fastApi.loadBalancer;
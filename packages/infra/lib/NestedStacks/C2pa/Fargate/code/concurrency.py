@@ -0,0 +1,58 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import functools
+import asyncio
+import os
+
+DEFAULT_POOL_SIZE = int(os.environ.get("blocking_pool_size", "32"))
+DEFAULT_ENDPOINT_LIMITS = {
+    "sign_file": int(os.environ.get("sign_file_concurrency", "4")),
+    "sign_batch": int(os.environ.get("sign_batch_concurrency", "1")),
+    "sign_fmp4": int(os.environ.get("sign_fmp4_concurrency", "2")),
+    "read_file": int(os.environ.get("read_file_concurrency", "16")),
+    "read_batch": int(os.environ.get("read_batch_concurrency", "16")),
+    "jobs": int(os.environ.get("jobs_concurrency", "8")),
+}
+
+
+class BlockingExecutor:
+    """
+    Runs blocking work (urllib, boto3 transfers, builder.sign, c2patool) on a
+    bounded thread pool so the event loop stays free for other requests and
+    health checks. Each endpoint has its own concurrency limit; requests over
+    the limit wait for a slot without holding a thread.
+    """
+
+    def __init__(self, max_workers=None, endpoint_limits=None):
+        self._max_workers = max_workers or DEFAULT_POOL_SIZE
+        self._limits = {**DEFAULT_ENDPOINT_LIMITS, **(endpoint_limits or {})}
+        self._pool = None
+        self._semaphores = {}
+
+    def start(self):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self._max_workers, thread_name_prefix="c2pa-blocking"
+            )
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def _semaphore(self, endpoint):
+        if endpoint not in self._semaphores:
+            limit = self._limits.get(endpoint, self._max_workers)
+            self._semaphores[endpoint] = asyncio.Semaphore(limit)
+        return self._semaphores[endpoint]
+
+    async def run(self, endpoint, fn, *args, **kwargs):
+        """
+        Run fn(*args, **kwargs) off the event loop under the endpoint's limit
+        """
+        self.start()
+        async with self._semaphore(endpoint):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._pool, functools.partial(fn, *args, **kwargs)
+            )
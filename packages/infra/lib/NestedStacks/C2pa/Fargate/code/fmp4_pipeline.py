@@ -0,0 +1,322 @@
+from concurrent.futures import ThreadPoolExecutor
+from transfer import TRANSFER_CONCURRENCY, download_object, upload_file, wait_all
+from fmp4_state import fragment_sequence
+from utils import run_c2pa_command_for_fmp4
+from xml.etree import ElementTree
+
+import threading
+import logging
+import shutil
+import copy
+import re
+import os
+
+logger = logging.getLogger(__name__)
+
+CHUNK_FRAGMENTS = int(os.environ.get("fmp4_chunk_fragments", "50"))
+WINDOW_CHUNKS = int(os.environ.get("fmp4_window_chunks", "3"))
+SIGN_WORKERS = int(os.environ.get("fmp4_sign_workers", "1"))
+
+
+class ChunkSigningError(Exception):
+    """
+    Raised when c2patool fails on one chunk of a pipelined run
+    """
+
+
+class ChunkedMpdError(Exception):
+    """
+    Raised when the MPD can't be split into one Period per chunk
+    """
+
+
+def chunk_init_name(init_filename, first, last):
+    """
+    Name of the signed init segment covering fragments first..last
+    """
+    stem, extension = os.path.splitext(init_filename)
+    return f"{stem}-{first}-{last}{extension}"
+
+
+_DURATION = re.compile(
+    r"P(?:(?P<D>[\d.]+)D)?"
+    r"(?:T(?:(?P<H>[\d.]+)H)?(?:(?P<M>[\d.]+)M)?(?:(?P<S>[\d.]+)S)?)?"
+)
+_UNIT_SECONDS = {"D": 86400, "H": 3600, "M": 60, "S": 1}
+
+
+def _seconds(duration):
+    match = _DURATION.fullmatch(duration)
+    if match is None:
+        raise ChunkedMpdError(f"Unsupported duration {duration}")
+    return sum(
+        float(value) * _UNIT_SECONDS[unit]
+        for unit, value in match.groupdict().items()
+        if value
+    )
+
+
+def _timeline(template, timeline):
+    """
+    (start, duration) of every segment, in timescale units, keyed by number
+    """
+    number = int(template.get("startNumber", "1"))
+    time = 0
+    segments = {}
+    for entry in timeline.iterfind("{*}S"):
+        time = int(entry.get("t", time))
+        duration = int(entry.get("d"))
+        repeat = int(entry.get("r", "0"))
+        if repeat < 0:
+            raise ChunkedMpdError("Open-ended SegmentTimeline repeats")
+        for _ in range(repeat + 1):
+            segments[number] = (time, duration)
+            number += 1
+            time += duration
+    return segments
+
+
+def chunked_mpd(mpd, bounds, init_filename):
+    """
+    Rewrite a static single-representation MPD into one Period per chunk,
+    so each chunk's segments reference the init segment signed with them.
+    bounds are the (first, last) fragment numbers of each chunk, in order.
+    """
+    root = ElementTree.fromstring(mpd)
+    if root.get("type", "static") != "static":
+        raise ChunkedMpdError("Only static (VOD) MPDs can be signed pipelined")
+    periods = root.findall("{*}Period")
+    representations = root.findall(".//{*}Representation")
+    if len(periods) != 1 or len(representations) != 1:
+        raise ChunkedMpdError(
+            "Pipelined signing needs an MPD with one Period and one "
+            "Representation; use ladder for multi-rendition presentations"
+        )
+    period = periods[0]
+    namespace = root.tag[: root.tag.find("}") + 1]
+    if namespace:
+        # Keep the DASH namespace as the default instead of an ns0: prefix
+        ElementTree.register_namespace("", namespace[1:-1])
+
+    def templates(period):
+        adaptation = next(
+            element
+            for element in period.iterfind("{*}AdaptationSet")
+            if element.find("{*}Representation") is not None
+        )
+        elements = [
+            element.find("{*}SegmentTemplate")
+            for element in (adaptation, adaptation.find("{*}Representation"))
+        ]
+        elements = [element for element in elements if element is not None]
+        if not elements:
+            raise ChunkedMpdError("The Representation has no SegmentTemplate")
+        return elements
+
+    # The innermost template wins, as in the DASH inheritance rules
+    merged = {}
+    timeline = None
+    for template in templates(period):
+        merged.update(template.attrib)
+        if template.find("{*}SegmentTimeline") is not None:
+            timeline = template.find("{*}SegmentTimeline")
+    timescale = int(merged.get("timescale", "1"))
+    start_number = int(merged.get("startNumber", "1"))
+    offset = int(merged.get("presentationTimeOffset", "0"))
+    segments = _timeline(merged, timeline) if timeline is not None else None
+    if segments is None and "duration" not in merged:
+        raise ChunkedMpdError("The SegmentTemplate has no duration or timeline")
+    period_start = _seconds(period.get("start", "PT0S"))
+
+    def segment(number):
+        if segments is None:
+            duration = int(merged["duration"])
+            return offset + (number - start_number) * duration, duration
+        if number not in segments:
+            raise ChunkedMpdError(f"Segment {number} is not in the timeline")
+        return segments[number]
+
+    index = list(root).index(period)
+    root.remove(period)
+    for chunk, (first, last) in enumerate(bounds):
+        start, _ = segment(first)
+        end = sum(segment(last))
+        chunk_period = copy.deepcopy(period)
+        chunk_period.set("id", f"{period.get('id', 'period')}-{chunk}")
+        chunk_start = period_start + (start - offset) / timescale
+        chunk_period.set("start", f"PT{chunk_start:.3f}S")
+        chunk_period.set("duration", f"PT{(end - start) / timescale:.3f}S")
+        chunk_templates = templates(chunk_period)
+        template = chunk_templates[-1]
+        template.set("initialization", chunk_init_name(init_filename, first, last))
+        template.set("startNumber", str(first))
+        template.set("presentationTimeOffset", str(start))
+        if segments is not None:
+            for element in chunk_templates:
+                chunk_timeline = element.find("{*}SegmentTimeline")
+                if chunk_timeline is not None:
+                    element.remove(chunk_timeline)
+            chunk_timeline = ElementTree.SubElement(
+                template, f"{namespace}SegmentTimeline"
+            )
+            entry, expected = None, None
+            for number in range(first, last + 1):
+                time, duration = segment(number)
+                if (
+                    entry is not None
+                    and time == expected
+                    and entry.get("d") == str(duration)
+                ):
+                    entry.set("r", str(int(entry.get("r", "0")) + 1))
+                else:
+                    entry = ElementTree.SubElement(chunk_timeline, f"{namespace}S")
+                    if time != expected:
+                        entry.set("t", str(time))
+                    entry.set("d", str(duration))
+                expected = time + duration
+        root.insert(index + chunk, chunk_period)
+    return ElementTree.tostring(root, encoding="utf-8", xml_declaration=True)
+
+
+def sign_fragments_pipelined(
+    s3,
+    bucket,
+    objects,
+    init_path,
+    manifest_path,
+    workspace,
+    output_bucket,
+    output_prefix,
+    mpd_path=None,
+    sign=run_c2pa_command_for_fmp4,
+    chunk_size=CHUNK_FRAGMENTS,
+    window=WINDOW_CHUNKS,
+    sign_workers=SIGN_WORKERS,
+    concurrency=TRANSFER_CONCURRENCY,
+    download_callback=None,
+    upload_callback=None,
+    on_chunk=None,
+):
+    """
+    Sign the fragment objects (S3 listing entries) in ordered chunks of
+    chunk_size. Each chunk is downloaded, signed with its own copy of the
+    init segment and uploaded under output_prefix, and at most window chunks
+    are on disk at once, so downloading one chunk overlaps with signing and
+    uploading the ones before it.
+    Every chunk gets a signed init named {stem}-{first}-{last}{ext}; the last
+    chunk's init is also uploaded under the plain init name. A fragment only
+    validates against its own chunk's init, so the MPD at mpd_path, when
+    given, is rewritten into one Period per chunk and uploaded once every
+    chunk is in place. Without it the output has to be consumed per chunk.
+    on_chunk(fragment_count) is called as each chunk finishes.
+    Returns the number of signed fragments.
+    """
+    objects = sorted(
+        objects, key=lambda obj: (fragment_sequence(obj["Key"]), obj["Key"])
+    )
+    chunks = [objects[i : i + chunk_size] for i in range(0, len(objects), chunk_size)]
+    bounds = [
+        (fragment_sequence(chunk[0]["Key"]), fragment_sequence(chunk[-1]["Key"]))
+        for chunk in chunks
+    ]
+    init_filename = os.path.basename(init_path)
+    mpd = None
+    if mpd_path is not None:
+        # Rewritten before any fragment moves, so an unusable MPD fails fast
+        with open(mpd_path, "rb") as f:
+            mpd = chunked_mpd(f.read(), bounds, init_filename)
+    in_flight = threading.BoundedSemaphore(window)
+    signing = threading.BoundedSemaphore(sign_workers)
+
+    def process(index, chunk):
+        chunk_dir = os.path.join(workspace, f"chunk-{index:05d}")
+        output_dir = os.path.join(workspace, f"chunk-{index:05d}-out")
+        try:
+            os.makedirs(chunk_dir)
+            init_copy = os.path.join(chunk_dir, init_filename)
+            shutil.copyfile(init_path, init_copy)
+            wait_all(
+                [
+                    transfers.submit(
+                        download_object,
+                        s3,
+                        bucket,
+                        obj["Key"],
+                        os.path.join(chunk_dir, os.path.basename(obj["Key"])),
+                        download_callback,
+                    )
+                    for obj in chunk
+                ]
+            )
+
+            with signing:
+                success, output = sign(
+                    init_file=init_copy,
+                    fragments_glob=f"{chunk_dir}/*.m4s",
+                    output_dir=output_dir,
+                    manifest_file=manifest_path,
+                )
+            if not success:
+                raise ChunkSigningError(f"C2PA signing failed: {output}")
+
+            first, last = bounds[index]
+            is_last = index == len(chunks) - 1
+            uploads = []
+            for root, _, files in os.walk(output_dir):
+                for file in files:
+                    path = os.path.join(root, file)
+                    if file == init_filename:
+                        name = chunk_init_name(file, first, last)
+                        uploads.append((path, f"{output_prefix}/{name}"))
+                        if not is_last:
+                            continue
+                    uploads.append((path, f"{output_prefix}/{file}"))
+            wait_all(
+                [
+                    transfers.submit(
+                        upload_file,
+                        s3,
+                        path,
+                        output_bucket,
+                        key,
+                        callback=upload_callback,
+                    )
+                    for path, key in uploads
+                ]
+            )
+            logger.info(f"Chunk {index} ({first}-{last}) signed and uploaded")
+            if on_chunk is not None:
+                on_chunk(len(chunk))
+            return len(chunk)
+        finally:
+            shutil.rmtree(chunk_dir, ignore_errors=True)
+            shutil.rmtree(output_dir, ignore_errors=True)
+            in_flight.release()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as transfers, ThreadPoolExecutor(
+        max_workers=window
+    ) as chunk_pool:
+        futures = []
+        for index, chunk in enumerate(chunks):
+            # Bounds the on-disk footprint to window chunks
+            in_flight.acquire()
+            if any(future.done() and future.exception() for future in futures):
+                in_flight.release()
+                break
+            futures.append(chunk_pool.submit(process, index, chunk))
+        signed = sum(wait_all(futures))
+
+    if mpd is not None:
+        mpd_filename = os.path.basename(mpd_path)
+        chunked_path = os.path.join(workspace, f"chunked-{mpd_filename}")
+        with open(chunked_path, "wb") as f:
+            f.write(mpd)
+        upload_file(
+            s3,
+            chunked_path,
+            output_bucket,
+            f"{output_prefix}/{mpd_filename}",
+            callback=upload_callback,
+        )
+    logger.info(f"Pipelined signing of {signed} fragments in {len(chunks)} chunks")
+    return signed
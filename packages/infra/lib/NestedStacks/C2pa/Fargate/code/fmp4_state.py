@@ -0,0 +1,99 @@
+from botocore.exceptions import ClientError
+
+import json
+import re
+import os
+
+STATE_FILENAME = ".c2pa-stream-state.json"
+
+
+class StateConflictError(Exception):
+    """
+    Raised when another invocation updated the stream state concurrently
+    """
+
+
+def fragment_sequence(key):
+    """
+    Sequence number of a fragment, taken from the last number in its filename
+    (the "4" of the .m4s extension doesn't count)
+    """
+    numbers = re.findall(r"\d+", os.path.splitext(os.path.basename(key))[0])
+    return int(numbers[-1]) if numbers else -1
+
+
+class StreamState:
+    """
+    Per-stream signing state for incremental /sign_fmp4 calls, persisted as a
+    JSON object next to the processed fragments. It records the ETag of every
+    fragment already signed, the init segment ETag and the last sequence
+    number, so later calls only sign what the live encoder added since.
+    Writes are conditional on the ETag read at load time.
+    """
+
+    def __init__(self, s3, bucket, prefix):
+        self.s3 = s3
+        self.bucket = bucket
+        self.key = f"{prefix.rstrip('/')}/{STATE_FILENAME}"
+        self.fragments = {}
+        self.init_etag = None
+        self.last_sequence = -1
+        self._etag = None
+
+    @classmethod
+    def load(cls, s3, bucket, prefix):
+        state = cls(s3, bucket, prefix)
+        try:
+            response = s3.get_object(Bucket=bucket, Key=state.key)
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("NoSuchKey", "404"):
+                return state
+            raise
+        data = json.loads(response["Body"].read())
+        state.fragments = data.get("fragments", {})
+        state.init_etag = data.get("init_etag")
+        state.last_sequence = data.get("last_sequence", -1)
+        state._etag = response["ETag"]
+        return state
+
+    def is_new(self, obj):
+        """
+        True for listed objects that were not signed yet or changed since
+        """
+        return self.fragments.get(obj["Key"]) != obj["ETag"]
+
+    def record(self, objects, init_etag):
+        for obj in objects:
+            self.fragments[obj["Key"]] = obj["ETag"]
+            self.last_sequence = max(
+                self.last_sequence, fragment_sequence(obj["Key"])
+            )
+        self.init_etag = init_etag
+
+    def save(self):
+        body = json.dumps(
+            {
+                "fragments": self.fragments,
+                "init_etag": self.init_etag,
+                "last_sequence": self.last_sequence,
+            }
+        )
+        condition = {"IfMatch": self._etag} if self._etag else {"IfNoneMatch": "*"}
+        try:
+            response = self.s3.put_object(
+                Bucket=self.bucket,
+                Key=self.key,
+                Body=body,
+                ContentType="application/json",
+                **condition,
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] in (
+                "PreconditionFailed",
+                "ConditionalRequestConflict",
+            ):
+                raise StateConflictError(
+                    f"Stream state {self.key} was updated by another request"
+                ) from e
+            raise
+        self._etag = response["ETag"]
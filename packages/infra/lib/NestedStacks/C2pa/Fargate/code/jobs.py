@@ -0,0 +1,299 @@
+from concurrent.futures import ThreadPoolExecutor
+from botocore.exceptions import ClientError
+from http_client import shared_client
+
+import threading
+import logging
+import sqlite3
+import time
+import uuid
+import json
+import os
+
+logger = logging.getLogger(__name__)
+
+# s3 is shared by every task behind the load balancer; memory and sqlite
+# only suit a single task
+JOB_STORE = os.environ.get("job_store", "s3")
+JOB_STORE_PATH = os.environ.get("job_store_path", "/tmp/c2pa-jobs.sqlite3")
+JOB_WORKERS = int(os.environ.get("job_workers", "2"))
+JOB_MAX_PENDING = int(os.environ.get("job_max_pending", "100"))
+JOB_RETENTION_SECONDS = int(os.environ.get("job_retention_seconds", "86400"))
+JOB_PROGRESS_INTERVAL = float(os.environ.get("job_progress_interval_seconds", "2"))
+JOB_PREFIX = ".c2pa-jobs"
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class QueueFullError(Exception):
+    """
+    Raised when a job is submitted while max_pending jobs are waiting or running
+    """
+
+
+def new_job(kind, callback_url=None):
+    now = time.time()
+    return {
+        "job_id": uuid.uuid4().hex,
+        "kind": kind,
+        "status": QUEUED,
+        "created_at": now,
+        "updated_at": now,
+        "progress": {},
+        "result": None,
+        "error": None,
+        "callback_url": callback_url,
+    }
+
+
+def _expired(job, now):
+    return (
+        job["status"] in (SUCCEEDED, FAILED)
+        and now - job["updated_at"] > JOB_RETENTION_SECONDS
+    )
+
+
+########################################################################
+############################### Stores #################################
+########################################################################
+class MemoryJobStore:
+    """
+    Jobs of this process only; finished jobs are dropped after the retention
+    period
+    """
+
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def save(self, job):
+        now = time.time()
+        with self._lock:
+            self._jobs[job["job_id"]] = json.loads(json.dumps(job))
+            for job_id in [k for k, v in self._jobs.items() if _expired(v, now)]:
+                del self._jobs[job_id]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+
+class SqliteJobStore:
+    """
+    Jobs in a local SQLite file, so they survive a process restart and can
+    be inspected offline
+    """
+
+    def __init__(self, path=JOB_STORE_PATH):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs "
+                "(job_id TEXT PRIMARY KEY, status TEXT, updated_at REAL, body TEXT)"
+            )
+
+    def save(self, job):
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?)",
+                (job["job_id"], job["status"], job["updated_at"], json.dumps(job)),
+            )
+            self._db.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (SUCCEEDED, FAILED, time.time() - JOB_RETENTION_SECONDS),
+            )
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT body FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+
+class S3JobStore:
+    """
+    One JSON object per job in the output bucket, shared by every task or
+    execution environment. Expire the prefix with a lifecycle rule.
+    """
+
+    def __init__(self, s3, bucket):
+        self.s3 = s3
+        self.bucket = bucket
+
+    def save(self, job):
+        self.s3.put_object(
+            Bucket=self.bucket,
+            Key=f"{JOB_PREFIX}/{job['job_id']}.json",
+            Body=json.dumps(job).encode("utf-8"),
+            ContentType="application/json",
+        )
+
+    def get(self, job_id):
+        try:
+            response = self.s3.get_object(
+                Bucket=self.bucket, Key=f"{JOB_PREFIX}/{job_id}.json"
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("NoSuchKey", "404"):
+                return None
+            raise
+        return json.loads(response["Body"].read())
+
+
+def create_job_store(s3=None, bucket=None, kind=JOB_STORE):
+    if kind == "s3":
+        return S3JobStore(s3, bucket)
+    if kind == "sqlite":
+        return SqliteJobStore()
+    return MemoryJobStore()
+
+
+########################################################################
+############################### Running ################################
+########################################################################
+class JobProgress:
+    """
+    Counters and current phase of a running job. Work functions receive it
+    as progress= and call add(), set_phase() or pass counter(name) as a
+    boto3 transfer Callback; changes reach the store at most every
+    interval seconds.
+    """
+
+    def __init__(self, flush=None, interval=JOB_PROGRESS_INTERVAL):
+        self.counters = {}
+        self.phase = None
+        self._flush = flush
+        self._interval = interval
+        self._flushed_at = 0
+        self._lock = threading.Lock()
+
+    def add(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+        self._changed()
+
+    def counter(self, name):
+        return lambda amount: self.add(name, amount)
+
+    def set_phase(self, name):
+        self.phase = name
+        self._changed(force=True)
+
+    def snapshot(self):
+        with self._lock:
+            return {"phase": self.phase, **self.counters}
+
+    def _changed(self, force=False):
+        if self._flush is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._flushed_at < self._interval:
+                return
+            self._flushed_at = now
+        try:
+            self._flush(self.snapshot())
+        except Exception as e:
+            logger.warning(f"Could not record job progress: {e}")
+
+
+def _error_message(e):
+    # HTTPException carries detail, Powertools' ServiceError carries msg
+    return getattr(e, "detail", None) or getattr(e, "msg", None) or str(e)
+
+
+def _notify(job):
+    try:
+        shared_client().post(
+            job["callback_url"],
+            json.dumps(job).encode("utf-8"),
+            {"Content-Type": "application/json"},
+        )
+    except Exception as e:
+        logger.warning(f"Job callback to {job['callback_url']} failed: {e}")
+
+
+def run_job(store, job, fn, *args, **kwargs):
+    """
+    Run fn(*args, progress=..., **kwargs) for job, recording its state,
+    progress and result in store and POSTing the final job to its
+    callback_url when one was given
+    """
+    lock = threading.Lock()
+
+    def save(**fields):
+        # Progress flushes come from transfer threads; keep writes ordered
+        with lock:
+            job.update(fields, updated_at=time.time())
+            store.save(job)
+
+    progress = JobProgress(flush=lambda snapshot: save(progress=snapshot))
+    save(status=RUNNING)
+    try:
+        result = fn(*args, progress=progress, **kwargs)
+        save(status=SUCCEEDED, result=result, progress=progress.snapshot())
+    except Exception as e:
+        logger.exception(f"Job {job['job_id']} failed")
+        save(status=FAILED, error=_error_message(e), progress=progress.snapshot())
+    if job.get("callback_url"):
+        _notify(job)
+    return job
+
+
+class JobQueue:
+    """
+    Bounded background queue for long signing jobs. Submitting returns the
+    queued job straight away; at most workers jobs run at once and at most
+    max_pending are accepted before QueueFullError.
+    """
+
+    def __init__(self, store, workers=JOB_WORKERS, max_pending=JOB_MAX_PENDING):
+        self.store = store
+        self.workers = workers
+        self.max_pending = max_pending
+        self._pool = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="c2pa-job"
+                )
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def submit(self, kind, fn, *args, callback_url=None, **kwargs):
+        self.start()
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise QueueFullError(
+                    f"{self._pending} jobs are already queued or running"
+                )
+            self._pending += 1
+        job = new_job(kind, callback_url)
+        try:
+            self.store.save(job)
+            self._pool.submit(self._run, dict(job), fn, args, kwargs)
+        except BaseException:
+            # The job never reached a worker, so its slot would never be freed
+            with self._lock:
+                self._pending -= 1
+            raise
+        return job
+
+    def _run(self, job, fn, args, kwargs):
+        try:
+            run_job(self.store, job, fn, *args, **kwargs)
+        finally:
+            with self._lock:
+                self._pending -= 1
@@ -1,19 +1,61 @@
 from utils import (
     run_c2pa_command_for_fmp4,
-    garbage_collect_folder,
     unhandled_exception_handler,
 )
+from fetch import RequestFetcher
+from http_client import shared_client
+from signer import SignerCache
+from concurrency import BlockingExecutor
+from transfer import (
+    OWNED_BUCKETS,
+    create_s3_client,
+    download_fileobj,
+    download_object,
+    download_prefix,
+    list_prefix,
+    s3_location,
+    upload_file,
+    upload_files,
+)
+from streams import (
+    S3RangeReader,
+    RangeNotSupportedError,
+    open_range_reader,
+    sign_to_s3,
+)
+from fmp4_state import StreamState, StateConflictError, fragment_sequence
+from fmp4_pipeline import (
+    sign_fragments_pipelined,
+    ChunkSigningError,
+    ChunkedMpdError,
+)
+from fmp4_ladder import sign_ladder, LadderError
+from manifest_template import ManifestTemplateCache
+from thumbnails import ThumbnailCache
+from scratch import ScratchSpace
+from sign_pool import SigningPool, make_builder
+from read_pool import ReadingPool
+from manifest_cache import (
+    ManifestCache,
+    content_identity,
+    configure_reader_verification,
+    reads_whole_asset,
+)
+from probe import probe_manifest, NoManifestError, C2PA_NOT_FOUND_ERRORS
+from jobs import JobQueue, JobProgress, QueueFullError, create_job_store
+from instrumentation import PhaseTimer, phase, add_bytes, prometheus_exposition
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import FastAPI, HTTPException, status
+from fastapi.responses import StreamingResponse, JSONResponse, Response
 from urllib.parse import urlparse
 from pydantic import BaseModel
 from datetime import datetime
 from os.path import splitext
-from urllib import request
-from pathlib import Path
 from typing import List
 
 import mimetypes
-import tempfile
+import asyncio
 import logging
 import boto3
 import c2pa
@@ -22,14 +64,51 @@ import os
 import io
 
 secretsmanager = boto3.client("secretsmanager")
-s3 = boto3.client("s3")
+s3 = create_s3_client()
+http = shared_client()
 
 output_bucket = os.environ["output_bucket"]
 certificate = os.environ["certificate"]
 private_key = os.environ["private_key"]
 
+SIGN_BATCH_WORKERS = int(os.environ.get("sign_batch_workers", os.cpu_count() or 1))
+SIGN_BATCH_MAX_ITEMS = int(os.environ.get("sign_batch_max_items", "500"))
+READ_BATCH_MAX_ITEMS = int(os.environ.get("read_batch_max_items", "5000"))
+
+signer_cache = SignerCache(secretsmanager, private_key, certificate)
+manifest_templates = ManifestTemplateCache()
+scratch = ScratchSpace()
+thumbnails = ThumbnailCache(disk_cache=scratch.cache)
+blocking = BlockingExecutor()
+signing_pool = SigningPool(private_key, certificate)
+reading_pool = ReadingPool()
+manifest_cache = ManifestCache(s3, output_bucket)
+configure_reader_verification()
+job_store = create_job_store(s3, output_bucket)
+job_queue = JobQueue(job_store)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    scratch.start()
+    blocking.start()
+    signing_pool.start()
+    job_queue.start()
+    # Warm the signer so the first request doesn't pay for the secret fetch
+    try:
+        await blocking.run("startup", signer_cache.get)
+    except Exception as e:
+        print(f"Signer warmup failed, will retry on first request: {e}")
+    yield
+    job_queue.shutdown()
+    blocking.shutdown()
+    signing_pool.shutdown()
+    reading_pool.shutdown()
+    scratch.shutdown()
+
+
 # FastAPI setup
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 app.add_exception_handler(Exception, unhandled_exception_handler)
 
 logger = logging.getLogger(__name__)
@@ -39,10 +118,22 @@ logger = logging.getLogger(__name__)
 ########################### Health Check ###############################
 ########################################################################
 @app.get("/")
-def read_root():
+async def read_root():
     return {"Welcome": "to FastAPI on Fargate"}
 
 
+@app.get("/metrics")
+async def metrics():
+    exposition = prometheus_exposition()
+    if exposition is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="The prometheus metrics exporter is not enabled",
+        )
+    body, content_type = exposition
+    return Response(content=body, media_type=content_type)
+
+
 ########################################################################
 ############################ /sign_file ################################
 ########################################################################
@@ -51,110 +142,268 @@ class SignFileEvent(BaseModel):
     asset_url: str
     assertions_json_url: str
     ingredients_url: List[str] | None = None
+    # Stream the asset from S3 and the signed output into a multipart upload
+    streaming: bool = False
 
 
 @app.post("/sign_file")
 async def sign_file(signFileEvent: SignFileEvent):
-    directory_path = Path("c2pa")
-    directory_path.mkdir(parents=True, exist_ok=True)
+    return await blocking.run("sign_file", sign_file_blocking, signFileEvent)
+
+
+def sign_file_blocking(signFileEvent: SignFileEvent, progress=None):
+    progress = progress or JobProgress()
+    with PhaseTimer("sign_file", on_phase=progress.set_phase):
+        fetcher = RequestFetcher(s3=s3)
+        template = load_manifest_template(signFileEvent.assertions_json_url)
+        presigned_url = sign_asset(
+            signFileEvent.new_title,
+            signFileEvent.asset_url,
+            template,
+            signFileEvent.ingredients_url,
+            signFileEvent.streaming,
+            fetcher,
+            progress=progress,
+        )
+    return {"manifest": presigned_url}
+
+
+def load_manifest_template(assertions_json_url):
+    """
+    Cached, pre-serialized manifest for an assertions document
+    """
+    try:
+        with phase("assertions_fetch"):
+            return manifest_templates.get(assertions_json_url)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Invalid assertions document: {e}",
+        )
+
 
-    new_title = signFileEvent.new_title
-    asset_url = signFileEvent.asset_url
-    assertions_json_url = signFileEvent.assertions_json_url
-    assertions_json = json.loads(request.urlopen(assertions_json_url).read())
-    ingredients_url = signFileEvent.ingredients_url
+def sign_asset(
+    new_title,
+    asset_url,
+    template,
+    ingredients_url,
+    streaming,
+    fetcher,
+    ingredient_fetcher=None,
+    progress=None,
+):
+    """
+    Sign one asset and upload it to the output bucket, returning a presigned
+    URL. Ingredients come from ingredient_fetcher so a batch can share them.
+    Each step is timed as a phase of the current operation.
+    """
+    progress = progress or JobProgress()
+    ingredient_fetcher = ingredient_fetcher or fetcher
 
     filename = urlparse(asset_url).path.split("/").pop()
     filename_no_extension, extension = splitext(filename)
 
-    manifest_json = json.dumps(
-        {
-            "title": new_title,
-            "assertions": [
-                {
-                    "label": "stds.schema-org.CreativeWork",
-                    "data": {
-                        "@context": "http://schema.org/",
-                        "@type": "CreativeWork",
-                        "author": [{"@type": "Person", "name": "AWS C2PA Guidance"}],
-                    },
-                    "kind": "Json",
-                },
-                *assertions_json,
-            ],
-            "thumbnail": {"format": extension[1:], "identifier": "thumbnail"},
-            "claim_generator_info": [{"name": "c2pa-python", "version": "0.6.1"}],
-        }
+    # Collect the thumbnail and ingredients, each fetched once.
+    # Making a thumbnail needs the whole asset, which defeats streaming.
+    resources = []
+    ingredients = []
+    thumbnail = None
+    if not streaming:
+        with phase("asset_download"):
+            asset = fetcher.get(asset_url)
+        add_bytes("asset_download", len(asset))
+        with phase("thumbnail"):
+            thumbnail = thumbnails.get(asset, extension[1:])
+    if thumbnail is not None:
+        resources.append(("thumbnail", thumbnail.data))
+        print(f"Thumbnail added ({len(thumbnail.data)} bytes)")
+    manifest_json = template.render(
+        new_title, thumbnail.format if thumbnail is not None else None
     )
-    builder = c2pa.Builder(manifest_json)
-
-    # Add New Image Thumbnail
-    thumbnail = request.urlopen(asset_url)
-    builder.add_resource("thumbnail", thumbnail)
-    print("Thumbnail added")
-
-    # Add Ingredients
-    for ingredient in ingredients_url:
-        ingredient_path = urlparse(ingredient).path
-        ingredient_filename = ingredient_path.split("/").pop()
-        ingredient_no_extension, ingredient_extension = splitext(ingredient_filename)
-        ingredient_json = {
-            "title": ingredient_filename,
-            "relationship": "parentOf",
-            "thumbnail": {
-                "identifier": ingredient_path,
-                "format": ingredient_extension[1:],
+
+    with phase("ingredients"):
+        for ingredient in ingredients_url or []:
+            ingredient_path = urlparse(ingredient).path
+            ingredient_filename = ingredient_path.split("/").pop()
+            ingredient_no_extension, ingredient_extension = splitext(
+                ingredient_filename
+            )
+            ingredient_json = {
+                "title": ingredient_filename,
+                "relationship": "parentOf",
+            }
+            ingredient_data = ingredient_fetcher.get(ingredient)
+            add_bytes("ingredients", len(ingredient_data))
+            ingredient_thumbnail = thumbnails.get(
+                ingredient_data, ingredient_extension[1:]
+            )
+            if ingredient_thumbnail is not None:
+                ingredient_json["thumbnail"] = {
+                    "identifier": ingredient_path,
+                    "format": ingredient_thumbnail.format,
+                }
+                resources.append((ingredient_path, ingredient_thumbnail.data))
+            ingredients.append(
+                (ingredient_json, ingredient_extension[1:], ingredient_data)
+            )
+
+            print(f"Ingredient added: {ingredient_filename}")
+
+    content_type, _ = mimetypes.guess_type(filename)
+    extra_args = {"ContentType": content_type} if content_type else {}
+
+    # Sign
+    if streaming:
+        signer = signer_cache.get()
+        builder = make_builder(manifest_json, resources, ingredients)
+        source = open_asset_stream(asset_url, fetcher)
+
+        def sign(dest):
+            source.seek(0)
+            builder.sign(signer, extension[1:], source, dest)
+
+        # Download, signing and upload overlap, so they are one phase
+        with phase("sign"):
+            sign_to_s3(
+                sign,
+                extension[1:],
+                s3,
+                output_bucket,
+                f"{filename_no_extension}/{filename}",
+                extra_args,
+            )
+        if hasattr(source, "bytes_fetched"):
+            fetcher.add_origin_traffic(source.bytes_fetched, source.requests)
+        print(f"Streaming signing complete, origin traffic: {fetcher.stats()}")
+        add_bytes("sign", fetcher.stats()["origin_bytes"])
+        progress.add("bytes_downloaded", fetcher.stats()["origin_bytes"])
+    else:
+        with scratch.workspace() as workspace:
+            signed_path = os.path.join(workspace, filename)
+            if signing_pool.enabled:
+                # Worker processes write the signed asset straight to disk
+                with phase("sign"):
+                    signing_pool.sign(
+                        manifest_json,
+                        extension[1:],
+                        fetcher.get(asset_url),
+                        resources,
+                        ingredients,
+                        signed_path,
+                        workspace,
+                    )
+            else:
+                signer = signer_cache.get()
+                builder = make_builder(manifest_json, resources, ingredients)
+                result = io.BytesIO(b"")
+                with phase("sign"):
+                    builder.sign(
+                        signer, extension[1:], fetcher.stream(asset_url), result
+                    )
+                with phase("tmp_write"):
+                    with open(signed_path, "wb") as f:
+                        f.write(result.getbuffer())
+            print(f"Signing complete, origin traffic: {fetcher.stats()}")
+            progress.add("bytes_downloaded", fetcher.stats()["origin_bytes"])
+
+            with phase("upload"):
+                upload_file(
+                    s3,
+                    signed_path,
+                    output_bucket,
+                    f"{filename_no_extension}/{filename}",
+                    extra_args,
+                    progress.counter("bytes_uploaded"),
+                )
+            add_bytes("upload", os.path.getsize(signed_path))
+
+    with phase("presign"):
+        presigned_url = s3.generate_presigned_url(
+            "get_object",
+            Params={
+                "Bucket": output_bucket,
+                "Key": f"{filename_no_extension}/{filename}",
             },
-        }
-        ingredient_thumbnail = request.urlopen(ingredient)
-        builder.add_resource(ingredient_path, ingredient_thumbnail)
+        )
 
-        ingredient = io.BytesIO(request.urlopen(ingredient).read())
-        builder.add_ingredient(ingredient_json, ingredient_extension[1:], ingredient)
+    return presigned_url
 
-        print(f"Ingredient added: {ingredient_filename}")
 
-    # Load the Key
-    prv_key_value = secretsmanager.get_secret_value(SecretId=private_key)
-    key = prv_key_value["SecretString"].encode("utf-8")
+def open_asset_stream(asset_url, fetcher):
+    """
+    Seekable source for streaming mode: ranged GETs for s3:// URLs and
+    presigned URLs into our buckets, the per-request fetch buffer otherwise
+    """
+    location = s3_location(asset_url)
+    if location is not None and (
+        asset_url.startswith("s3://") or location[0] in OWNED_BUCKETS
+    ):
+        return S3RangeReader(s3, *location)
+    return fetcher.stream(asset_url)
 
-    def private_sign(data: bytes) -> bytes:
-        return c2pa.sign_ps256(data, key)
 
-    # Load the Certificate
-    cert_value = secretsmanager.get_secret_value(SecretId=certificate)
-    cert = cert_value["SecretString"].encode("utf-8")
+########################################################################
+############################ /sign_batch ###############################
+########################################################################
+class SignBatchItem(BaseModel):
+    new_title: str
+    asset_url: str
 
-    signer = c2pa.create_signer(
-        private_sign, c2pa.SigningAlg.PS256, cert, "http://timestamp.digicert.com"
-    )
-    print("Signer added")
 
-    # Sign
-    asset = io.BytesIO(request.urlopen(asset_url).read())
-    result = io.BytesIO(b"")
-    builder.sign(signer, extension[1:], asset, result)
-    print("Signing complete")
+class SignBatchEvent(BaseModel):
+    assets: List[SignBatchItem]
+    assertions_json_url: str
+    ingredients_url: List[str] | None = None
+    streaming: bool = False
 
-    with open(f"c2pa/{filename}", "wb") as f:
-        f.write(result.getbuffer())
 
-    content_type, _ = mimetypes.guess_type(filename)
-    s3.upload_file(
-        f"c2pa/{filename}",
-        output_bucket,
-        f"{filename_no_extension}/{filename}",
-        ExtraArgs={"ContentType": content_type},
-    )
+@app.post("/sign_batch")
+async def sign_batch(signBatchEvent: SignBatchEvent):
+    return await blocking.run("sign_batch", sign_batch_blocking, signBatchEvent)
 
-    manifest = s3.generate_presigned_url(
-        "get_object",
-        Params={"Bucket": output_bucket, "Key": f"{filename_no_extension}/{filename}"},
-    )
 
-    garbage_collect_folder(f"c2pa/*{filename_no_extension}*")
+def sign_batch_blocking(signBatchEvent: SignBatchEvent):
+    if len(signBatchEvent.assets) > SIGN_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"A batch can contain at most {SIGN_BATCH_MAX_ITEMS} assets",
+        )
 
-    return {"manifest": manifest}
+    # Assertions, ingredients and the signer are shared by every item
+    shared_fetcher = RequestFetcher(s3=s3)
+    template = load_manifest_template(signBatchEvent.assertions_json_url)
+    signer_cache.get()
+
+    def sign_item(item: SignBatchItem):
+        try:
+            with PhaseTimer("sign_batch_item"):
+                presigned_url = sign_asset(
+                    item.new_title,
+                    item.asset_url,
+                    template,
+                    signBatchEvent.ingredients_url,
+                    signBatchEvent.streaming,
+                    RequestFetcher(s3=s3),
+                    shared_fetcher,
+                )
+            return {"asset_url": item.asset_url, "manifest": presigned_url}
+        except Exception as e:
+            print(f"Batch item failed: {item.asset_url}: {e}")
+            return {
+                "asset_url": item.asset_url,
+                "error": getattr(e, "detail", None) or str(e),
+            }
+
+    with ThreadPoolExecutor(max_workers=SIGN_BATCH_WORKERS) as pool:
+        results = list(pool.map(sign_item, signBatchEvent.assets))
+
+    failed = sum(1 for result in results if "error" in result)
+    print(f"Batch complete: {len(results) - failed} signed, {failed} failed")
+    return {
+        "results": results,
+        "succeeded": len(results) - failed,
+        "failed": failed,
+    }
 
 
 ########################################################################
@@ -165,97 +414,386 @@ class SignFmp4Event(BaseModel):
     init_file: str
     fragments_pattern: str
     manifest_file: str
+    # Only sign fragments added since the previous call for this new_title
+    incremental: bool = False
+    # Download, sign and upload fragments in overlapping chunks
+    pipelined: bool = False
+    # Sign every representation of the .mpd next to the fragments
+    ladder: bool = False
 
 
 @app.post("/sign_fmp4")
 async def sign_fmp4(request: SignFmp4Event):
-    with tempfile.TemporaryDirectory() as temp_dir:
+    return await blocking.run("sign_fmp4", sign_fmp4_blocking, request)
+
+
+def sign_fmp4_blocking(request: SignFmp4Event, progress=None):
+    progress = progress or JobProgress()
+    if request.ladder:
+        return sign_fmp4_ladder_blocking(request, progress)
+    with (
+        PhaseTimer("sign_fmp4", on_phase=progress.set_phase) as timer,
+        scratch.workspace() as temp_dir,
+    ):
         init_filename = os.path.basename(urlparse(request.init_file).path)
         init_file_path = os.path.join(temp_dir, init_filename)
         logger.info(f"Downloading init file: {request.init_file}")        
         print("starting download")
 
-        with open(init_file_path, "wb") as f:
-            init_config = urlparse(request.init_file)
-            print(init_config)
-            s3.download_fileobj(init_config.netloc, init_config.path.lstrip("/"), f)
-
-        # List fragments
-        logger.info("Listing fragments...")
-        paginator = s3.get_paginator("list_objects_v2")
-        fragments = []
-        fragments_config = urlparse(request.fragments_pattern)
-
-        for page in paginator.paginate(
-            Bucket=fragments_config.netloc,
-            Prefix=os.path.dirname(fragments_config.path.lstrip("/")),
-        ):
-            if "Contents" in page:
-                for obj in page["Contents"]:
-                    if obj["Key"].endswith(".m4s"):  # Only process .m4s files
-                        fragment_path = os.path.join(
-                            temp_dir, os.path.basename(obj["Key"])
+        with timer.phase("download"):
+            with open(init_file_path, "wb") as f:
+                init_config = urlparse(request.init_file)
+                print(init_config)
+                download_fileobj(
+                    s3, init_config.netloc, init_config.path.lstrip("/"), f
+                )
+
+            # Load live stream state, a new init segment restarts the stream
+            state, new_objects, include = None, [], None
+            if request.incremental:
+                state = StreamState.load(
+                    s3, output_bucket, f"fragments/processed/{request.new_title}"
+                )
+                init_etag = s3.head_object(
+                    Bucket=init_config.netloc, Key=init_config.path.lstrip("/")
+                )["ETag"]
+                if state.init_etag != init_etag:
+                    state.fragments = {}
+
+                def include(obj):
+                    if obj["Key"].endswith(".mpd"):
+                        return True
+                    if state.is_new(obj):
+                        new_objects.append(obj)
+                        return True
+                    return False
+
+            # List and download fragments in parallel
+            logger.info("Listing fragments...")
+            fragments_config = urlparse(request.fragments_pattern)
+            fragments_bucket = fragments_config.netloc
+            fragments_prefix = os.path.dirname(fragments_config.path.lstrip("/"))
+            mpd_path = None
+            if request.pipelined:
+                # Fragments are downloaded chunk by chunk while signing
+                listed = list_prefix(
+                    s3,
+                    fragments_bucket,
+                    fragments_prefix,
+                    suffixes=[".m4s", ".mpd"],
+                    include=include,
+                )
+                fragments = [obj for obj in listed if obj["Key"].endswith(".m4s")]
+                mpd_object = next(
+                    (obj for obj in listed if obj["Key"].endswith(".mpd")), None
+                )
+                if not request.incremental:
+                    # Each chunk has its own init, so a VOD rendition is only
+                    # playable through an MPD that points every chunk at it
+                    if mpd_object is None:
+                        raise HTTPException(
+                            status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="pipelined needs the .mpd next to the "
+                            "fragments, or incremental",
                         )
-                        with open(fragment_path, "wb") as f:
-                            s3.download_fileobj(fragments_config.netloc, obj["Key"], f)
-                        fragments.append(fragment_path)
+                    mpd_path = download_object(
+                        s3,
+                        fragments_bucket,
+                        mpd_object["Key"],
+                        os.path.join(temp_dir, os.path.basename(mpd_object["Key"])),
+                    )
+            else:
+                fragments = download_prefix(
+                    s3,
+                    fragments_bucket,
+                    fragments_prefix,
+                    temp_dir,
+                    suffixes=[".m4s"],  # Only process .m4s files
+                    include=include,
+                    callback=progress.counter("bytes_downloaded"),
+                )
+                fragments.sort()  # Ensure fragments are in order
+
+            if request.incremental and not fragments:
+                return {
+                    "saved_location": f"s3://{output_bucket}/fragments/processed/{request.new_title}/",
+                    "signed_fragments": 0,
+                    "last_sequence": state.last_sequence,
+                }
+
+            # Download manifest file
+            manifest_path = os.path.join(temp_dir, "manifest.json")
+            with open(manifest_path, "wb") as f:
+                manifest_config = urlparse(request.manifest_file)
+                download_fileobj(
+                    s3, manifest_config.netloc, manifest_config.path.lstrip("/"), f
+                )
 
-        fragments.sort()  # Ensure fragments are in order
+        if request.pipelined:
+            try:
+                with timer.phase("pipeline"):
+                    sign_fragments_pipelined(
+                        s3,
+                        fragments_bucket,
+                        fragments,
+                        init_file_path,
+                        manifest_path,
+                        temp_dir,
+                        output_bucket,
+                        f"fragments/processed/{request.new_title}",
+                        mpd_path=mpd_path,
+                        download_callback=progress.counter("bytes_downloaded"),
+                        upload_callback=progress.counter("bytes_uploaded"),
+                        on_chunk=lambda count: progress.add("fragments_signed", count),
+                    )
+            except ChunkedMpdError as e:
+                raise HTTPException(status_code=422, detail=str(e))
+            except ChunkSigningError as e:
+                raise HTTPException(status_code=500, detail=str(e))
+        else:
+            # Create output directory
+            output_dir = os.path.join(temp_dir, "output")
+            os.makedirs(output_dir, exist_ok=True)
+
+            print(os.listdir(temp_dir))
+
+            # Run c2pa command
+            with timer.phase("sign"):
+                success, output = run_c2pa_command_for_fmp4(
+                    init_file=init_file_path,
+                    fragments_glob=f"{temp_dir}/*.m4s",
+                    output_dir=output_dir,
+                    manifest_file=manifest_path,
+                )
 
-        # Download manifest file
-        manifest_path = os.path.join(temp_dir, "manifest.json")
-        with open(manifest_path, "wb") as f:
-            manifest_config = urlparse(request.manifest_file)
-            s3.download_fileobj(
-                manifest_config.netloc, manifest_config.path.lstrip("/"), f
+            if not success:
+                raise HTTPException(
+                    status_code=500, detail=f"C2PA signing failed: {output}"
+                )
+            progress.add("fragments_signed", len(fragments))
+
+            print(os.listdir(output_dir))
+            output_folder = os.path.join(output_dir, temp_dir.split("/").pop())
+            uploads = [
+                (
+                    os.path.join(root, file),
+                    f"fragments/processed/{request.new_title}/{file}",
+                )
+                for root, _, files in os.walk(output_folder)
+                for file in files
+            ]
+
+            mpd_file_path = next(
+                (f for f in fragments if f.endswith(".mpd")),
+                None
             )
+            if mpd_file_path:
+                logger.info(f"Uploading DASH Manifest file: {mpd_file_path}")
+                mpd_filename = os.path.basename(urlparse(mpd_file_path).path)
+                uploads.append(
+                    (
+                        os.path.join(temp_dir, mpd_file_path),
+                        f"fragments/processed/{request.new_title}/{mpd_filename}",
+                    )
+                )
 
-        # Create output directory
-        output_dir = os.path.join(temp_dir, "output")
-        os.makedirs(output_dir, exist_ok=True)
+            if request.incremental:
+                # Keep the init signed for this batch so earlier windows stay verifiable
+                init_stem, init_extension = splitext(init_filename)
+                sequences = sorted(fragment_sequence(obj["Key"]) for obj in new_objects)
+                uploads.append(
+                    (
+                        os.path.join(output_folder, init_filename),
+                        f"fragments/processed/{request.new_title}/{init_stem}-{sequences[0]}-{sequences[-1]}{init_extension}",
+                    )
+                )
 
-        print(os.listdir(temp_dir))
+            with timer.phase("upload"):
+                upload_files(
+                    s3, uploads, output_bucket, callback=progress.counter("bytes_uploaded")
+                )
+            timer.add_bytes("upload", sum(os.path.getsize(path) for path, _ in uploads))
+
+        response = {
+            "saved_location": f"s3://{output_bucket}/fragments/processed/{request.new_title}/",
+            "timings": timer.timings,
+        }
 
-        # Run c2pa command
-        success, output = run_c2pa_command_for_fmp4(
-            init_file=init_file_path,
-            fragments_glob=f"{temp_dir}/*.m4s",
-            output_dir=output_dir,
-            manifest_file=manifest_path,
+        if request.incremental:
+            state.record(new_objects, init_etag)
+            try:
+                state.save()
+            except StateConflictError as e:
+                raise HTTPException(status_code=409, detail=str(e))
+            response["signed_fragments"] = len(new_objects)
+            response["last_sequence"] = state.last_sequence
+
+        return response
+
+def sign_fmp4_ladder_blocking(request: SignFmp4Event, progress):
+    """
+    Ladder mode: the .mpd under the fragments prefix names each
+    representation's init and segment template, and every rendition is
+    signed concurrently in its own workspace. The MPD is uploaded last, so
+    it only appears once the whole processed ladder is in place.
+    """
+    if request.incremental or request.pipelined:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="ladder cannot be combined with incremental or pipelined",
         )
+    fragments_config = urlparse(request.fragments_pattern)
+    bucket = fragments_config.netloc
+    prefix = os.path.dirname(fragments_config.path.lstrip("/"))
+    output_prefix = f"fragments/processed/{request.new_title}"
+
+    with (
+        PhaseTimer("sign_fmp4_ladder", on_phase=progress.set_phase) as timer,
+        scratch.workspace() as temp_dir,
+    ):
+        with timer.phase("download"):
+            objects = list_prefix(
+                s3,
+                bucket,
+                f"{prefix}/" if prefix else "",
+                suffixes=[".mpd", ".m4s", ".mp4"],
+            )
+            mpd_object = next(
+                (obj for obj in objects if obj["Key"].endswith(".mpd")), None
+            )
+            if mpd_object is None:
+                raise HTTPException(
+                    status_code=404, detail="No DASH manifest (.mpd) found"
+                )
+            mpd_filename = os.path.basename(mpd_object["Key"])
+            mpd_path = download_object(
+                s3, bucket, mpd_object["Key"], os.path.join(temp_dir, mpd_filename)
+            )
 
-        if not success:
-            raise HTTPException(
-                status_code=500, detail=f"C2PA signing failed: {output}"
+            manifest_path = os.path.join(temp_dir, "manifest.json")
+            manifest_config = urlparse(request.manifest_file)
+            download_object(
+                s3,
+                manifest_config.netloc,
+                manifest_config.path.lstrip("/"),
+                manifest_path,
             )
 
-        print(os.listdir(output_dir))
-        output_folder = os.path.join(output_dir, temp_dir.split("/").pop())
-        for root, _, files in os.walk(output_folder):
-            for file in files:
-                s3.upload_file(
-                    os.path.join(output_folder, file),
+        renditions = []
+
+        def on_rendition(rendition_id, count):
+            renditions.append(rendition_id)
+            progress.add("fragments_signed", count)
+
+        try:
+            with timer.phase("sign"):
+                uploads = sign_ladder(
+                    s3,
+                    bucket,
+                    prefix,
+                    objects,
+                    mpd_path,
+                    manifest_path,
+                    temp_dir,
                     output_bucket,
-                    f"fragments/processed/{request.new_title}/{file}",
+                    output_prefix,
+                    download_callback=progress.counter("bytes_downloaded"),
+                    on_rendition=on_rendition,
                 )
+        except LadderError as e:
+            raise HTTPException(status_code=422, detail=str(e))
 
-        mpd_file_path = next(
-            (f for f in fragments if f.endswith(".mpd")),
-            None
-        )
-        if mpd_file_path:
-            logger.info(f"Uploading DASH Manifest file: {mpd_file_path}")
-            mpd_filename = os.path.basename(urlparse(mpd_file_path).path)
-            s3.upload_file(
-                os.path.join(temp_dir, mpd_file_path),
-                output_bucket,
-                f"fragments/processed/{request.new_title}/{mpd_filename}",
+        with timer.phase("upload"):
+            upload_files(
+                s3, uploads, output_bucket, callback=progress.counter("bytes_uploaded")
             )
+            upload_file(s3, mpd_path, output_bucket, f"{output_prefix}/{mpd_filename}")
+        timer.add_bytes("upload", sum(os.path.getsize(path) for path, _ in uploads))
+
+    return {
+        "saved_location": f"s3://{output_bucket}/{output_prefix}/",
+        "renditions": renditions,
+        "timings": timer.timings,
+    }
+
+
+def read_manifest(asset_url, pool=None):
+    """
+    Manifest JSON of asset_url. The probe reads through ranges; the reader
+    does too when hash verification is off, otherwise a signed asset is
+    downloaded once into a workspace. Repeat reads of the same object
+    version are served from the manifest cache, and parsing moves to pool
+    when one is given.
+    Raises NoManifestError when the asset isn't signed.
+    """
+    filename = urlparse(asset_url).path.split("/").pop()
+    extension = splitext(filename)[1]
+
+    try:
+        with phase("asset_open"):
+            source = open_range_reader(asset_url, s3)
+            identity = source.identity
+    except RangeNotSupportedError:
+        source, identity = None, None
+
+    with phase("manifest_cache"):
+        manifest_json = manifest_cache.get(identity) if identity else None
+    if manifest_json is not None:
+        print(f"Manifest cache hit for {filename}")
+        return manifest_json
+
+    if source is None:
+        with phase("asset_download"):
+            asset = http.get(asset_url)
+        add_bytes("asset_download", len(asset))
+        identity = content_identity(asset)
+        with phase("manifest_cache"):
+            manifest_json = manifest_cache.get(identity)
+        if manifest_json is not None:
+            return manifest_json
+        source = io.BytesIO(asset)
+        pool = None
+
+    # Unsigned assets are answered from the container headers alone
+    with phase("probe"):
+        has_manifest = probe_manifest(source, extension[1:])
+    if has_manifest is False:
+        raise NoManifestError(f"No C2PA manifest found in {filename}")
+
+    with scratch.workspace() as workspace:
+        asset_path = None
+        if reads_whole_asset() and hasattr(source, "download"):
+            # The reader passes over every byte more than once, which the
+            # block cache can't hold, so the asset is fetched once to disk
+            asset_path = os.path.join(workspace, f"asset{extension}")
+            with phase("asset_download"):
+                with open(asset_path, "wb") as f:
+                    source.download(f)
+            add_bytes("asset_download", source.size)
+
+        try:
+            with phase("read"):
+                if pool is not None and pool.enabled:
+                    manifest_json = pool.read(
+                        asset_url,
+                        extension[1:],
+                        getattr(source, "metadata", None),
+                        asset_path,
+                    )
+                elif asset_path is not None:
+                    with open(asset_path, "rb") as f:
+                        manifest_json = c2pa.Reader(extension[1:], f).json()
+                else:
+                    manifest_json = c2pa.Reader(extension[1:], source).json()
+                print(f"Manifest read, {getattr(source, 'bytes_fetched', 'all')} bytes fetched")
+        except C2PA_NOT_FOUND_ERRORS:
+            raise NoManifestError(f"No C2PA manifest found in {filename}")
+    if hasattr(source, "bytes_fetched"):
+        add_bytes("read", source.bytes_fetched)
+    manifest_cache.put(identity, manifest_json)
+    return manifest_json
 
 
-
-        return {"saved_location": f"s3://{output_bucket}/fragments/processed/{request.new_title}/"}
-
 ########################################################################
 ########################## /read_c2pa ##################################
 ########################################################################
@@ -265,13 +803,11 @@ class ReadFileEvent(BaseModel):
 
 @app.post("/read_file")
 async def read_file(readFileEvent: ReadFileEvent):
-    print(readFileEvent)
+    return await blocking.run("read_file", read_file_blocking, readFileEvent)
+
 
-    # Create the working directory if it doesn't exist
-    print(f"Creating c2pa folder -> {os.listdir()}")
-    directory_path = Path("c2pa")
-    directory_path.mkdir(parents=True, exist_ok=True)
-    print(f"c2pa folder created -> {os.listdir()}")
+def read_file_blocking(readFileEvent: ReadFileEvent):
+    print(readFileEvent)
 
     asset_url = readFileEvent.asset_url
     return_type = readFileEvent.return_type
@@ -279,35 +815,153 @@ async def read_file(readFileEvent: ReadFileEvent):
     filename = urlparse(asset_url).path.split("/").pop()
     filename_no_extension, extension = splitext(filename)
 
-    reader = c2pa.Reader(extension[1:], io.BytesIO(request.urlopen(asset_url).read()))
-    match return_type:
-        case "json":
-            return json.loads(reader.json())
-        case "presigned_url":
-            with open("c2pa/manifest.json", "w") as f:
-                json.dump(json.loads(reader.json()), f, indent=2)
-                print(f"Downloading asset_url")
-
-            # Upload the manifest json
-            print(f"{datetime.now()}: Uploading manifest json...")
-            s3.upload_file(
-                "c2pa/manifest.json",
-                output_bucket,
-                f"{filename_no_extension}/read_c2pa.json",
-            )
-            print("Manifest upload complete")
-            presigned_url = s3.generate_presigned_url(
-                "get_object",
-                Params={
-                    "Bucket": output_bucket,
-                    "Key": f"{filename_no_extension}/read_c2pa.json",
-                },
+    with PhaseTimer("read_file"):
+        try:
+            manifest_json = read_manifest(asset_url)
+        except NoManifestError as e:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+        match return_type:
+            case "json":
+                return json.loads(manifest_json)
+            case "presigned_url":
+                with scratch.workspace() as workspace:
+                    manifest_path = os.path.join(workspace, "manifest.json")
+                    with phase("tmp_write"):
+                        with open(manifest_path, "w") as f:
+                            json.dump(json.loads(manifest_json), f, indent=2)
+                            print(f"Downloading asset_url")
+
+                    # Upload the manifest json
+                    print(f"{datetime.now()}: Uploading manifest json...")
+                    with phase("upload"):
+                        upload_file(
+                            s3,
+                            manifest_path,
+                            output_bucket,
+                            f"{filename_no_extension}/read_c2pa.json",
+                        )
+                    add_bytes("upload", os.path.getsize(manifest_path))
+                print("Manifest upload complete")
+                with phase("presign"):
+                    presigned_url = s3.generate_presigned_url(
+                        "get_object",
+                        Params={
+                            "Bucket": output_bucket,
+                            "Key": f"{filename_no_extension}/read_c2pa.json",
+                        },
+                    )
+                print(f"Presigned URL created")
+
+                return {"presigned_url": presigned_url}
+            case _:
+                raise HTTPException(
+                    status_code=status.HTTP_412_PRECONDITION_FAILED,
+                    detail='return_type is invalid. Must be either "json" or "presigned_url"',
+                )
+
+
+########################################################################
+########################## /read_batch #################################
+########################################################################
+class ReadBatchEvent(BaseModel):
+    asset_urls: List[str]
+
+
+@app.post("/read_batch")
+async def read_batch(readBatchEvent: ReadBatchEvent):
+    """
+    Streams one NDJSON line per asset as soon as its manifest is read,
+    in completion order; each line carries the asset's index in the request
+    """
+    if len(readBatchEvent.asset_urls) > READ_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"A batch can contain at most {READ_BATCH_MAX_ITEMS} assets",
+        )
+
+    async def read_item(index, asset_url):
+        try:
+            manifest_json = await blocking.run(
+                "read_batch", read_manifest, asset_url, reading_pool
             )
-            print(f"Presigned URL created")
-
-            return {"presigned_url": presigned_url}
-        case _:
-            raise HTTPException(
-                status_code=status.HTTP_412_PRECONDITION_FAILED,
-                detail='return_type is invalid. Must be either "json" or "presigned_url"',
-            )
\ No newline at end of file
+            return {
+                "index": index,
+                "asset_url": asset_url,
+                "has_manifest": True,
+                "manifest": json.loads(manifest_json),
+            }
+        except NoManifestError:
+            return {
+                "index": index,
+                "asset_url": asset_url,
+                "has_manifest": False,
+                "manifest": None,
+            }
+        except Exception as e:
+            return {"index": index, "asset_url": asset_url, "error": str(e)}
+
+    async def results():
+        tasks = [
+            asyncio.ensure_future(read_item(index, asset_url))
+            for index, asset_url in enumerate(readBatchEvent.asset_urls)
+        ]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield json.dumps(await task) + "\n"
+        finally:
+            # Client went away: don't keep reading for nobody
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
+########################################################################
+############################### /jobs ##################################
+########################################################################
+class SignFileJobEvent(SignFileEvent):
+    # The finished job is POSTed here when set
+    callback_url: str | None = None
+
+
+class SignFmp4JobEvent(SignFmp4Event):
+    callback_url: str | None = None
+
+
+def submit_job(kind, fn, event):
+    try:
+        job = job_queue.submit(kind, fn, event, callback_url=event.callback_url)
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=str(e)
+        )
+    return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=job)
+
+
+@app.post("/jobs/sign_file")
+async def submit_sign_file_job(signFileJobEvent: SignFileJobEvent):
+    """
+    Queue a /sign_file request and return its job straight away;
+    poll GET /jobs/{job_id} for progress and the result
+    """
+    return await blocking.run(
+        "jobs", submit_job, "sign_file", sign_file_blocking, signFileJobEvent
+    )
+
+
+@app.post("/jobs/sign_fmp4")
+async def submit_sign_fmp4_job(signFmp4JobEvent: SignFmp4JobEvent):
+    return await blocking.run(
+        "jobs", submit_job, "sign_fmp4", sign_fmp4_blocking, signFmp4JobEvent
+    )
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = await blocking.run("jobs", job_store.get, job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=f"No job {job_id}"
+        )
+    return job
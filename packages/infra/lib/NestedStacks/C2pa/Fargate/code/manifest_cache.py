@@ -0,0 +1,132 @@
+from botocore.exceptions import ClientError
+from collections import OrderedDict
+
+import threading
+import logging
+import hashlib
+import c2pa
+import json
+import os
+
+logger = logging.getLogger(__name__)
+
+MAX_BYTES = int(os.environ.get("manifest_cache_max_mb", "64")) * 1024 * 1024
+PERSISTENT = os.environ.get("manifest_cache_persistent", "false").lower() == "true"
+PERSISTENT_PREFIX = ".c2pa-cache/manifests"
+VERIFY_HASHES = os.environ.get("read_verify_hashes", "true").lower() == "true"
+
+
+_range_reads = False
+
+
+def configure_reader_verification(verify_hashes=VERIFY_HASHES):
+    """
+    Hash verification makes c2pa.Reader read the whole asset, several times
+    over. With it turned off the reader only fetches the ranges it parses;
+    signatures are still checked. Needs a c2pa-python with load_settings,
+    which 0.6.1 doesn't have; see reads_whole_asset().
+    """
+    global _range_reads
+    if verify_hashes:
+        return
+    load_settings = getattr(c2pa, "load_settings", None)
+    if load_settings is None:
+        logger.warning("This c2pa-python build cannot disable hash verification")
+        return
+    load_settings(json.dumps({"verify": {"verify_after_reading": False}}), "json")
+    _range_reads = True
+
+
+def reads_whole_asset():
+    """
+    Whether c2pa.Reader reads every byte of the asset, in which case the
+    asset should be downloaded once after the probe rather than read
+    through ranges
+    """
+    return not _range_reads
+
+
+def content_identity(data):
+    return f"sha256:{hashlib.sha256(data).hexdigest()}"
+
+
+class ManifestCache:
+    """
+    Content-addressed cache of manifest JSON returned by c2pa.Reader.
+    The in-process tier is an LRU bounded by the total size of the cached
+    documents. When persistent, misses fall through to (and fills write to)
+    JSON objects in the output bucket, so other tasks and cold starts share
+    the parsed manifests.
+    """
+
+    def __init__(self, s3=None, bucket=None, max_bytes=MAX_BYTES, persistent=PERSISTENT):
+        self.s3 = s3
+        self.bucket = bucket
+        self.max_bytes = max_bytes
+        self.persistent = persistent and s3 is not None and bucket is not None
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _digest(identity):
+        return hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+    def get(self, identity):
+        digest = self._digest(identity)
+        with self._lock:
+            if digest in self._entries:
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                return self._entries[digest]
+
+        manifest_json = self._get_persistent(digest)
+        with self._lock:
+            if manifest_json is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        self._put_memory(digest, manifest_json)
+        return manifest_json
+
+    def put(self, identity, manifest_json):
+        digest = self._digest(identity)
+        self._put_memory(digest, manifest_json)
+        if self.persistent:
+            try:
+                self.s3.put_object(
+                    Bucket=self.bucket,
+                    Key=f"{PERSISTENT_PREFIX}/{digest}.json",
+                    Body=manifest_json.encode("utf-8"),
+                    ContentType="application/json",
+                )
+            except ClientError as e:
+                logger.warning(f"Could not persist manifest cache entry: {e}")
+
+    def _put_memory(self, digest, manifest_json):
+        size = len(manifest_json)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if digest in self._entries:
+                self._size -= len(self._entries.pop(digest))
+            self._entries[digest] = manifest_json
+            self._size += size
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def _get_persistent(self, digest):
+        if not self.persistent:
+            return None
+        try:
+            response = self.s3.get_object(
+                Bucket=self.bucket, Key=f"{PERSISTENT_PREFIX}/{digest}.json"
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] not in ("NoSuchKey", "404"):
+                logger.warning(f"Manifest cache lookup failed: {e}")
+            return None
+        return response["Body"].read().decode("utf-8")
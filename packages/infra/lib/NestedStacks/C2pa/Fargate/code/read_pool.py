@@ -0,0 +1,91 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from manifest_cache import configure_reader_verification
+from streams import open_range_reader
+from transfer import create_s3_client
+from sign_pool import available_cpus
+
+import multiprocessing
+import threading
+import logging
+import c2pa
+import os
+
+logger = logging.getLogger(__name__)
+
+READING_WORKERS = int(os.environ.get("reading_workers", available_cpus()))
+
+
+########################################################################
+############################ Worker side ###############################
+########################################################################
+_worker_s3 = None
+
+
+def _init_worker():
+    global _worker_s3
+    _worker_s3 = create_s3_client()
+    configure_reader_verification()
+
+
+def _read_task(asset_url, format, metadata, asset_path):
+    if asset_path is not None:
+        with open(asset_path, "rb") as source:
+            return c2pa.Reader(format, source).json()
+    source = open_range_reader(asset_url, _worker_s3, metadata=metadata)
+    return c2pa.Reader(format, source).json()
+
+
+########################################################################
+############################ Parent side ###############################
+########################################################################
+class ReadingPool:
+    """
+    Pool of processes that parse manifests for /read_batch. Workers read
+    the copy the parent downloaded when there is one, otherwise they open
+    their own range readers from the URL and the metadata the parent's
+    reader already probed, so they skip the HEAD. Only the manifest JSON
+    comes back.
+    """
+
+    def __init__(self, workers=READING_WORKERS):
+        self.workers = workers
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.workers > 0
+
+    def start(self):
+        with self._lock:
+            if self._pool is None and self.enabled:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                )
+                logger.info(f"Reading pool started with {self.workers} workers")
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def read(self, asset_url, format, metadata=None, asset_path=None):
+        """
+        Manifest JSON of an asset, parsed in a worker process from asset_path
+        when given, otherwise through ranges of asset_url. metadata is the
+        parent reader's, so the worker doesn't probe again.
+        """
+        self.start()
+        pool = self._pool
+        future = pool.submit(_read_task, asset_url, format, metadata, asset_path)
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            with self._lock:
+                if self._pool is pool:
+                    self._pool = None
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
@@ -0,0 +1,267 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import threading
+import tempfile
+import logging
+import hashlib
+import shutil
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+SCRATCH_DIR = os.environ.get(
+    "scratch_dir", os.path.join(tempfile.gettempdir(), "c2pa-scratch")
+)
+# Budget for workspaces and cache together; defaults to 80% of the filesystem
+SCRATCH_MAX_MB = os.environ.get("scratch_max_mb")
+SCRATCH_CACHE_MB = int(os.environ.get("scratch_cache_mb", "1024"))
+SCRATCH_RECLAIM_INTERVAL = float(
+    os.environ.get("scratch_reclaim_interval_seconds", "30")
+)
+
+
+def _tree_size(path):
+    """
+    Bytes used by the files under path; files removed meanwhile are skipped
+    """
+    total = 0
+    try:
+        entries = list(os.scandir(path))
+    except (FileNotFoundError, NotADirectoryError):
+        return 0
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                total += _tree_size(entry.path)
+            else:
+                total += entry.stat(follow_symlinks=False).st_size
+        except FileNotFoundError:
+            pass
+    return total
+
+
+class ScratchCache:
+    """
+    Size-bounded LRU of reusable artifacts (thumbnails, ...) kept on disk
+    between requests, keyed by any string. Writes are atomic, so readers
+    never see a partial entry. Eviction is left to the reclaimer of the
+    owning ScratchSpace; a put only tells it when the cache is over budget.
+    """
+
+    def __init__(self, directory, max_bytes, on_full=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._on_full = on_full
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @property
+    def size(self):
+        return self._size
+
+    def _path(self, key):
+        return os.path.join(
+            self.directory, hashlib.sha256(key.encode()).hexdigest()
+        )
+
+    def load(self):
+        """
+        Index the entries left by a previous process, oldest use first
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.startswith("."):
+                # A write interrupted before its rename
+                os.remove(entry.path)
+                continue
+            stat = entry.stat()
+            entries.append((stat.st_atime, entry.name, stat.st_size))
+        with self._lock:
+            for _, name, size in sorted(entries):
+                self._entries[name] = size
+                self._size += size
+
+    def get(self, key):
+        """
+        The cached bytes for key, or None
+        """
+        path = self._path(key)
+        name = os.path.basename(path)
+        with self._lock:
+            if name not in self._entries:
+                return None
+            self._entries.move_to_end(name)
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            # Evicted between the lookup and the read
+            return None
+
+    def put(self, key, data):
+        path = self._path(key)
+        name = os.path.basename(path)
+        if len(data) > self.max_bytes:
+            return
+        temp_path = None
+        try:
+            fd, temp_path = tempfile.mkstemp(prefix=".", dir=self.directory)
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not cache {key}: {e}")
+            if temp_path is not None and os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+        with self._lock:
+            self._size += len(data) - self._entries.pop(name, 0)
+            self._entries[name] = len(data)
+            full = self._size > self.max_bytes
+        if full and self._on_full is not None:
+            self._on_full()
+
+    def evict(self, target_bytes):
+        """
+        Remove least recently used entries until the cache holds at most
+        target_bytes; returns the bytes freed
+        """
+        freed = 0
+        while True:
+            with self._lock:
+                if self._size <= target_bytes or not self._entries:
+                    return freed
+                name, size = self._entries.popitem(last=False)
+                self._size -= size
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            freed += size
+
+
+class ScratchSpace:
+    """
+    Local disk for request work files. Every request gets its own workspace
+    directory, so concurrent requests never share a path, and reusable
+    artifacts go to a size-bounded LRU cache that survives between
+    requests on a warm container or task.
+
+    Requests never wait for deletes: a finished workspace is renamed into
+    the trash, and a background reclaimer empties the trash and evicts from
+    the cache when the cache or the whole scratch space is over budget.
+    """
+
+    def __init__(
+        self,
+        root=SCRATCH_DIR,
+        max_bytes=None,
+        cache_bytes=SCRATCH_CACHE_MB * 1024 * 1024,
+        reclaim_interval=SCRATCH_RECLAIM_INTERVAL,
+    ):
+        if max_bytes is None and SCRATCH_MAX_MB is not None:
+            max_bytes = int(SCRATCH_MAX_MB) * 1024 * 1024
+        self.root = root
+        self.max_bytes = max_bytes
+        self.reclaim_interval = reclaim_interval
+        self._work = os.path.join(root, "work")
+        self._trash = os.path.join(root, "trash")
+        self.cache = ScratchCache(
+            os.path.join(root, "cache"), cache_bytes, on_full=self.reclaim
+        )
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+
+    def start(self):
+        """
+        Create the directories, queue what a previous process left behind
+        for deletion and start the reclaimer
+        """
+        if self._thread is not None:
+            return self
+        os.makedirs(self._trash, exist_ok=True)
+        if os.path.isdir(self._work):
+            os.rename(
+                self._work,
+                os.path.join(self._trash, f"work-{time.time_ns()}"),
+            )
+        os.makedirs(self._work)
+        self.cache.load()
+        if self.max_bytes is None:
+            self.max_bytes = int(shutil.disk_usage(self.root).total * 0.8)
+        self._stopping = False
+        self._thread = threading.Thread(
+            target=self._reclaimer, name="scratch-reclaimer", daemon=True
+        )
+        self._thread.start()
+        self.reclaim()
+        return self
+
+    def shutdown(self):
+        self._stopping = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    @contextmanager
+    def workspace(self):
+        """
+        A fresh directory for one request, handed to the reclaimer once the
+        request is done with it
+        """
+        path = tempfile.mkdtemp(dir=self._work)
+        try:
+            yield path
+        finally:
+            try:
+                os.rename(path, os.path.join(self._trash, os.path.basename(path)))
+            except OSError as e:
+                logger.warning(f"Could not move workspace {path} to trash: {e}")
+            self.reclaim()
+
+    def reclaim(self):
+        """
+        Wake the reclaimer
+        """
+        self._wake.set()
+
+    def usage(self):
+        """
+        Bytes used by workspaces, trash and cache
+        """
+        return _tree_size(self._work) + _tree_size(self._trash) + self.cache.size
+
+    def _reclaimer(self):
+        while not self._stopping:
+            self._wake.wait(self.reclaim_interval)
+            self._wake.clear()
+            try:
+                self._reclaim_once()
+            except Exception as e:
+                logger.warning(f"Scratch space reclamation failed: {e}")
+
+    def _reclaim_once(self):
+        for entry in os.scandir(self._trash):
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path, ignore_errors=True)
+            else:
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+        self.cache.evict(self.cache.max_bytes)
+        # Workspaces in use can't be reclaimed, so the cache makes room
+        over = self.usage() - self.max_bytes
+        if over > 0:
+            freed = self.cache.evict(max(self.cache.size - over, 0))
+            if freed < over:
+                logger.warning(
+                    f"Scratch space is {(over - freed) // (1024 * 1024)} MB over "
+                    f"budget with the cache empty"
+                )
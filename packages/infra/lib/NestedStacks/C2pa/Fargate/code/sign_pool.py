@@ -0,0 +1,180 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from signer import SignerCache
+
+import multiprocessing
+import threading
+import logging
+import boto3
+import c2pa
+import io
+import os
+
+logger = logging.getLogger(__name__)
+
+
+def available_cpus():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+SIGNING_WORKERS = int(os.environ.get("signing_workers", available_cpus()))
+
+
+def _as_stream(data):
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return io.BytesIO(data)
+    return data
+
+
+def make_builder(manifest_json, resources, ingredients):
+    """
+    c2pa.Builder with resources (identifier, data) and
+    ingredients (ingredient_json, format, data) added, where data is
+    either bytes or a readable stream
+    """
+    builder = c2pa.Builder(manifest_json)
+    for identifier, data in resources:
+        builder.add_resource(identifier, _as_stream(data))
+    for ingredient_json, format, data in ingredients:
+        builder.add_ingredient(ingredient_json, format, _as_stream(data))
+    return builder
+
+
+########################################################################
+############################ Worker side ###############################
+########################################################################
+_worker_signer_cache = None
+
+
+def _init_worker(private_key_id, certificate_id):
+    global _worker_signer_cache
+    _worker_signer_cache = SignerCache(
+        boto3.client("secretsmanager"), private_key_id, certificate_id
+    )
+    try:
+        _worker_signer_cache.get()
+    except Exception as e:
+        logger.warning(f"Worker signer warmup failed: {e}")
+
+
+def _sign_task(manifest_json, format, source_path, resources, ingredients, dest_path):
+    opened = []
+
+    def open_shared(path):
+        f = open(path, "rb")
+        opened.append(f)
+        return f
+
+    try:
+        builder = make_builder(
+            manifest_json,
+            [(identifier, open_shared(path)) for identifier, path in resources],
+            [(json, fmt, open_shared(path)) for json, fmt, path in ingredients],
+        )
+        with open(source_path, "rb") as source, open(dest_path, "w+b") as dest:
+            builder.sign(_worker_signer_cache.get(), format, source, dest)
+        return os.path.getsize(dest_path)
+    finally:
+        for f in opened:
+            f.close()
+
+
+########################################################################
+############################ Parent side ###############################
+########################################################################
+class _SharedFiles:
+    """
+    Writes each distinct buffer once into the request's scratch workspace,
+    so workers open files instead of unpickling the bytes from the
+    executor's pipe. The files go when the workspace is reclaimed.
+    (/dev/shm would save the disk write, but it is 64 MiB on Fargate.)
+    """
+
+    def __init__(self, directory):
+        self._dir = directory
+        self._paths = {}
+
+    def put(self, data):
+        if id(data) not in self._paths:
+            path = os.path.join(self._dir, f".sign-input-{len(self._paths)}")
+            with open(path, "wb") as f:
+                f.write(data)
+            self._paths[id(data)] = path
+        return self._paths[id(data)]
+
+
+class SigningPool:
+    """
+    Pool of signing processes sized to the task's vCPUs. Each worker holds its
+    own cached signer; requests hand their buffers over through files in
+    their workspace and workers write the signed asset straight to dest_path.
+    """
+
+    def __init__(self, private_key_id, certificate_id, workers=SIGNING_WORKERS):
+        self._initargs = (private_key_id, certificate_id)
+        self.workers = workers
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.workers > 0
+
+    def start(self):
+        with self._lock:
+            if self._pool is None and self.enabled:
+                # spawn: forking a process that already runs threads is unsafe
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=self._initargs,
+                )
+                logger.info(f"Signing pool started with {self.workers} workers")
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def sign(
+        self,
+        manifest_json,
+        format,
+        source,
+        resources,
+        ingredients,
+        dest_path,
+        workspace,
+    ):
+        """
+        Sign source (bytes) into dest_path in a worker process.
+        resources are (identifier, bytes), ingredients (json, format, bytes).
+        The inputs are staged in workspace, a scratch workspace directory.
+        Returns the size of the signed file.
+        """
+        self.start()
+        shared = _SharedFiles(workspace)
+        pool = self._pool
+        future = pool.submit(
+            _sign_task,
+            manifest_json,
+            format,
+            shared.put(source),
+            [(identifier, shared.put(data)) for identifier, data in resources],
+            [(json, fmt, shared.put(data)) for json, fmt, data in ingredients],
+            os.path.abspath(dest_path),
+        )
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM); start a fresh pool for later requests
+            with self._lock:
+                if self._pool is pool:
+                    self._pool = None
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+
@@ -0,0 +1,113 @@
+from instrumentation import phase
+from timestamp import timestamp_url
+
+import threading
+import logging
+import time
+import c2pa
+import os
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = int(os.environ.get("signer_cache_ttl_seconds", "300"))
+
+
+class SignerCache:
+    """
+    Process-wide cache of the c2pa signer built from Secrets Manager material.
+
+    Entries are keyed by the secret IDs and their version IDs. Once the TTL
+    elapses the secrets are fetched again; the existing signer is kept when
+    the versions are unchanged and rebuilt (notifying rotation listeners)
+    when they differ. The cache is safe to share between threads.
+    """
+
+    def __init__(self, secretsmanager, private_key_id, certificate_id, ttl=None):
+        self._secretsmanager = secretsmanager
+        self._private_key_id = private_key_id
+        self._certificate_id = certificate_id
+        self._ttl = DEFAULT_TTL_SECONDS if ttl is None else ttl
+        self._lock = threading.Lock()
+        self._signers = {}
+        self._current_key = None
+        self._loaded_at = 0.0
+        self._rotation_listeners = []
+
+    def add_rotation_listener(self, callback):
+        """
+        Register callback(old_key, new_key) to run when the secret versions change
+        """
+        self._rotation_listeners.append(callback)
+
+    def get(self):
+        """
+        Return the cached signer, refreshing it once the TTL has elapsed
+        """
+        if self._is_fresh():
+            return self._signers[self._current_key]
+
+        with self._lock:
+            # Another thread may have refreshed while we waited for the lock
+            if not self._is_fresh():
+                self._refresh()
+            return self._signers[self._current_key]
+
+    def invalidate(self):
+        """
+        Force the next get() to re-read the secrets, e.g. on a rotation event
+        """
+        with self._lock:
+            self._loaded_at = 0.0
+
+    def refresh(self):
+        with self._lock:
+            self._refresh()
+        return self._signers[self._current_key]
+
+    def _is_fresh(self):
+        return (
+            self._current_key is not None
+            and time.monotonic() - self._loaded_at < self._ttl
+        )
+
+    def _refresh(self):
+        with phase("secret_fetch"):
+            prv_key_value = self._secretsmanager.get_secret_value(
+                SecretId=self._private_key_id
+            )
+            cert_value = self._secretsmanager.get_secret_value(
+                SecretId=self._certificate_id
+            )
+        cache_key = (
+            self._private_key_id,
+            prv_key_value.get("VersionId"),
+            self._certificate_id,
+            cert_value.get("VersionId"),
+        )
+
+        if cache_key not in self._signers:
+            with phase("signer_build"):
+                self._signers = {
+                    cache_key: build_signer(
+                        prv_key_value["SecretString"].encode("utf-8"),
+                        cert_value["SecretString"].encode("utf-8"),
+                    )
+                }
+            logger.info(f"Signer built for secret versions {cache_key}")
+
+        previous_key = self._current_key
+        self._current_key = cache_key
+        self._loaded_at = time.monotonic()
+
+        if previous_key is not None and previous_key != cache_key:
+            for callback in self._rotation_listeners:
+                callback(previous_key, cache_key)
+
+
+def build_signer(key: bytes, cert: bytes):
+    def private_sign(data: bytes) -> bytes:
+        return c2pa.sign_ps256(data, key)
+
+    return c2pa.create_signer(
+        private_sign, c2pa.SigningAlg.PS256, cert, timestamp_url()
+    )
@@ -0,0 +1,412 @@
+from botocore.exceptions import ClientError
+from collections import OrderedDict
+from urllib.parse import urlparse
+from transfer import OWNED_BUCKETS, s3_location, upload_fileobj
+from http_client import HttpError, shared_client
+
+import tempfile
+import logging
+import io
+import os
+
+logger = logging.getLogger(__name__)
+
+MiB = 1024 * 1024
+BLOCK_SIZE = int(os.environ.get("stream_block_size_mb", "8")) * MiB
+MAX_CACHED_BLOCKS = int(os.environ.get("stream_cached_blocks", "4"))
+PART_SIZE = int(os.environ.get("stream_part_size_mb", "16")) * MiB
+READ_BLOCK_SIZE = int(os.environ.get("read_block_size_kb", "64")) * 1024
+READ_CACHED_BLOCKS = int(os.environ.get("read_cached_blocks", "64"))
+READ_AHEAD_BLOCKS = int(os.environ.get("read_ahead_blocks", "16"))
+
+
+class RangeNotSupportedError(Exception):
+    """
+    Raised when an origin ignores Range headers and returns the whole body
+    """
+
+
+class RangeReader(io.RawIOBase):
+    """
+    Seekable, read-only file object that fetches fixed-size blocks on demand
+    and keeps the most recently used ones in a small LRU cache, so memory
+    stays bounded by block_size * max_blocks regardless of object size.
+    When blocks are requested sequentially, up to readahead blocks are
+    fetched in one ranged request.
+    Subclasses implement _fetch(start, end) for an inclusive byte range and
+    set identity to a cache key for the object version (or None).
+    metadata holds what opening the object found out (size, validators,
+    content type); handing it to another reader of the same URL spares that
+    reader the HEAD or probe request.
+    """
+
+    identity = None
+    metadata = None
+
+    def __init__(
+        self,
+        size,
+        block_size=BLOCK_SIZE,
+        max_blocks=MAX_CACHED_BLOCKS,
+        readahead=1,
+    ):
+        super().__init__()
+        self.size = size
+        self.block_size = block_size
+        self.max_blocks = max_blocks
+        self.readahead = max(1, min(readahead, max_blocks))
+        self.bytes_fetched = 0
+        self.requests = 0
+        self._blocks = OrderedDict()
+        self._next_index = None
+        self._pos = 0
+
+    def _fetch(self, start, end) -> bytes:
+        raise NotImplementedError
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._pos + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if position < 0:
+            raise ValueError(f"Negative seek position {position}")
+        self._pos = position
+        return self._pos
+
+    def _block(self, index):
+        if index in self._blocks:
+            self._blocks.move_to_end(index)
+            return self._blocks[index]
+
+        count = self.readahead if index == self._next_index else 1
+        start = index * self.block_size
+        end = min(start + count * self.block_size, self.size) - 1
+        data = self._fetch(start, end)
+        self.bytes_fetched += len(data)
+        self.requests += 1
+
+        for offset in range(0, len(data), self.block_size):
+            self._blocks[index + offset // self.block_size] = data[
+                offset : offset + self.block_size
+            ]
+            self._next_index = index + offset // self.block_size + 1
+        while len(self._blocks) > self.max_blocks:
+            self._blocks.popitem(last=False)
+        return self._blocks[index]
+
+    def download(self, f, chunk_size=BLOCK_SIZE):
+        """
+        Copy the whole object into the writable file object f, chunk_size
+        bytes per ranged GET, for a consumer that reads every byte anyway.
+        Each byte is fetched once; through the block cache, a consumer that
+        passes over the object more than once would fetch it again each time.
+        """
+        for start in range(0, self.size, chunk_size):
+            data = self._fetch(start, min(start + chunk_size, self.size) - 1)
+            self.bytes_fetched += len(data)
+            self.requests += 1
+            f.write(data)
+        return f
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.size - self._pos
+        chunks = []
+        while size > 0 and self._pos < self.size:
+            index, offset = divmod(self._pos, self.block_size)
+            block = self._block(index)
+            chunk = block[offset : offset + size]
+            chunks.append(chunk)
+            self._pos += len(chunk)
+            size -= len(chunk)
+        return b"".join(chunks)
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+
+class S3RangeReader(RangeReader):
+    """
+    RangeReader over an S3 object using ranged GetObject requests.
+    Every range is pinned to the ETag seen at open time so a concurrent
+    overwrite fails loudly instead of producing a mixed read.
+    """
+
+    def __init__(self, s3, bucket, key, metadata=None, **kwargs):
+        if metadata is None:
+            head = s3.head_object(Bucket=bucket, Key=key)
+            metadata = {
+                "size": head["ContentLength"],
+                "etag": head["ETag"],
+                "content_type": head.get("ContentType"),
+            }
+        super().__init__(metadata["size"], **kwargs)
+        self.metadata = metadata
+        self.s3 = s3
+        self.bucket = bucket
+        self.key = key
+        self.etag = metadata["etag"]
+        self.content_type = metadata["content_type"]
+        self.identity = f"s3://{bucket}/{key}@{self.etag}"
+
+    def _fetch(self, start, end):
+        response = self.s3.get_object(
+            Bucket=self.bucket,
+            Key=self.key,
+            Range=f"bytes={start}-{end}",
+            IfMatch=self.etag,
+        )
+        return response["Body"].read()
+
+
+class HttpRangeReader(RangeReader):
+    """
+    RangeReader over an HTTP(S) URL, including presigned S3 URLs.
+    A one-byte probe discovers the size and validators; later ranges send
+    If-Range so a changed resource is detected instead of mixed.
+    """
+
+    def __init__(self, url, http=None, metadata=None, **kwargs):
+        self.http = http or shared_client()
+        if metadata is None:
+            probe = {"Range": "bytes=0-0"}
+            with self.http.stream("GET", url, probe) as response:
+                if response.status >= 400:
+                    raise HttpError(url, response.status, "error response")
+                content_range = response.headers.get("Content-Range")
+                if response.status != 206 or not content_range:
+                    raise RangeNotSupportedError(f"{url} does not support ranges")
+                metadata = {
+                    "size": int(content_range.rsplit("/", 1)[1]),
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                    "content_type": response.headers.get("Content-Type"),
+                }
+        super().__init__(metadata["size"], **kwargs)
+        self.metadata = metadata
+        self.etag = metadata["etag"]
+        self.last_modified = metadata["last_modified"]
+        self.content_type = metadata["content_type"]
+        self.url = url
+
+        validator = self.etag or self.last_modified
+        if validator:
+            url_config = urlparse(url)
+            self.identity = (
+                f"{url_config.netloc}{url_config.path}@{validator}@{self.size}"
+            )
+
+    def _fetch(self, start, end):
+        headers = {"Range": f"bytes={start}-{end}"}
+        if self.etag or self.last_modified:
+            headers["If-Range"] = self.etag or self.last_modified
+        with self.http.stream("GET", self.url, headers) as response:
+            if response.status >= 400:
+                raise HttpError(self.url, response.status, "error response")
+            if response.status != 206:
+                raise RangeNotSupportedError(f"{self.url} changed while reading")
+            return response.read()
+
+
+def open_range_reader(asset_url, s3, direct_buckets=OWNED_BUCKETS, **kwargs):
+    """
+    Lazy, seekable reader for an s3:// or HTTP(S) asset tuned for manifest
+    reads: small blocks, read-ahead for sequential scans.
+    Presigned URLs into direct_buckets are read with the S3 client, which
+    keeps its connections and retries, instead of over plain HTTP.
+    Pass metadata from an earlier reader of the same URL to skip the HEAD
+    or probe.
+    """
+    options = {
+        "block_size": READ_BLOCK_SIZE,
+        "max_blocks": READ_CACHED_BLOCKS,
+        "readahead": READ_AHEAD_BLOCKS,
+        **kwargs,
+    }
+    location = s3_location(asset_url)
+    if location is not None and (
+        urlparse(asset_url).scheme == "s3" or location[0] in direct_buckets
+    ):
+        return S3RangeReader(s3, *location, **options)
+    return HttpRangeReader(asset_url, **options)
+
+
+class S3MultipartWriter(io.RawIOBase):
+    """
+    Write-only file object that streams into an S3 multipart upload.
+
+    Only a window of at most two parts is held in memory. Seeking and
+    rewriting inside that window is allowed (some formats patch offsets
+    after writing); moving before bytes that were already uploaded raises
+    io.UnsupportedOperation so the caller can fall back to a spooled upload.
+    Objects smaller than one part are sent with a single PutObject.
+    """
+
+    def __init__(self, s3, bucket, key, part_size=PART_SIZE, extra_args=None):
+        super().__init__()
+        self.s3 = s3
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size
+        self.extra_args = extra_args or {}
+        self._buffer = bytearray()
+        self._flushed = 0
+        self._pos = 0
+        self._upload_id = None
+        self._parts = []
+        self.rewind_failed = False
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    @property
+    def size(self):
+        return self._flushed + len(self._buffer)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._pos + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if position < self._flushed:
+            self.rewind_failed = True
+            raise io.UnsupportedOperation(
+                f"Cannot seek to {position}, bytes before {self._flushed} were already uploaded"
+            )
+        self._pos = position
+        return self._pos
+
+    def write(self, data):
+        offset = self._pos - self._flushed
+        end = offset + len(data)
+        if end > len(self._buffer):
+            self._buffer.extend(bytes(end - len(self._buffer)))
+        self._buffer[offset:end] = data
+        self._pos += len(data)
+
+        # Keep one part of slack behind the write head for short back-seeks
+        while len(self._buffer) >= 2 * self.part_size:
+            self._upload_part(bytes(self._buffer[: self.part_size]))
+            del self._buffer[: self.part_size]
+            self._flushed += self.part_size
+        return len(data)
+
+    def _upload_part(self, body):
+        if self._upload_id is None:
+            self._upload_id = self.s3.create_multipart_upload(
+                Bucket=self.bucket, Key=self.key, **self.extra_args
+            )["UploadId"]
+        part_number = len(self._parts) + 1
+        response = self.s3.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self._upload_id,
+            PartNumber=part_number,
+            Body=body,
+        )
+        self._parts.append({"PartNumber": part_number, "ETag": response["ETag"]})
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if self._upload_id is None:
+                self.s3.put_object(
+                    Bucket=self.bucket,
+                    Key=self.key,
+                    Body=bytes(self._buffer),
+                    **self.extra_args,
+                )
+            else:
+                if self._buffer:
+                    self._upload_part(bytes(self._buffer))
+                self.s3.complete_multipart_upload(
+                    Bucket=self.bucket,
+                    Key=self.key,
+                    UploadId=self._upload_id,
+                    MultipartUpload={"Parts": self._parts},
+                )
+            self._buffer = bytearray()
+        finally:
+            super().close()
+
+    def __del__(self):
+        # Never publish a half-written object from the garbage collector
+        if not self.closed:
+            self.abort()
+
+    def abort(self):
+        """
+        Discard everything written so far without creating the object
+        """
+        if self._upload_id is not None:
+            try:
+                self.s3.abort_multipart_upload(
+                    Bucket=self.bucket, Key=self.key, UploadId=self._upload_id
+                )
+            except ClientError as e:
+                # The bucket's lifecycle rule is the backstop for the parts;
+                # the caller's fallback or error matters more than this one
+                logger.warning(
+                    f"Could not abort the multipart upload of {self.key}: {e}"
+                )
+            self._upload_id = None
+        self._buffer = bytearray()
+        super().close()
+
+
+# Formats whose signer needed to rewind past an uploaded part; these go
+# straight to the spooled path on later requests.
+_spooled_formats = set()
+
+
+def sign_to_s3(sign, format, s3, bucket, key, extra_args=None):
+    """
+    Call sign(dest) with dest streaming into s3://bucket/key.
+    If the signer has to rewind into bytes that were already uploaded, the
+    multipart upload is aborted and signing is retried into a spooled
+    temporary file that only touches disk above PART_SIZE * 2.
+    """
+    if format not in _spooled_formats:
+        writer = S3MultipartWriter(s3, bucket, key, extra_args=extra_args)
+        try:
+            sign(writer)
+            writer.close()
+            return
+        except Exception:
+            writer.abort()
+            if not writer.rewind_failed:
+                raise
+        logger.info(f"Format {format} rewinds its output, falling back to spooling")
+        _spooled_formats.add(format)
+
+    with tempfile.SpooledTemporaryFile(max_size=PART_SIZE * 2) as spool:
+        sign(spool)
+        spool.seek(0)
+        upload_fileobj(s3, spool, bucket, key, extra_args)
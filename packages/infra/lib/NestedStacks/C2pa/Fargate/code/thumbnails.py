@@ -0,0 +1,203 @@
+from collections import OrderedDict
+
+import subprocess
+import threading
+import tempfile
+import logging
+import hashlib
+import shutil
+import io
+import os
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+MAX_DIMENSION = int(os.environ.get("thumbnail_max_dimension", "512"))
+QUALITY = int(os.environ.get("thumbnail_quality", "75"))
+# Larger thumbnails are re-encoded at a lower quality, then a smaller size,
+# and left out if they still don't fit
+MAX_THUMBNAIL_BYTES = int(os.environ.get("thumbnail_max_kb", "48")) * 1024
+MIN_QUALITY = 40
+MIN_DIMENSION = 128
+FORMAT = os.environ.get("thumbnail_format", "jpeg").lower()
+CACHE_BYTES = int(os.environ.get("thumbnail_cache_mb", "32")) * 1024 * 1024
+POSTER_OFFSET_SECONDS = os.environ.get("thumbnail_poster_offset_seconds", "1")
+
+VIDEO_FORMATS = {"mp4", "m4v", "mov", "avi", "webm", "mkv"}
+_MIME_TYPES = {"jpeg": "image/jpeg", "webp": "image/webp"}
+
+
+class Thumbnail:
+    def __init__(self, data, format):
+        self.data = data
+        # MIME type, as used for the manifest's thumbnail format
+        self.format = format
+
+
+def _encode_within(image, max_dimension, quality, format, max_bytes):
+    """
+    image encoded at max_dimension and quality, stepping the quality down to
+    MIN_QUALITY and then halving the size until it fits in max_bytes.
+    None when even the smallest encoding is too large.
+    """
+    while max_dimension >= MIN_DIMENSION:
+        resized = image.copy()
+        resized.thumbnail((max_dimension, max_dimension))
+        for step in range(quality, MIN_QUALITY - 1, -15):
+            output = io.BytesIO()
+            resized.save(output, format=format.upper(), quality=step)
+            if output.tell() <= max_bytes:
+                return output.getvalue()
+        max_dimension //= 2
+    return None
+
+
+def _image_thumbnail(data, max_dimension, quality, format, max_bytes):
+    with Image.open(io.BytesIO(data)) as image:
+        # JPEG decodes straight to the nearest DCT scale at or above the
+        # target, so large photos never get decoded at full resolution
+        image.draft("RGB", (max_dimension, max_dimension))
+        image.thumbnail((max_dimension, max_dimension))
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        return _encode_within(image, max_dimension, quality, format, max_bytes)
+
+
+def _poster_frame(data, extension, max_dimension, quality, format):
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        return None
+    with tempfile.NamedTemporaryFile(suffix=f".{extension}") as source:
+        source.write(data)
+        source.flush()
+        result = subprocess.run(
+            [
+                ffmpeg,
+                "-loglevel", "error",
+                "-ss", POSTER_OFFSET_SECONDS,
+                "-i", source.name,
+                "-frames:v", "1",
+                "-vf",
+                f"scale='min({max_dimension},iw)':'min({max_dimension},ih)'"
+                ":force_original_aspect_ratio=decrease",
+                "-q:v", str(max(2, 31 - quality * 29 // 100)),
+                "-f", "image2pipe",
+                "-c:v", "mjpeg" if format == "jpeg" else "libwebp",
+                "-",
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+    if result.returncode != 0 or not result.stdout:
+        logger.warning(f"Poster frame extraction failed: {result.stderr[-500:]}")
+        return None
+    return result.stdout
+
+
+class ThumbnailCache:
+    """
+    Bounded-size thumbnails for manifest resources, cached by a hash of the
+    source. Images are downscaled with Pillow, videos get a poster frame
+    from ffmpeg when it is installed. Thumbnails are kept under
+    max_thumbnail_bytes by lowering the quality, then the size. Returns None
+    when no thumbnail can be made or none fits, in which case the manifest
+    carries no thumbnail rather than a full-size copy of the asset.
+
+    disk_cache, a ScratchCache, keeps thumbnails evicted from memory on
+    local disk, so a warm container rarely has to make one twice.
+    """
+
+    def __init__(
+        self,
+        max_dimension=MAX_DIMENSION,
+        quality=QUALITY,
+        format=FORMAT,
+        max_bytes=CACHE_BYTES,
+        max_thumbnail_bytes=MAX_THUMBNAIL_BYTES,
+        disk_cache=None,
+    ):
+        self.max_dimension = max_dimension
+        self.quality = quality
+        self.format = format if format in _MIME_TYPES else "jpeg"
+        self.max_bytes = max_bytes
+        self.max_thumbnail_bytes = max_thumbnail_bytes
+        self.disk_cache = disk_cache
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, data, extension):
+        extension = extension.lower()
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            if digest in self._entries:
+                self._entries.move_to_end(digest)
+                return self._entries[digest]
+
+        disk_key = (
+            f"thumbnail/{digest}/{self.max_dimension}/{self.quality}"
+            f"/{self.max_thumbnail_bytes}/{self.format}"
+        )
+        if self.disk_cache is not None:
+            cached = self.disk_cache.get(disk_key)
+            if cached is not None:
+                thumbnail = Thumbnail(cached, _MIME_TYPES[self.format])
+                self._remember(digest, thumbnail)
+                return thumbnail
+
+        thumbnail = self._make(data, extension)
+        if thumbnail is not None:
+            self._remember(digest, thumbnail)
+            if self.disk_cache is not None:
+                self.disk_cache.put(disk_key, thumbnail.data)
+        return thumbnail
+
+    def _remember(self, digest, thumbnail):
+        if len(thumbnail.data) > self.max_bytes:
+            return
+        with self._lock:
+            if digest not in self._entries:
+                self._entries[digest] = thumbnail
+                self._size += len(thumbnail.data)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted.data)
+
+    def _make(self, data, extension):
+        try:
+            if extension in VIDEO_FORMATS:
+                thumbnail = _poster_frame(
+                    data, extension, self.max_dimension, self.quality, self.format
+                )
+                if thumbnail is not None and len(thumbnail) > self.max_thumbnail_bytes:
+                    thumbnail = (
+                        _image_thumbnail(
+                            thumbnail,
+                            self.max_dimension,
+                            self.quality,
+                            self.format,
+                            self.max_thumbnail_bytes,
+                        )
+                        if Image is not None
+                        else None
+                    )
+            elif Image is not None:
+                thumbnail = _image_thumbnail(
+                    data,
+                    self.max_dimension,
+                    self.quality,
+                    self.format,
+                    self.max_thumbnail_bytes,
+                )
+            else:
+                thumbnail = None
+        except Exception as e:
+            logger.warning(f"Could not make a thumbnail for a .{extension}: {e}")
+            thumbnail = None
+        if thumbnail is None:
+            return None
+        return Thumbnail(thumbnail, _MIME_TYPES[self.format])
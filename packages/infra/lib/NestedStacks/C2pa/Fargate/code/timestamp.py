@@ -0,0 +1,204 @@
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from http_client import HttpClient, HttpError, HTTP_CONNECT_TIMEOUT
+from instrumentation import PhaseTimer
+
+import threading
+import logging
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+# Comma-separated RFC 3161 TSAs, tried in order. Empty signs without a timestamp.
+TIMESTAMP_AUTHORITY_URLS = [
+    url.strip()
+    for url in os.environ.get(
+        "timestamp_authority_url", "http://timestamp.digicert.com"
+    ).split(",")
+    if url.strip()
+]
+TIMESTAMP_AUTHORITY_TIMEOUT = float(
+    os.environ.get("timestamp_authority_timeout_seconds", "5")
+)
+# A TSA that failed is only tried again after this, unless all others fail too
+TIMESTAMP_AUTHORITY_COOLDOWN = float(
+    os.environ.get("timestamp_authority_cooldown_seconds", "30")
+)
+# Route the signer's TSA requests through the in-process proxy
+TIMESTAMP_AUTHORITY_PROXY = (
+    os.environ.get("timestamp_authority_proxy", "true").lower() == "true"
+)
+
+TIMESTAMP_QUERY = "application/timestamp-query"
+TIMESTAMP_REPLY = "application/timestamp-reply"
+
+
+class TimestampError(Exception):
+    """
+    Raised when no timestamp authority answered
+    """
+
+
+class TimestampAuthorities:
+    """
+    RFC 3161 timestamp authorities with failover. Each request goes to the
+    first TSA that hasn't failed in the last cooldown seconds; one that
+    errors or doesn't answer within timeout is skipped for the cooldown and
+    the next one is tried. TSAs still cooling down are the last resort.
+    Connections to the TSAs are kept alive between requests.
+
+    Every request is reported as a "timestamp" operation with a
+    tsa_round_trip phase, and a tsa_failed phase for the time lost on
+    TSAs that failed first.
+    """
+
+    def __init__(
+        self,
+        urls,
+        timeout=TIMESTAMP_AUTHORITY_TIMEOUT,
+        cooldown=TIMESTAMP_AUTHORITY_COOLDOWN,
+        http=None,
+    ):
+        self.urls = list(urls)
+        self.cooldown = cooldown
+        # Failover replaces retries: another TSA is a better bet than the same one
+        self._http = http or HttpClient(
+            connect_timeout=min(timeout, HTTP_CONNECT_TIMEOUT),
+            read_timeout=timeout,
+            retries=0,
+        )
+        self._lock = threading.Lock()
+        self._failed_until = {}
+
+    def candidates(self):
+        """
+        The TSAs in the order to try them: healthy ones first
+        """
+        now = time.monotonic()
+        with self._lock:
+            cooling = {
+                url for url, until in self._failed_until.items() if until > now
+            }
+        healthy = [url for url in self.urls if url not in cooling]
+        return healthy + [url for url in self.urls if url in cooling]
+
+    def request(self, query: bytes) -> bytes:
+        """
+        DER TimeStampResp for the DER TimeStampReq query
+        """
+        with PhaseTimer("timestamp") as timer:
+            errors = []
+            for url in self.candidates():
+                start = time.perf_counter()
+                try:
+                    response = self._http.post(
+                        url,
+                        query,
+                        {"Content-Type": TIMESTAMP_QUERY, "Accept": TIMESTAMP_REPLY},
+                    )
+                except HttpError as e:
+                    timer.record("tsa_failed", time.perf_counter() - start)
+                    logger.warning(f"Timestamp authority {url} failed: {e}")
+                    errors.append(f"{url}: {e}")
+                    with self._lock:
+                        self._failed_until[url] = time.monotonic() + self.cooldown
+                    continue
+                timer.record("tsa_round_trip", time.perf_counter() - start)
+                timer.add_bytes("tsa_round_trip", len(response.data))
+                with self._lock:
+                    self._failed_until.pop(url, None)
+                return response.data
+            raise TimestampError(
+                f"No timestamp authority answered: {'; '.join(errors)}"
+            )
+
+    def warm(self):
+        """
+        Open a kept-alive connection to the first TSA, so the first
+        timestamp doesn't pay for the connection set-up
+        """
+        url = self.candidates()[0]
+        try:
+            self._http.request("GET", url)
+        except HttpError:
+            # Most TSAs only answer POST; the connection is open either way
+            pass
+
+
+class _ProxyHandler(BaseHTTPRequestHandler):
+    authorities = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        query = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        try:
+            reply = self.authorities.request(query)
+            status, content_type = 200, TIMESTAMP_REPLY
+        except TimestampError as e:
+            logger.error(str(e))
+            reply = str(e).encode()
+            status, content_type = 502, "text/plain"
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+
+class TimestampProxy:
+    """
+    Loopback endpoint handed to the c2pa signer in place of a TSA URL. The
+    signer can only be given one URL and makes its own connection for every
+    request; behind the proxy its requests get the failover, timeouts,
+    kept-alive connections and latency metrics of TimestampAuthorities.
+    """
+
+    def __init__(self, authorities):
+        self.authorities = authorities
+        handler = type("ProxyHandler", (_ProxyHandler,), {"authorities": authorities})
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}/"
+
+    def start(self):
+        threading.Thread(
+            target=self._server.serve_forever, name="timestamp-proxy", daemon=True
+        ).start()
+        return self
+
+    def shutdown(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+_proxy = None
+_proxy_lock = threading.Lock()
+
+
+def timestamp_url():
+    """
+    TSA URL for c2pa.create_signer: None without TSAs, the process's
+    proxy when it is enabled, the first configured TSA otherwise
+    """
+    global _proxy
+    if not TIMESTAMP_AUTHORITY_URLS:
+        return None
+    if not TIMESTAMP_AUTHORITY_PROXY:
+        return TIMESTAMP_AUTHORITY_URLS[0]
+    with _proxy_lock:
+        if _proxy is None:
+            _proxy = TimestampProxy(
+                TimestampAuthorities(TIMESTAMP_AUTHORITY_URLS)
+            ).start()
+    return _proxy.url
+
+
+def warm():
+    """
+    Connect to the first TSA ahead of the first signature, when the proxy
+    is running
+    """
+    if _proxy is not None:
+        _proxy.authorities.warm()
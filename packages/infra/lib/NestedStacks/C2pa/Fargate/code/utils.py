@@ -2,8 +2,6 @@ from fastapi.responses import PlainTextResponse
 from fastapi import Request
 
 import subprocess
-import datetime
-import glob
 import sys
 import os
 import shutil
@@ -32,13 +30,6 @@ async def unhandled_exception_handler(
     return PlainTextResponse(str(exc), status_code=500)
 
 
-def garbage_collect_folder(pattern):
-    print(f"{datetime.datetime.now()}: Cleaning up pattern {pattern}")
-    files = glob.glob(pattern)
-    for f in files:
-        os.remove(f)
-    print(f"{datetime.datetime.now()}: Finished!")
-
 def run_c2pa_command_for_fmp4(init_file, fragments_glob, output_dir, manifest_file):
     """
     Run c2patool command for fragmented MP4 files with manifest
@@ -65,27 +56,16 @@ def run_c2pa_command_for_fmp4(init_file, fragments_glob, output_dir, manifest_fi
     print(f"{' '.join(command)}")
     print("=" * 50 + "\n")
 
-    # Run command and capture output in real-time
-    process = subprocess.Popen(
+    # Run command and log its output once it exits
+    completed = subprocess.run(
         command,
         stdout=subprocess.PIPE,
         stderr=subprocess.STDOUT,
         universal_newlines=True,
     )
-
-    # Store the complete output
-    full_output = []
-
-    # Print and store output in real-time
-    for line in process.stdout:
-        print(line, end="")  # Print in real-time
-        full_output.append(line)
-
-    # Wait for process to complete and get return code
-    return_code = process.wait()
-
-    # Join all output lines
-    output = "".join(full_output)
+    return_code = completed.returncode
+    output = completed.stdout
+    print(output, end="")
 
     if return_code != 0:
         error_message = (
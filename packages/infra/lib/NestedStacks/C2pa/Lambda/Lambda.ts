@@ -2,6 +2,7 @@ import * as cdk from "aws-cdk-lib";
 
 import * as s3 from "aws-cdk-lib/aws-s3";
 import * as ec2 from "aws-cdk-lib/aws-ec2";
+import * as iam from "aws-cdk-lib/aws-iam";
 import * as lambda from "aws-cdk-lib/aws-lambda";
 import * as ecrAssets from "aws-cdk-lib/aws-ecr-assets";
 import * as secretsmanager from "aws-cdk-lib/aws-secretsmanager";
@@ -52,13 +53,18 @@ export class Lambda extends Construct {
       ),
       functionName: `${stack.stackName}-c2pa-lambda`,
       timeout: cdk.Duration.minutes(5),
+      // Jobs run in asynchronous self-invocations; a failed job is reported, not retried
+      retryAttempts: 0,
       vpc,
       environment: {
         output_bucket: backendStorageBucket.bucketName,
         input_bucket: uiStorageBucket.bucketName,
         certificate: certificate.secretName,
         private_key: private_key.secretName,
+        // Per-phase timings as CloudWatch metrics and X-Ray subsegments
+        metrics_exporters: "emf,xray",
       },
+      tracing: lambda.Tracing.ACTIVE,
       /************************ Compute & Memory Allocation *************************/
       // https://docs.aws.amazon.com/lambda/latest/operatorguide/computing-power.html
       memorySize: 10240,
@@ -69,6 +75,16 @@ export class Lambda extends Construct {
     uiStorageBucket.grantReadWrite(lambdaC2pa);
     certificate.grantRead(lambdaC2pa);
     private_key.grantRead(lambdaC2pa);
+    // Built from the function name: referencing the function's ARN from its own
+    // role would be a circular dependency
+    lambdaC2pa.addToRolePolicy(
+      new iam.PolicyStatement({
+        actions: ["lambda:InvokeFunction"],
+        resources: [
+          `arn:${stack.partition}:lambda:${stack.region}:${stack.account}:function:${stack.stackName}-c2pa-lambda`,
+        ],
+      })
+    );
 
     NagSuppressions.addResourceSuppressions(
       lambdaC2pa,
@@ -81,7 +97,7 @@ export class Lambda extends Construct {
         {
           id: "AwsSolutions-IAM5",
           reason:
-            "Wildcards are granted due to L2 methods .grantReadWrite .grantRead",
+            "Wildcards are granted due to L2 methods .grantReadWrite .grantRead and X-Ray tracing",
         },
       ],
       true
@@ -0,0 +1,132 @@
+from instrumentation import PhaseTimer
+
+import threading
+import logging
+import time
+import os
+
+try:
+    # Provided by the Lambda Python runtime when SnapStart is enabled
+    from snapshot_restore_py import register_before_snapshot, register_after_restore
+except ImportError:
+    register_before_snapshot = None
+    register_after_restore = None
+
+logger = logging.getLogger(__name__)
+
+# Build the signer and open the S3 and TSA connections while the
+# environment initialises; read-only deployments can skip the secret fetch
+WARM_SIGNER_ON_INIT = os.environ.get("warm_signer_on_init", "true").lower() == "true"
+# How long init waits for the warmup before handing over to the first request
+WARMUP_TIMEOUT_SECONDS = float(os.environ.get("warmup_timeout_seconds", "5"))
+
+
+class ColdStart(PhaseTimer):
+    """
+    Breakdown of this execution environment's init: one phase per import
+    group, client and warmup step. It is exported once, as a "cold_start"
+    operation, when the first invocation arrives; after a SnapStart
+    restore the steps redone on restore are reported as "snapstart_restore".
+    """
+
+    def __init__(self):
+        super().__init__("cold_start")
+        self._started = time.perf_counter()
+        self._init_seconds = None
+        self._reported = False
+        self._report_lock = threading.Lock()
+
+    def finish(self):
+        """
+        Mark the end of init
+        """
+        self._init_seconds = time.perf_counter() - self._started
+
+    def restarted(self, operation):
+        """
+        Start a new breakdown, e.g. after a SnapStart restore
+        """
+        with self._report_lock:
+            self.operation = operation
+            self.timings = {}
+            self.bytes = {}
+            self._started = time.perf_counter()
+            self._init_seconds = None
+            self._reported = False
+
+    def report(self):
+        """
+        Export the breakdown, once per init or restore
+        """
+        with self._report_lock:
+            if self._reported:
+                return
+            self._reported = True
+        self.export(total=self._init_seconds)
+
+
+class LazyClient:
+    """
+    boto3 client created on first use, so routes that never call the
+    service don't pay for it during init
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._client = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._factory()
+        return getattr(self._client, name)
+
+
+class Warmup:
+    """
+    Runs the warmup steps on a background thread, so the network round
+    trips they wait on overlap with the rest of init. Each step is timed as
+    a phase of cold_start; a failing step is logged and left to the first
+    request that needs it.
+    """
+
+    def __init__(self, cold_start, steps):
+        self._cold_start = cold_start
+        self._steps = steps
+        self._thread = None
+
+    def _run(self):
+        for name, step in self._steps:
+            try:
+                with self._cold_start.phase(name):
+                    step()
+            except Exception as e:
+                logger.warning(f"Warmup step {name} failed, will retry on use: {e}")
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="warmup", daemon=True)
+        self._thread.start()
+        return self
+
+    def wait(self, timeout=WARMUP_TIMEOUT_SECONDS):
+        """
+        Wait up to timeout for the warmup; the rest finishes in the
+        background during the first invocation
+        """
+        with self._cold_start.phase("warmup_wait"):
+            self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+
+def register_snapstart_hooks(before_snapshot, after_restore):
+    """
+    Register the SnapStart runtime hooks. A no-op where the runtime doesn't
+    provide them (container images, SnapStart disabled).
+    """
+    if register_before_snapshot is None:
+        return False
+    register_before_snapshot(before_snapshot)
+    register_after_restore(after_restore)
+    return True
@@ -0,0 +1,74 @@
+from transfer import OWNED_BUCKETS, download_fileobj, s3_location
+from http_client import shared_client
+
+import threading
+import io
+
+
+class RequestFetcher:
+    """
+    Per-request fetch layer that downloads every URL at most once.
+    The same buffer is handed out for thumbnails, ingredients and signing,
+    and the number of bytes pulled from the origin is tracked for logging.
+    Safe to share between threads; concurrent callers wait for one download.
+    When an s3 client is given, presigned URLs into direct_buckets are
+    downloaded with it, in parallel parts for large objects.
+    """
+
+    def __init__(self, http=None, s3=None, direct_buckets=OWNED_BUCKETS):
+        self.http = http or shared_client()
+        self.s3 = s3
+        self.direct_buckets = direct_buckets
+        self._buffers = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self.origin_bytes = 0
+        self.origin_fetches = 0
+
+    def get(self, url) -> bytes:
+        """
+        Return the content of url, downloading it only on first use
+        """
+        if url in self._buffers:
+            return self._buffers[url]
+
+        with self._lock:
+            url_lock = self._locks.setdefault(url, threading.Lock())
+        with url_lock:
+            if url not in self._buffers:
+                data = self._download(url)
+                with self._lock:
+                    self.origin_bytes += len(data)
+                    self.origin_fetches += 1
+                self._buffers[url] = data
+        return self._buffers[url]
+
+    def _download(self, url):
+        location = s3_location(url) if self.s3 is not None else None
+        if location is not None and location[0] in self.direct_buckets:
+            buffer = io.BytesIO()
+            download_fileobj(self.s3, *location, buffer)
+            return buffer.getvalue()
+        return self.http.get(url)
+
+    def stream(self, url) -> io.BytesIO:
+        """
+        Return a fresh file-like view over the cached content of url.
+        BytesIO shares the underlying bytes until it is written to.
+        """
+        return io.BytesIO(self.get(url))
+
+    def add_origin_traffic(self, amount, fetches=1):
+        """
+        Count bytes pulled from the origin around the fetcher, e.g. by the
+        range reader of a streaming sign
+        """
+        with self._lock:
+            self.origin_bytes += amount
+            self.origin_fetches += fetches
+
+    def stats(self):
+        return {
+            "origin_fetches": self.origin_fetches,
+            "origin_bytes": self.origin_bytes,
+        }
@@ -0,0 +1,214 @@
+from concurrent.futures import ThreadPoolExecutor
+from transfer import TRANSFER_CONCURRENCY, download_object, wait_all
+from utils import run_c2pa_command_for_fmp4
+from xml.etree import ElementTree
+
+import posixpath
+import logging
+import re
+import os
+
+logger = logging.getLogger(__name__)
+
+# c2patool runs as its own process, so one per core
+LADDER_WORKERS = int(os.environ.get("ladder_workers", os.cpu_count() or 1))
+
+_IDENTIFIER = re.compile(
+    r"\$(RepresentationID|Bandwidth|Number|Time|SubNumber)?(%0\d+d)?\$"
+)
+
+
+class LadderError(Exception):
+    """
+    Raised when the MPD can't be mapped onto the objects under the prefix
+    """
+
+
+class Rendition:
+    """
+    One DASH Representation: its init segment and the media segments that
+    belong to it, as paths relative to the MPD
+    """
+
+    def __init__(self, representation_id, base, initialization, media, bandwidth):
+        self.id = representation_id
+        self.base = base
+        self.bandwidth = bandwidth
+        self.init = posixpath.join(base, self._expand(initialization, None))
+        media_directory, media = posixpath.split(media)
+        self.media_base = posixpath.join(base, self._expand(media_directory, None))
+        self.media_glob = self._expand(media, "*")
+        self._media = re.compile(self._expand(media, r"\d+", escape=True))
+
+    def _expand(self, template, number, escape=False):
+        parts, position = [], 0
+        for match in _IDENTIFIER.finditer(template):
+            literal = template[position : match.start()]
+            parts.append(re.escape(literal) if escape else literal)
+            name = match.group(1)
+            if name == "RepresentationID":
+                value = self.id
+            elif name == "Bandwidth":
+                value = str(self.bandwidth)
+            elif name is None:
+                value = "$"
+            elif number is None:
+                raise LadderError(f"Initialization template uses ${name}$")
+            else:
+                parts.append(number)
+                position = match.end()
+                continue
+            parts.append(re.escape(value) if escape else value)
+            position = match.end()
+        literal = template[position:]
+        parts.append(re.escape(literal) if escape else literal)
+        return "".join(parts)
+
+    def is_segment(self, relative_path):
+        directory, name = posixpath.split(relative_path)
+        if directory != self.media_base.rstrip("/"):
+            return False
+        return self._media.fullmatch(name) is not None
+
+
+def _child(element, name):
+    return element.find(f"{{*}}{name}")
+
+
+def _base_url(*elements):
+    base = ""
+    for element in elements:
+        url = _child(element, "BaseURL")
+        if url is not None and url.text:
+            base = posixpath.join(base, url.text.strip())
+    return base
+
+
+def parse_ladder(mpd):
+    """
+    Renditions of every Representation that uses a SegmentTemplate, with
+    BaseURL and template inheritance from AdaptationSet and Period applied
+    """
+    root = ElementTree.fromstring(mpd)
+    renditions = []
+    for period in root.iterfind("{*}Period"):
+        for adaptation in period.iterfind("{*}AdaptationSet"):
+            for representation in adaptation.iterfind("{*}Representation"):
+                template = {}
+                for element in (adaptation, representation):
+                    segment_template = _child(element, "SegmentTemplate")
+                    if segment_template is not None:
+                        template.update(segment_template.attrib)
+                if "initialization" not in template or "media" not in template:
+                    raise LadderError(
+                        f"Representation {representation.get('id')} "
+                        "has no SegmentTemplate"
+                    )
+                renditions.append(
+                    Rendition(
+                        representation.get("id"),
+                        _base_url(root, period, adaptation, representation),
+                        template["initialization"],
+                        template["media"],
+                        representation.get("bandwidth", ""),
+                    )
+                )
+    if not renditions:
+        raise LadderError("The MPD has no representations")
+    return renditions
+
+
+def sign_ladder(
+    s3,
+    bucket,
+    prefix,
+    objects,
+    mpd_path,
+    manifest_path,
+    workspace,
+    output_bucket,
+    output_prefix,
+    sign=run_c2pa_command_for_fmp4,
+    workers=LADDER_WORKERS,
+    concurrency=TRANSFER_CONCURRENCY,
+    download_callback=None,
+    on_rendition=None,
+):
+    """
+    Sign every rendition of the ladder described by the MPD at mpd_path.
+    objects are the listing entries under prefix (the MPD's directory). Each
+    rendition is downloaded and signed in its own workspace, up to workers
+    at a time. Nothing is uploaded until every rendition has signed; the
+    caller uploads the returned (local_path, key) pairs, keeping each file's
+    path relative to the MPD under output_prefix.
+    on_rendition(rendition_id, fragment_count) is called as each one signs.
+    """
+    with open(mpd_path, "rb") as f:
+        renditions = parse_ladder(f.read())
+    keys = {
+        posixpath.relpath(obj["Key"], prefix) if prefix else obj["Key"]
+        for obj in objects
+    }
+
+    def sign_rendition(index, rendition):
+        if rendition.init not in keys:
+            raise LadderError(
+                f"Init segment {rendition.init} of {rendition.id} not found"
+            )
+        segments = sorted(path for path in keys if rendition.is_segment(path))
+        if not segments:
+            raise LadderError(f"No segments found for representation {rendition.id}")
+
+        # Representations often share file names, so each gets its own directory
+        rendition_dir = os.path.join(workspace, f"rendition-{index:03d}")
+        output_dir = os.path.join(workspace, f"rendition-{index:03d}-out")
+        os.makedirs(rendition_dir)
+        wait_all(
+            [
+                transfers.submit(
+                    download_object,
+                    s3,
+                    bucket,
+                    posixpath.join(prefix, path),
+                    os.path.join(rendition_dir, posixpath.basename(path)),
+                    download_callback,
+                )
+                for path in [rendition.init, *segments]
+            ]
+        )
+
+        success, output = sign(
+            init_file=os.path.join(
+                rendition_dir, posixpath.basename(rendition.init)
+            ),
+            fragments_glob=os.path.join(rendition_dir, rendition.media_glob),
+            output_dir=output_dir,
+            manifest_file=manifest_path,
+        )
+        if not success:
+            raise LadderError(f"C2PA signing failed for {rendition.id}: {output}")
+        if on_rendition is not None:
+            on_rendition(rendition.id, len(segments))
+
+        relative = {
+            posixpath.basename(path): path for path in [rendition.init, *segments]
+        }
+        return [
+            (os.path.join(root, file), f"{output_prefix}/{relative[file]}")
+            for root, _, files in os.walk(output_dir)
+            for file in files
+            if file in relative
+        ]
+
+    with ThreadPoolExecutor(max_workers=concurrency) as transfers, ThreadPoolExecutor(
+        max_workers=workers
+    ) as rendition_pool:
+        uploads = wait_all(
+            [
+                rendition_pool.submit(sign_rendition, index, rendition)
+                for index, rendition in enumerate(renditions)
+            ]
+        )
+
+    logger.info(f"Signed {len(renditions)} renditions")
+    return [upload for rendition_uploads in uploads for upload in rendition_uploads]
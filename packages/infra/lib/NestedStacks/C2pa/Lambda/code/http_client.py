@@ -0,0 +1,287 @@
+from contextlib import contextmanager
+from urllib.parse import urlparse
+from importlib.util import find_spec
+
+import threading
+import logging
+import urllib3
+import random
+import time
+import os
+
+# Only needed for HTTP/2, so imported on first use by _load_httpx
+httpx = None
+
+logger = logging.getLogger(__name__)
+
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("http_connect_timeout", "5"))
+HTTP_READ_TIMEOUT = float(os.environ.get("http_read_timeout", "30"))
+HTTP_RETRIES = int(os.environ.get("http_retries", "3"))
+HTTP_BACKOFF_SECONDS = float(os.environ.get("http_backoff_seconds", "0.25"))
+HTTP_BACKOFF_MAX_SECONDS = float(os.environ.get("http_backoff_max_seconds", "5"))
+HTTP_MAX_CONNECTIONS_PER_HOST = int(
+    os.environ.get("http_max_connections_per_host", "10")
+)
+HTTP_MAX_HOSTS = int(os.environ.get("http_max_hosts", "20"))
+# HTTP/2 needs httpx with the h2 extra installed (pip install "httpx[http2]")
+HTTP2 = os.environ.get("http2", "false").lower() == "true"
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+
+def _load_httpx():
+    global httpx
+    if httpx is None:
+        try:
+            import httpx as module
+        except ImportError:
+            return None
+        httpx = module
+    return httpx
+
+
+class HttpError(Exception):
+    """
+    Raised when a URL answers with an error status, or can't be reached
+    once the retries are used up (status is None then)
+    """
+
+    def __init__(self, url, status, reason):
+        # Presigned query strings are credentials, keep them out of logs
+        url_config = urlparse(url)
+        self.url = f"{url_config.scheme}://{url_config.netloc}{url_config.path}"
+        self.status = status
+        self.reason = reason
+        super().__init__(f"{self.url}: {status or 'request failed'} {reason}")
+
+
+class HttpResponse:
+    def __init__(self, status, headers, raw, read, close):
+        self.status = status
+        # Case-insensitive
+        self.headers = headers
+        self._raw = raw
+        self._read = read
+        self._close = close
+
+    def read(self) -> bytes:
+        return self._read(self._raw)
+
+    def close(self):
+        self._close(self._raw)
+
+
+class _Urllib3Transport:
+    transient_errors = (urllib3.exceptions.HTTPError, OSError)
+
+    def __init__(self, connect_timeout, read_timeout, per_host, max_hosts):
+        self._pool = urllib3.PoolManager(
+            num_pools=max_hosts,
+            maxsize=per_host,
+            block=True,
+            timeout=urllib3.Timeout(connect=connect_timeout, read=read_timeout),
+            retries=False,
+        )
+
+    def send(self, method, url, headers, body):
+        response = self._pool.request(
+            method, url, headers=headers, body=body, preload_content=False
+        )
+        return HttpResponse(
+            response.status, response.headers, response, self._read, self._close
+        )
+
+    @staticmethod
+    def _read(response):
+        try:
+            return response.read()
+        finally:
+            response.release_conn()
+
+    @staticmethod
+    def _close(response):
+        # Unread bodies can't go back to the pool, so the connection is dropped
+        response.close()
+        response.release_conn()
+
+
+class _HttpxTransport:
+    def __init__(self, connect_timeout, read_timeout, per_host, max_hosts):
+        self.transient_errors = (httpx.TransportError, OSError)
+        self._client = httpx.Client(
+            http2=True,
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(
+                max_connections=per_host * max_hosts,
+                max_keepalive_connections=per_host * max_hosts,
+            ),
+        )
+
+    def send(self, method, url, headers, body):
+        response = self._client.send(
+            self._client.build_request(method, url, headers=headers, content=body),
+            stream=True,
+        )
+        return HttpResponse(
+            response.status_code, response.headers, response, self._read, self._close
+        )
+
+    @staticmethod
+    def _read(response):
+        try:
+            return response.read()
+        finally:
+            response.close()
+
+    @staticmethod
+    def _close(response):
+        response.close()
+
+
+def _retry_after(headers):
+    value = headers.get("Retry-After")
+    try:
+        return float(value) if value else None
+    except ValueError:
+        # HTTP-date form, fall back to our own backoff
+        return None
+
+
+class HttpClient:
+    """
+    Pooled HTTP(S) client used for every URL the services fetch: assets,
+    assertions documents, ingredients, ranged reads and job callbacks.
+    Connections are kept alive and limited per host, every request has a
+    connect and a read timeout, and connection errors, timeouts and
+    429/5xx answers are retried with full-jitter exponential backoff
+    (honouring Retry-After). Non-idempotent requests are only retried when
+    the connection failed before anything was sent. With http2=True and
+    httpx[http2] installed, requests go over HTTP/2 instead.
+    """
+
+    def __init__(
+        self,
+        connect_timeout=HTTP_CONNECT_TIMEOUT,
+        read_timeout=HTTP_READ_TIMEOUT,
+        retries=HTTP_RETRIES,
+        backoff=HTTP_BACKOFF_SECONDS,
+        backoff_max=HTTP_BACKOFF_MAX_SECONDS,
+        max_connections_per_host=HTTP_MAX_CONNECTIONS_PER_HOST,
+        max_hosts=HTTP_MAX_HOSTS,
+        http2=HTTP2,
+    ):
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        transport = _Urllib3Transport
+        if http2:
+            if _load_httpx() is None or find_spec("h2") is None:
+                logger.warning("HTTP/2 requested but httpx[http2] is not installed")
+            else:
+                transport = _HttpxTransport
+        self.http2 = transport is _HttpxTransport
+        self._transport = transport(
+            connect_timeout, read_timeout, max_connections_per_host, max_hosts
+        )
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retried = 0
+
+    def _sleep(self, attempt, retry_after=None):
+        delay = random.uniform(0, min(self.backoff_max, self.backoff * 2**attempt))
+        if retry_after is not None:
+            delay = min(self.backoff_max, max(delay, retry_after))
+        with self._lock:
+            self.retried += 1
+        time.sleep(delay)
+
+    def _send(self, method, url, headers, body):
+        """
+        Send with retries on connection errors and retryable statuses.
+        Returns an HttpResponse whose body hasn't been read.
+        """
+        idempotent = method in IDEMPOTENT_METHODS
+        for attempt in range(self.retries + 1):
+            last_attempt = attempt == self.retries
+            with self._lock:
+                self.requests += 1
+            try:
+                response = self._transport.send(method, url, headers, body)
+            except self._transport.transient_errors as e:
+                connect_failed = isinstance(
+                    e, (urllib3.exceptions.NewConnectionError, ConnectionRefusedError)
+                ) or (httpx is not None and isinstance(e, httpx.ConnectError))
+                if last_attempt or not (idempotent or connect_failed):
+                    raise HttpError(url, None, str(e)) from e
+                logger.info(f"Retrying {method} after {type(e).__name__}")
+                self._sleep(attempt)
+                continue
+            if response.status in RETRY_STATUSES and idempotent and not last_attempt:
+                response.close()
+                logger.info(f"Retrying {method} after HTTP {response.status}")
+                self._sleep(attempt, _retry_after(response.headers))
+                continue
+            return response
+
+    @contextmanager
+    def stream(self, method, url, headers=None, body=None):
+        """
+        Response with its body left unread, for callers that only need the
+        status and headers or read the body themselves. Error statuses are
+        returned, not raised.
+        """
+        response = self._send(method, url, headers or {}, body)
+        try:
+            yield response
+        finally:
+            response.close()
+
+    def request(self, method, url, headers=None, body=None) -> HttpResponse:
+        """
+        Send a request and read the whole body, which is available as
+        response.data. Raises HttpError for 4xx/5xx answers. Reads that
+        time out or get cut off are retried like failed connections.
+        """
+        for attempt in range(self.retries + 1):
+            response = self._send(method, url, headers or {}, body)
+            try:
+                response.data = response.read()
+            except self._transport.transient_errors as e:
+                if attempt == self.retries or method not in IDEMPOTENT_METHODS:
+                    raise HttpError(url, response.status, str(e)) from e
+                logger.info(f"Retrying {method} after a failed read: {e}")
+                self._sleep(attempt)
+                continue
+            if response.status >= 400:
+                raise HttpError(url, response.status, "error response")
+            return response
+
+    def get(self, url, headers=None) -> bytes:
+        return self.request("GET", url, headers).data
+
+    def post(self, url, body, headers=None) -> HttpResponse:
+        return self.request("POST", url, headers, body)
+
+    def stats(self):
+        return {
+            "http2": self.http2,
+            "requests": self.requests,
+            "retried": self.retried,
+        }
+
+
+_shared_client = None
+_shared_lock = threading.Lock()
+
+
+def shared_client() -> HttpClient:
+    """
+    Process-wide HttpClient, so every fetch shares one connection pool
+    """
+    global _shared_client
+    if _shared_client is None:
+        with _shared_lock:
+            if _shared_client is None:
+                _shared_client = HttpClient()
+    return _shared_client
@@ -1,43 +1,143 @@
-import os
-import io
-import c2pa
-import json
-import glob
-import boto3
-import tempfile
-import mimetypes
-
-from urllib import request
-from os.path import splitext, dirname, basename, join as path_join
-from urllib.parse import urlparse
-from datetime import datetime
-from utils import (
-    run_c2pa_command_for_fmp4
-)
-
-from pydantic import BaseModel
-from typing import List
+from coldstart import ColdStart, LazyClient, Warmup, register_snapstart_hooks
 
-from aws_lambda_powertools import Logger, Tracer
-from aws_lambda_powertools.logging import correlation_paths
-from aws_lambda_powertools.utilities.typing import LambdaContext
-from aws_lambda_powertools.event_handler import LambdaFunctionUrlResolver
-from aws_lambda_powertools.event_handler.exceptions import ServiceError
+# Started first so the breakdown covers the imports below
+cold_start = ColdStart()
 
+with cold_start.phase("import_libraries"):
+    import os
+    import io
+    import c2pa
+    import json
+    import boto3
+    import mimetypes
 
+    from os.path import splitext, dirname, basename, join as path_join
+    from urllib.parse import urlparse
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    from datetime import datetime
 
-tracer = Tracer()
-logger = Logger(level="DEBUG")
-app = LambdaFunctionUrlResolver(enable_validation=True)
+    from pydantic import BaseModel
+    from typing import List
 
-s3 = boto3.client("s3")
-secretsmanager = boto3.client("secretsmanager")
+with cold_start.phase("import_service"):
+    from utils import run_c2pa_command_for_fmp4
+    from fetch import RequestFetcher
+    from http_client import shared_client
+    from signer import SignerCache
+    from transfer import (
+        create_s3_client,
+        download_fileobj,
+        download_object,
+        download_prefix,
+        list_prefix,
+        upload_file,
+        upload_files,
+    )
+    from streams import (
+        S3RangeReader,
+        RangeNotSupportedError,
+        open_range_reader,
+        sign_to_s3,
+    )
+    from fmp4_state import StreamState, StateConflictError, fragment_sequence
+    from fmp4_pipeline import (
+        sign_fragments_pipelined,
+        ChunkSigningError,
+        ChunkedMpdError,
+    )
+    from fmp4_ladder import sign_ladder, LadderError
+    from manifest_template import ManifestTemplateCache
+    from thumbnails import ThumbnailCache
+    from scratch import ScratchSpace
+    from manifest_cache import (
+        ManifestCache,
+        content_identity,
+        configure_reader_verification,
+        reads_whole_asset,
+    )
+    from probe import probe_manifest, NoManifestError, C2PA_NOT_FOUND_ERRORS
+    from jobs import JobProgress, S3JobStore, new_job, run_job
+    from instrumentation import PhaseTimer, phase, add_bytes
+    from coldstart import WARM_SIGNER_ON_INIT
+    import timestamp
 
 input_bucket = os.environ["input_bucket"]
 output_bucket = os.environ["output_bucket"]
 certificate = os.environ["certificate"]
 private_key = os.environ["private_key"]
 
+SIGN_BATCH_WORKERS = int(os.environ.get("sign_batch_workers", os.cpu_count() or 1))
+SIGN_BATCH_MAX_ITEMS = int(os.environ.get("sign_batch_max_items", "500"))
+READ_BATCH_MAX_ITEMS = int(os.environ.get("read_batch_max_items", "5000"))
+READ_BATCH_CONCURRENCY = int(os.environ.get("read_batch_concurrency", "32"))
+
+with cold_start.phase("s3_client"):
+    s3 = create_s3_client()
+# Only signing reads secrets and only job submission invokes the function
+secretsmanager = LazyClient(lambda: boto3.client("secretsmanager"))
+lambda_client = LazyClient(lambda: boto3.client("lambda"))
+http = shared_client()
+
+signer_cache = SignerCache(secretsmanager, private_key, certificate)
+
+
+def warmup_steps():
+    """
+    Network round trips worth taking before the first request: the signer
+    (Secrets Manager), the S3 connection and the TSA connection
+    """
+    steps = []
+    if WARM_SIGNER_ON_INIT:
+        steps.append(("warm_signer", signer_cache.get))
+    steps.append(("warm_s3", lambda: s3.head_bucket(Bucket=output_bucket)))
+    steps.append(("warm_timestamp", timestamp.warm))
+    return steps
+
+
+# Runs while the Powertools, routing and cache set-up below use the CPU
+warmup = Warmup(cold_start, warmup_steps()).start()
+
+with cold_start.phase("powertools"):
+    from aws_lambda_powertools import Logger, Tracer
+    from aws_lambda_powertools.logging import correlation_paths
+    from aws_lambda_powertools.utilities.typing import LambdaContext
+    from aws_lambda_powertools.event_handler import LambdaFunctionUrlResolver, Response
+    from aws_lambda_powertools.event_handler.exceptions import ServiceError
+
+    tracer = Tracer()
+    logger = Logger(level="DEBUG")
+    app = LambdaFunctionUrlResolver(enable_validation=True)
+
+manifest_cache = ManifestCache(s3, output_bucket)
+configure_reader_verification()
+# Jobs run in asynchronous self-invocations, so their state lives in S3
+job_store = S3JobStore(s3, output_bucket)
+
+manifest_templates = ManifestTemplateCache()
+# /tmp outlives invocations: per-request workspaces, reusable artifacts and
+# reclamation on a background thread instead of a wipe per invocation
+with cold_start.phase("scratch"):
+    scratch = ScratchSpace().start()
+thumbnails = ThumbnailCache(disk_cache=scratch.cache)
+
+if not warmup.wait():
+    logger.info("Warmup still running, continuing it in the background")
+cold_start.finish()
+
+
+def before_snapshot():
+    # Restored environments re-read the secrets rather than all sharing the
+    # signer, and the TSA session, captured in the snapshot
+    signer_cache.invalidate()
+
+
+def after_restore():
+    cold_start.restarted("snapstart_restore")
+    Warmup(cold_start, warmup_steps()).start().wait()
+    cold_start.finish()
+
+
+register_snapstart_hooks(before_snapshot, after_restore)
 
 
 class SignFileEvent(BaseModel):
@@ -45,126 +145,287 @@ class SignFileEvent(BaseModel):
     asset_url: str
     assertions_json_url: str
     ingredients_url: List[str] | None = None
+    # Stream the asset from S3 and the signed output into a multipart upload
+    streaming: bool = False
 
 @app.post("/sign_file")
 def sign_file(signFileEvent: SignFileEvent):
-    new_title = signFileEvent.new_title
-    asset_url = signFileEvent.asset_url
-    assertions_json_url = signFileEvent.assertions_json_url
-    assertions_json = json.loads(request.urlopen(assertions_json_url).read())
-    ingredients_url = signFileEvent.ingredients_url
+    return run_sign_file(signFileEvent)
+
+
+def run_sign_file(signFileEvent: SignFileEvent, progress=None):
+    progress = progress or JobProgress()
+    with PhaseTimer("sign_file", on_phase=progress.set_phase):
+        fetcher = RequestFetcher(s3=s3)
+        template = load_manifest_template(signFileEvent.assertions_json_url)
+        presigned_url = sign_asset(
+            signFileEvent.new_title,
+            signFileEvent.asset_url,
+            template,
+            signFileEvent.ingredients_url,
+            signFileEvent.streaming,
+            fetcher,
+            progress=progress,
+        )
+    return {"manifest": presigned_url}
+
+
+def load_manifest_template(assertions_json_url):
+    """
+    Cached, pre-serialized manifest for an assertions document
+    """
+    try:
+        with phase("assertions_fetch"):
+            return manifest_templates.get(assertions_json_url)
+    except ValueError as e:
+        raise ServiceError(
+            status_code=422, msg=f"Invalid assertions document: {e}"
+        )
+
+
+def sign_asset(
+    new_title,
+    asset_url,
+    template,
+    ingredients_url,
+    streaming,
+    fetcher,
+    ingredient_fetcher=None,
+    progress=None,
+):
+    """
+    Sign one asset and upload it to the output bucket, returning a presigned
+    URL. Ingredients come from ingredient_fetcher so a batch can share them.
+    Each step is timed as a phase of the current operation.
+    """
+    progress = progress or JobProgress()
+    ingredient_fetcher = ingredient_fetcher or fetcher
 
     filename = urlparse(asset_url).path.split("/").pop()
     filename_no_extension, extension = splitext(filename)
 
-    manifest_json = json.dumps(
-        {
-            "title": new_title,
-            "assertions": [
-                {
-                    "label": "stds.schema-org.CreativeWork",
-                    "data": {
-                        "@context": "http://schema.org/",
-                        "@type": "CreativeWork",
-                        "author": [{"@type": "Person", "name": "AWS C2PA Guidance"}],
-                    },
-                    "kind": "Json",
-                },
-                *assertions_json,
-            ],
-            "thumbnail": {"format": extension[1:], "identifier": "thumbnail"},
-            "claim_generator_info": [{"name": "c2pa-python", "version": "0.6.1"}],
-        }
+    # Making a thumbnail needs the whole asset, which defeats streaming
+    thumbnail = None
+    if not streaming:
+        with phase("asset_download"):
+            asset = fetcher.get(asset_url)
+        add_bytes("asset_download", len(asset))
+        with phase("thumbnail"):
+            thumbnail = thumbnails.get(asset, extension[1:])
+    manifest_json = template.render(
+        new_title, thumbnail.format if thumbnail is not None else None
     )
     builder = c2pa.Builder(manifest_json)
 
     # Add New Image Thumbnail
-    thumbnail = request.urlopen(asset_url)
-    builder.add_resource("thumbnail", thumbnail)
-    logger.info("Thumbnail added")
+    if thumbnail is not None:
+        builder.add_resource("thumbnail", io.BytesIO(thumbnail.data))
+        logger.info(f"Thumbnail added ({len(thumbnail.data)} bytes)")
 
     # Add Ingredients
-    if ingredients_url:
-        for ingredient in ingredients_url:
+    with phase("ingredients"):
+        for ingredient in ingredients_url or []:
             ingredient_path = urlparse(ingredient).path
             ingredient_filename = ingredient_path.split("/").pop()
             ingredient_no_extension, ingredient_extension = splitext(ingredient_filename)
             ingredient_json = {
                 "title": ingredient_filename,
                 "relationship": "parentOf",
-                "thumbnail": {
-                    "identifier": ingredient_path,
-                    "format": ingredient_extension[1:],
-                },
             }
-            ingredient_thumbnail = request.urlopen(ingredient)
-            builder.add_resource(ingredient_path, ingredient_thumbnail)
-
-            ingredient_data = io.BytesIO(request.urlopen(ingredient).read())
-            builder.add_ingredient(ingredient_json, ingredient_extension[1:], ingredient_data)
+            ingredient_data = ingredient_fetcher.get(ingredient)
+            add_bytes("ingredients", len(ingredient_data))
+            ingredient_thumbnail = thumbnails.get(
+                ingredient_data, ingredient_extension[1:]
+            )
+            if ingredient_thumbnail is not None:
+                ingredient_json["thumbnail"] = {
+                    "identifier": ingredient_path,
+                    "format": ingredient_thumbnail.format,
+                }
+                builder.add_resource(
+                    ingredient_path, io.BytesIO(ingredient_thumbnail.data)
+                )
+            builder.add_ingredient(
+                ingredient_json,
+                ingredient_extension[1:],
+                io.BytesIO(ingredient_data),
+            )
 
             logger.info(f"Ingredient added: {ingredient_filename}")
 
-    # Load the Key
-    prv_key_value = secretsmanager.get_secret_value(SecretId=private_key)
-    key = prv_key_value["SecretString"].encode("utf-8")
+    # Load the cached Signer
+    signer = signer_cache.get()
+    logger.info("Signer added")
 
-    def private_sign(data: bytes) -> bytes:
-        return c2pa.sign_ps256(data, key)
+    content_type, _ = mimetypes.guess_type(filename)
+    extra_args = {"ContentType": content_type} if content_type else {}
 
-    # Load the Certificate
-    cert_value = secretsmanager.get_secret_value(SecretId=certificate)
-    cert = cert_value["SecretString"].encode("utf-8")
+    # Sign
+    if streaming:
+        source = open_asset_stream(asset_url, fetcher)
 
-    signer = c2pa.create_signer(
-        private_sign, c2pa.SigningAlg.PS256, cert, "http://timestamp.digicert.com"
-    )
-    logger.info("Signer added")
+        def sign(dest):
+            source.seek(0)
+            builder.sign(signer, extension[1:], source, dest)
 
-    # Sign
-    asset = io.BytesIO(request.urlopen(asset_url).read())
-    result = io.BytesIO(b"")
-    builder.sign(signer, extension[1:], asset, result)
-    logger.info("Signing complete")
+        # Download, signing and upload overlap, so they are one phase
+        with phase("sign"):
+            sign_to_s3(
+                sign,
+                extension[1:],
+                s3,
+                output_bucket,
+                f"{filename_no_extension}/{filename}",
+                extra_args,
+            )
+        if hasattr(source, "bytes_fetched"):
+            fetcher.add_origin_traffic(source.bytes_fetched, source.requests)
+        logger.info("Streaming signing complete", extra=fetcher.stats())
+        add_bytes("sign", fetcher.stats()["origin_bytes"])
+        progress.add("bytes_downloaded", fetcher.stats()["origin_bytes"])
+    else:
+        result = io.BytesIO(b"")
+        with phase("sign"):
+            builder.sign(signer, extension[1:], fetcher.stream(asset_url), result)
+        logger.info("Signing complete", extra=fetcher.stats())
+        progress.add("bytes_downloaded", fetcher.stats()["origin_bytes"])
 
-    with open(f"/tmp/{filename}", "wb") as f:
-        f.write(result.getbuffer())
+        with scratch.workspace() as workspace:
+            signed_path = path_join(workspace, filename)
+            with phase("tmp_write"):
+                with open(signed_path, "wb") as f:
+                    f.write(result.getbuffer())
 
-    content_type, _ = mimetypes.guess_type(filename)
-    s3.upload_file(
-        f"/tmp/{filename}",
-        output_bucket,
-        f"{filename_no_extension}/{filename}",
-        ExtraArgs={"ContentType": content_type},
-    )
+            with phase("upload"):
+                upload_file(
+                    s3,
+                    signed_path,
+                    output_bucket,
+                    f"{filename_no_extension}/{filename}",
+                    extra_args,
+                    progress.counter("bytes_uploaded"),
+                )
+            add_bytes("upload", os.path.getsize(signed_path))
 
-    manifest = s3.generate_presigned_url(
-        "get_object",
-        Params={"Bucket": output_bucket, "Key": f"{filename_no_extension}/{filename}"},
-    )
+    with phase("presign"):
+        presigned_url = s3.generate_presigned_url(
+            "get_object",
+            Params={
+                "Bucket": output_bucket,
+                "Key": f"{filename_no_extension}/{filename}",
+            },
+        )
+
+    return presigned_url
+
+
+def open_asset_stream(asset_url, fetcher):
+    """
+    Seekable source for streaming mode: ranged GETs for s3:// URLs in our
+    buckets, the per-request fetch buffer for HTTP URLs
+    """
+    url_config = urlparse(asset_url)
+    if url_config.scheme == "s3":
+        bucket_name = url_config.netloc
+        if bucket_name not in (input_bucket, output_bucket):
+            logger.error(f"Access denied to bucket: {bucket_name}")
+            raise ServiceError(
+                status_code=403,
+                msg=f"Access denied to bucket: {bucket_name}. Please provide an HTTP URL or use one of the allowed buckets."
+            )
+        return S3RangeReader(s3, bucket_name, url_config.path.lstrip("/"))
+    return fetcher.stream(asset_url)
+
+class SignBatchItem(BaseModel):
+    new_title: str
+    asset_url: str
+
+class SignBatchEvent(BaseModel):
+    assets: List[SignBatchItem]
+    assertions_json_url: str
+    ingredients_url: List[str] | None = None
+    streaming: bool = False
+
+@app.post("/sign_batch")
+def sign_batch(signBatchEvent: SignBatchEvent):
+    if len(signBatchEvent.assets) > SIGN_BATCH_MAX_ITEMS:
+        raise ServiceError(
+            status_code=413,
+            msg=f"A batch can contain at most {SIGN_BATCH_MAX_ITEMS} assets",
+        )
+
+    # Assertions, ingredients and the signer are shared by every item
+    shared_fetcher = RequestFetcher(s3=s3)
+    template = load_manifest_template(signBatchEvent.assertions_json_url)
+    signer_cache.get()
+
+    def sign_item(item: SignBatchItem):
+        try:
+            with PhaseTimer("sign_batch_item"):
+                presigned_url = sign_asset(
+                    item.new_title,
+                    item.asset_url,
+                    template,
+                    signBatchEvent.ingredients_url,
+                    signBatchEvent.streaming,
+                    RequestFetcher(s3=s3),
+                    shared_fetcher,
+                )
+            return {"asset_url": item.asset_url, "manifest": presigned_url}
+        except Exception as e:
+            logger.exception(f"Batch item failed: {item.asset_url}")
+            return {
+                "asset_url": item.asset_url,
+                "error": getattr(e, "msg", None) or str(e),
+            }
+
+    # c2pa releases the GIL while signing, so threads use every vCPU
+    with ThreadPoolExecutor(max_workers=SIGN_BATCH_WORKERS) as pool:
+        results = list(pool.map(sign_item, signBatchEvent.assets))
 
-    return {"manifest": manifest}
+    failed = sum(1 for result in results if "error" in result)
+    logger.info(f"Batch complete: {len(results) - failed} signed, {failed} failed")
+    return {
+        "results": results,
+        "succeeded": len(results) - failed,
+        "failed": failed,
+    }
 
 class SignFmp4Event(BaseModel):
     new_title: str
     init_file: str
     fragments_pattern: str
     manifest_file: str
+    # Only sign fragments added since the previous call for this new_title
+    incremental: bool = False
+    # Download, sign and upload fragments in overlapping chunks
+    pipelined: bool = False
+    # Sign every representation of the .mpd next to the fragments
+    ladder: bool = False
 
 @app.post("/sign_fmp4")
 def sign_fmp4(request: SignFmp4Event):
-    with tempfile.TemporaryDirectory() as temp_dir:
+    return run_sign_fmp4(request)
+
+
+def run_sign_fmp4(request: SignFmp4Event, progress=None):
+    progress = progress or JobProgress()
+    if request.ladder:
+        return run_sign_fmp4_ladder(request, progress)
+    with (
+        PhaseTimer("sign_fmp4", on_phase=progress.set_phase) as timer,
+        scratch.workspace() as temp_dir,
+    ):
         init_filename = os.path.basename(urlparse(request.init_file).path)
         init_file_path = os.path.join(temp_dir, init_filename)
         logger.info(f"Downloading init file: {request.init_file}")        
 
         try:
-            with open(init_file_path, "wb") as f:
+            with timer.phase("download_init"), open(init_file_path, "wb") as f:
                 # Check if it's an HTTP URL
                 if request.init_file.startswith("http"):
                     logger.info(f"Downloading from HTTP URL: {request.init_file}")
-                    response = request.urlopen(request.init_file)
-                    f.write(response.read())
+                    f.write(http.get(request.init_file))
                 # Check if it's an S3 URL that we need to convert to HTTP
                 elif request.init_file.startswith("s3://"):
                     init_config = urlparse(request.init_file)
@@ -174,30 +435,51 @@ def sign_fmp4(request: SignFmp4Event):
                     # Check if this is one of our buckets (which we have permission to access)
                     if bucket_name == input_bucket:
                         logger.info(f"Downloading from bucket: {bucket_name}/{object_key}")
-                        s3.download_fileobj(bucket_name, object_key, f)
+                        download_fileobj(s3, bucket_name, object_key, f)
                     else:
                         # For other buckets, we need a pre-signed URL or public access
                         logger.error(f"Access denied to bucket: {bucket_name}")
                         raise ServiceError(
                             status_code=403, 
-                            detail=f"Access denied to bucket: {bucket_name}. Please provide an HTTP URL or use one of the allowed buckets."
+                            msg=f"Access denied to bucket: {bucket_name}. Please provide an HTTP URL or use one of the allowed buckets."
                         )
                 else:
                     logger.error(f"Unsupported URL scheme: {request.init_file}")
                     raise ServiceError(
                         status_code=400, 
-                        detail=f"Unsupported URL scheme. Use HTTP URLs or s3://{output_bucket}/... URLs."
+                        msg=f"Unsupported URL scheme. Use HTTP URLs or s3://{output_bucket}/... URLs."
                     )
         except Exception as e:
             logger.exception(f"Error downloading init file: {str(e)}")
             raise ServiceError(
                 status_code=500, 
-                detail=f"Error downloading init file: {str(e)}"
+                msg=f"Error downloading init file: {str(e)}"
+            )
+
+        # Load live stream state, a new init segment restarts the stream
+        state, new_objects, include, init_etag = None, [], None, None
+        if request.incremental:
+            state = StreamState.load(
+                s3, output_bucket, f"fragments/processed/{request.new_title}"
             )
+            if request.init_file.startswith("s3://"):
+                init_etag = s3.head_object(
+                    Bucket=init_config.netloc, Key=init_config.path.lstrip("/")
+                )["ETag"]
+            if state.init_etag != init_etag:
+                state.fragments = {}
+
+            def include(obj):
+                # The DASH manifest changes on every live update
+                if obj["Key"].endswith(".mpd"):
+                    return True
+                if state.is_new(obj):
+                    new_objects.append(obj)
+                    return True
+                return False
 
         # Process fragments
         logger.info("Processing fragments...")
-        fragments = []
         
         # Handle fragments pattern
         try:
@@ -209,44 +491,72 @@ def sign_fmp4(request: SignFmp4Event):
                 # Check if this is one of our buckets (which we have permission to access)
                 if bucket_name == output_bucket or bucket_name == input_bucket:
                     logger.info(f"Listing fragments from bucket: {bucket_name}/{prefix}")
-                    paginator = s3.get_paginator("list_objects_v2")
-                    
-                    for page in paginator.paginate(
-                        Bucket=bucket_name,
-                        Prefix=prefix,
-                    ):
-                        if "Contents" in page:
-                            for obj in page["Contents"]:
-                                if obj["Key"].endswith(".m4s") or obj["Key"].endswith(".mpd"):
-                                    fragment_path = os.path.join(
-                                        temp_dir, os.path.basename(obj["Key"])
-                                    )
-                                    logger.info(f"Downloading fragment: {obj['Key']}")
-                                    with open(fragment_path, "wb") as f:
-                                        s3.download_fileobj(bucket_name, obj["Key"], f)
-                                    fragments.append(fragment_path)
+                    if request.pipelined:
+                        # Only the DASH manifest is fetched up front, fragments
+                        # are downloaded chunk by chunk while signing
+                        listed = list_prefix(
+                            s3,
+                            bucket_name,
+                            prefix,
+                            suffixes=[".m4s", ".mpd"],
+                            include=include,
+                        )
+                        fragment_objects = [
+                            obj for obj in listed if obj["Key"].endswith(".m4s")
+                        ]
+                        with timer.phase("download_fragments"):
+                            fragments = [
+                                download_object(
+                                    s3,
+                                    bucket_name,
+                                    obj["Key"],
+                                    os.path.join(temp_dir, os.path.basename(obj["Key"])),
+                                )
+                                for obj in listed
+                                if obj["Key"].endswith(".mpd")
+                            ]
+                        fragments += [obj["Key"] for obj in fragment_objects]
+                    else:
+                        with timer.phase("download_fragments"):
+                            fragments = download_prefix(
+                                s3,
+                                bucket_name,
+                                prefix,
+                                temp_dir,
+                                suffixes=[".m4s", ".mpd"],
+                                include=include,
+                                callback=progress.counter("bytes_downloaded"),
+                            )
                 else:
                     # For other buckets, we need a pre-signed URL or public access
                     logger.error(f"Access denied to bucket: {bucket_name}")
                     raise ServiceError(
                         status_code=403, 
-                        detail=f"Access denied to bucket: {bucket_name}. Please use one of the allowed buckets."
+                        msg=f"Access denied to bucket: {bucket_name}. Please use one of the allowed buckets."
                     )
             else:
                 logger.error(f"Unsupported URL scheme: {request.fragments_pattern}")
                 raise ServiceError(
                     status_code=400, 
-                    detail=f"Unsupported URL scheme. Use s3://{output_bucket}/... URLs for fragments."
+                    msg=f"Unsupported URL scheme. Use s3://{output_bucket}/... URLs for fragments."
                 )
                 
             fragments.sort()  # Ensure fragments are in order
             logger.info(f"Downloaded {len(fragments)} fragments")
+
+            if request.incremental and not new_objects:
+                logger.info("No new fragments since the previous call")
+                return {
+                    "saved_location": f"s3://{output_bucket}/fragments/processed/{request.new_title}/",
+                    "signed_fragments": 0,
+                    "last_sequence": state.last_sequence,
+                }
             
             if len(fragments) == 0:
                 logger.warning("No fragments found!")
                 raise ServiceError(
                     status_code=404, 
-                    detail="No fragments found matching the pattern."
+                    msg="No fragments found matching the pattern."
                 )
         except Exception as e:
             if isinstance(e, ServiceError):
@@ -254,7 +564,7 @@ def sign_fmp4(request: SignFmp4Event):
             logger.exception(f"Error processing fragments: {str(e)}")
             raise ServiceError(
                 status_code=500, 
-                detail=f"Error processing fragments: {str(e)}"
+                msg=f"Error processing fragments: {str(e)}"
             )
 
         # Download manifest file
@@ -269,20 +579,20 @@ def sign_fmp4(request: SignFmp4Event):
                 # Check if this is one of our buckets (which we have permission to access)
                 if manifest_bucket == output_bucket or manifest_bucket == input_bucket:
                     logger.info(f"Downloading manifest from bucket: {manifest_bucket}/{manifest_key}")
-                    with open(manifest_path, "wb") as f:
-                        s3.download_fileobj(manifest_bucket, manifest_key, f)
+                    with timer.phase("download_manifest"), open(manifest_path, "wb") as f:
+                        download_fileobj(s3, manifest_bucket, manifest_key, f)
                 else:
                     # For other buckets, we need a pre-signed URL or public access
                     logger.error(f"Access denied to bucket: {manifest_bucket}")
                     raise ServiceError(
                         status_code=403, 
-                        detail=f"Access denied to bucket: {manifest_bucket}. Please provide an HTTP URL or use one of the allowed buckets."
+                        msg=f"Access denied to bucket: {manifest_bucket}. Please provide an HTTP URL or use one of the allowed buckets."
                     )
             else:
                 logger.error(f"Unsupported URL scheme: {request.manifest_file}")
                 raise ServiceError(
                     status_code=400, 
-                    detail=f"Unsupported URL scheme. Use HTTP URLs or s3://{output_bucket}/... URLs."
+                    msg=f"Unsupported URL scheme. Use HTTP URLs or s3://{output_bucket}/... URLs."
                 )
         except Exception as e:
             if isinstance(e, ServiceError):
@@ -290,60 +600,226 @@ def sign_fmp4(request: SignFmp4Event):
             logger.exception(f"Error downloading manifest file: {str(e)}")
             raise ServiceError(
                 status_code=500, 
-                detail=f"Error downloading manifest file: {str(e)}"
+                msg=f"Error downloading manifest file: {str(e)}"
             )
 
-        # Create output directory
-        output_dir = os.path.join(temp_dir, "output")
-        os.makedirs(output_dir, exist_ok=True)
+        mpd_file_path = next((f for f in fragments if f.endswith(".mpd")), None)
+        # Each chunk has its own init, so a pipelined VOD rendition is only
+        # playable through an MPD rewritten to point every chunk at it
+        chunked_mpd = request.pipelined and not request.incremental
+        if chunked_mpd and mpd_file_path is None:
+            raise ServiceError(
+                status_code=400,
+                msg="pipelined needs the .mpd next to the fragments, or incremental",
+            )
 
-        print(os.listdir(temp_dir))
+        if request.pipelined:
+            try:
+                with timer.phase("pipeline"):
+                    sign_fragments_pipelined(
+                        s3,
+                        bucket_name,
+                        fragment_objects,
+                        init_file_path,
+                        manifest_path,
+                        temp_dir,
+                        output_bucket,
+                        f"fragments/processed/{request.new_title}",
+                        mpd_path=mpd_file_path if chunked_mpd else None,
+                        download_callback=progress.counter("bytes_downloaded"),
+                        upload_callback=progress.counter("bytes_uploaded"),
+                        on_chunk=lambda count: progress.add("fragments_signed", count),
+                    )
+            except ChunkedMpdError as e:
+                raise ServiceError(status_code=422, msg=str(e))
+            except ChunkSigningError as e:
+                logger.error(str(e))
+                raise ServiceError(status_code=500, msg=str(e))
+            # Every chunk already uploaded its own signed init
+            uploads = []
+        else:
+            # Create output directory
+            output_dir = os.path.join(temp_dir, "output")
+            os.makedirs(output_dir, exist_ok=True)
 
-        # Run c2pa command
-        success, output = run_c2pa_command_for_fmp4(
-            init_file=init_file_path,
-            fragments_glob=f"{temp_dir}/*.m4s",
-            output_dir=output_dir,
-            manifest_file=manifest_path,
-        )
+            print(os.listdir(temp_dir))
 
-        if not success:
-            logger.error(f"C2PA signing failed: {output}")
-            raise ServiceError(
-                status_code=500, 
-                detail=f"C2PA signing failed: {output}"
+            # Run c2pa command
+            with timer.phase("sign"):
+                success, output = run_c2pa_command_for_fmp4(
+                    init_file=init_file_path,
+                    fragments_glob=f"{temp_dir}/*.m4s",
+                    output_dir=output_dir,
+                    manifest_file=manifest_path,
+                )
+
+            if not success:
+                logger.error(f"C2PA signing failed: {output}")
+                raise ServiceError(
+                    status_code=500, 
+                    msg=f"C2PA signing failed: {output}"
+                )
+            progress.add(
+                "fragments_signed", sum(1 for f in fragments if f.endswith(".m4s"))
             )
 
-        print(os.listdir(output_dir))
-        output_folder = os.path.join(output_dir, temp_dir.split("/").pop())
-        for root, _, files in os.walk(output_folder):
-            for file in files:
-                s3.upload_file(
-                    os.path.join(output_folder, file),
-                    output_bucket,
+            print(os.listdir(output_dir))
+            output_folder = os.path.join(output_dir, temp_dir.split("/").pop())
+            uploads = [
+                (
+                    os.path.join(root, file),
                     f"fragments/processed/{request.new_title}/{file}",
                 )
+                for root, _, files in os.walk(output_folder)
+                for file in files
+            ]
 
         # Upload the DASH Manifest file
         manifest_key = os.path.join(
             "fragments/processed", request.new_title, "manifest.mpd"
         )
         
-        mpd_file_path = next(
-            (f for f in fragments if f.endswith(".mpd")),
-            None
-        )
-        if mpd_file_path:
+        if mpd_file_path and not chunked_mpd:
             logger.info(f"Uploading DASH Manifest file: {mpd_file_path}")
             mpd_filename = os.path.basename(urlparse(mpd_file_path).path)
-            s3.upload_file(
-                os.path.join(temp_dir, mpd_file_path),
-                output_bucket,
-                f"fragments/processed/{request.new_title}/{mpd_filename}",
+            uploads.append(
+                (
+                    os.path.join(temp_dir, mpd_file_path),
+                    f"fragments/processed/{request.new_title}/{mpd_filename}",
+                )
+            )
+
+        if request.incremental and not request.pipelined:
+            # Keep the init signed for this batch so earlier windows stay verifiable
+            init_stem, init_extension = splitext(init_filename)
+            sequences = sorted(fragment_sequence(obj["Key"]) for obj in new_objects)
+            uploads.append(
+                (
+                    os.path.join(output_folder, init_filename),
+                    f"fragments/processed/{request.new_title}/{init_stem}-{sequences[0]}-{sequences[-1]}{init_extension}",
+                )
+            )
+
+        with timer.phase("upload"):
+            upload_files(
+                s3, uploads, output_bucket, callback=progress.counter("bytes_uploaded")
             )
+            timer.add_bytes("upload", sum(os.path.getsize(path) for path, _ in uploads))
 
+        response = {
+            "saved_location": f"s3://{output_bucket}/fragments/processed/{request.new_title}/",
+            "timings": timer.timings,
+        }
+
+        if request.incremental:
+            state.record(new_objects, init_etag)
+            try:
+                state.save()
+            except StateConflictError as e:
+                raise ServiceError(status_code=409, msg=str(e))
+            response["signed_fragments"] = len(new_objects)
+            response["last_sequence"] = state.last_sequence
+
+        return response
 
-        return {"saved_location": f"s3://{output_bucket}/fragments/processed/{request.new_title}/"}
+
+def run_sign_fmp4_ladder(request: SignFmp4Event, progress):
+    """
+    Ladder mode: the .mpd under the fragments prefix names each
+    representation's init and segment template, and every rendition is
+    signed concurrently in its own workspace. The MPD is uploaded last, so
+    it only appears once the whole processed ladder is in place.
+    """
+    if request.incremental or request.pipelined:
+        raise ServiceError(
+            status_code=400,
+            msg="ladder cannot be combined with incremental or pipelined",
+        )
+    fragments_config = urlparse(request.fragments_pattern)
+    manifest_config = urlparse(request.manifest_file)
+    for url_config in (fragments_config, manifest_config):
+        if url_config.scheme != "s3":
+            raise ServiceError(
+                status_code=400,
+                msg=f"Unsupported URL scheme. Use s3://{output_bucket}/... URLs in ladder mode.",
+            )
+        if url_config.netloc not in (input_bucket, output_bucket):
+            logger.error(f"Access denied to bucket: {url_config.netloc}")
+            raise ServiceError(
+                status_code=403,
+                msg=f"Access denied to bucket: {url_config.netloc}. Please use one of the allowed buckets.",
+            )
+
+    bucket = fragments_config.netloc
+    prefix = os.path.dirname(fragments_config.path.lstrip("/"))
+    output_prefix = f"fragments/processed/{request.new_title}"
+
+    with (
+        PhaseTimer("sign_fmp4_ladder", on_phase=progress.set_phase) as timer,
+        scratch.workspace() as temp_dir,
+    ):
+        with timer.phase("download"):
+            objects = list_prefix(
+                s3,
+                bucket,
+                f"{prefix}/" if prefix else "",
+                suffixes=[".mpd", ".m4s", ".mp4"],
+            )
+            mpd_object = next(
+                (obj for obj in objects if obj["Key"].endswith(".mpd")), None
+            )
+            if mpd_object is None:
+                raise ServiceError(status_code=404, msg="No DASH manifest (.mpd) found")
+            mpd_filename = os.path.basename(mpd_object["Key"])
+            mpd_path = download_object(
+                s3, bucket, mpd_object["Key"], os.path.join(temp_dir, mpd_filename)
+            )
+
+            manifest_path = os.path.join(temp_dir, "manifest.json")
+            download_object(
+                s3,
+                manifest_config.netloc,
+                manifest_config.path.lstrip("/"),
+                manifest_path,
+            )
+
+        renditions = []
+
+        def on_rendition(rendition_id, count):
+            renditions.append(rendition_id)
+            progress.add("fragments_signed", count)
+
+        try:
+            with timer.phase("sign"):
+                uploads = sign_ladder(
+                    s3,
+                    bucket,
+                    prefix,
+                    objects,
+                    mpd_path,
+                    manifest_path,
+                    temp_dir,
+                    output_bucket,
+                    output_prefix,
+                    download_callback=progress.counter("bytes_downloaded"),
+                    on_rendition=on_rendition,
+                )
+        except LadderError as e:
+            logger.error(str(e))
+            raise ServiceError(status_code=422, msg=str(e))
+
+        with timer.phase("upload"):
+            upload_files(
+                s3, uploads, output_bucket, callback=progress.counter("bytes_uploaded")
+            )
+            upload_file(s3, mpd_path, output_bucket, f"{output_prefix}/{mpd_filename}")
+        timer.add_bytes("upload", sum(os.path.getsize(path) for path, _ in uploads))
+
+    return {
+        "saved_location": f"s3://{output_bucket}/{output_prefix}/",
+        "renditions": renditions,
+        "timings": timer.timings,
+    }
 
 
 class ReadFileEvent(BaseModel):
@@ -355,84 +831,284 @@ def read_file(readFileEvent: ReadFileEvent):
     asset_url = readFileEvent.asset_url
     return_type = readFileEvent.return_type
     
-    try:
-        # Parse the URL
-        url_config = urlparse(asset_url)
-        filename = url_config.path.split("/").pop()
-        filename_no_extension, extension = splitext(filename)
+    with PhaseTimer("read_file"):
+        try:
+            # Parse the URL
+            url_config = urlparse(asset_url)
+            filename = url_config.path.split("/").pop()
+            filename_no_extension, extension = splitext(filename)
         
-        # Get the file content
-        if asset_url.startswith("http"):
-            logger.info(f"Reading from HTTP URL: {asset_url}")
-            file_content = io.BytesIO(request.urlopen(asset_url).read())
-        elif asset_url.startswith("s3://"):
-            bucket_name = url_config.netloc
-            object_key = url_config.path.lstrip("/")
-            
-            # Check if this is one of our buckets (which we have permission to access)
-            if bucket_name == output_bucket or bucket_name == input_bucket:
-                logger.info(f"Reading from bucket: {bucket_name}/{object_key}")
-                file_content = io.BytesIO()
-                s3.download_fileobj(bucket_name, object_key, file_content)
-                file_content.seek(0)  # Reset position to beginning of file
+            try:
+                manifest_json = read_manifest(asset_url)
+            except NoManifestError as e:
+                raise ServiceError(status_code=404, msg=str(e))
+        
+            # Process based on return type
+            if return_type == "json":
+                return json.loads(manifest_json)
+            elif return_type == "presigned_url":
+                with scratch.workspace() as workspace:
+                    manifest_path = path_join(workspace, "manifest.json")
+                    with phase("tmp_write"):
+                        with open(manifest_path, "w") as f:
+                            json.dump(json.loads(manifest_json), f, indent=2)
+                            logger.info(f"{datetime.now()}: Downloading asset_url")
+
+                    # Upload the manifest json
+                    logger.info(f"{datetime.now()}: Uploading manifest json...")
+                    with phase("upload"):
+                        upload_file(
+                            s3,
+                            manifest_path,
+                            output_bucket,
+                            f"{filename_no_extension}/read_c2pa.json",
+                        )
+                    add_bytes("upload", os.path.getsize(manifest_path))
+                logger.info(f"{datetime.now()}: manifest upload complete")
+                with phase("presign"):
+                    presigned_url = s3.generate_presigned_url(
+                        "get_object",
+                        Params={
+                            "Bucket": output_bucket,
+                            "Key": f"{filename_no_extension}/read_c2pa.json",
+                        },
+                    )
+                logger.info(f"{datetime.now()}: presigned URL created")
+
+                return {"presigned_url": presigned_url}
             else:
-                # For other buckets, we need a pre-signed URL or public access
-                logger.error(f"Access denied to bucket: {bucket_name}")
                 raise ServiceError(
-                    status_code=403, 
-                    detail=f"Access denied to bucket: {bucket_name}. Please provide an HTTP URL or use one of the allowed buckets."
+                    status_code=400,
+                    msg=f"Unsupported return_type: {return_type}. Use 'json' or 'presigned_url'."
                 )
-        else:
-            logger.error(f"Unsupported URL scheme: {asset_url}")
+        except ServiceError as e:
+            # Re-raise service errors
+            raise e
+        except Exception as e:
+            logger.exception(f"Error reading file: {str(e)}")
             raise ServiceError(
-                status_code=400, 
-                detail=f"Unsupported URL scheme. Use HTTP URLs or s3://{output_bucket}/... URLs."
+                status_code=500,
+                msg=f"Error reading file: {str(e)}"
             )
-            
-        # Read the C2PA data
-        reader = c2pa.Reader(extension[1:], file_content)
+
+def read_manifest(asset_url):
+    """
+    Manifest JSON of an http(s) or s3:// asset in one of our buckets.
+    Raises NoManifestError when the asset isn't signed.
+    """
+    url_config = urlparse(asset_url)
+    extension = splitext(url_config.path)[1]
+
+    if asset_url.startswith("http"):
+        logger.info(f"Reading from HTTP URL: {asset_url}")
+
+        def download():
+            return http.get(asset_url)
+    elif asset_url.startswith("s3://"):
+        bucket_name = url_config.netloc
+        object_key = url_config.path.lstrip("/")
         
-        # Process based on return type
-        if return_type == "json":
-            return json.loads(reader.json())
-        elif return_type == "presigned_url":
-            with open("/tmp/manifest.json", "w") as f:
-                json.dump(json.loads(reader.json()), f, indent=2)
-                logger.info(f"{datetime.now()}: Downloading asset_url")
-
-            # Upload the manifest json
-            logger.info(f"{datetime.now()}: Uploading manifest json...")
-            s3.upload_file(
-                "/tmp/manifest.json",
-                output_bucket,
-                f"{filename_no_extension}/read_c2pa.json",
-            )
-            logger.info(f"{datetime.now()}: manifest upload complete")
-            presigned_url = s3.generate_presigned_url(
-                "get_object",
-                Params={
-                    "Bucket": output_bucket,
-                    "Key": f"{filename_no_extension}/read_c2pa.json",
-                },
-            )
-            logger.info(f"{datetime.now()}: presigned URL created")
+        # Check if this is one of our buckets (which we have permission to access)
+        if bucket_name == output_bucket or bucket_name == input_bucket:
+            logger.info(f"Reading from bucket: {bucket_name}/{object_key}")
 
-            return {"presigned_url": presigned_url}
+            def download():
+                file_content = io.BytesIO()
+                download_fileobj(s3, bucket_name, object_key, file_content)
+                return file_content.getvalue()
         else:
+            # For other buckets, we need a pre-signed URL or public access
+            logger.error(f"Access denied to bucket: {bucket_name}")
             raise ServiceError(
-                status_code=400,
-                detail=f"Unsupported return_type: {return_type}. Use 'json' or 'presigned_url'."
+                status_code=403, 
+                msg=f"Access denied to bucket: {bucket_name}. Please provide an HTTP URL or use one of the allowed buckets."
             )
-    except ServiceError as e:
-        # Re-raise service errors
-        raise e
-    except Exception as e:
-        logger.exception(f"Error reading file: {str(e)}")
+    else:
+        logger.error(f"Unsupported URL scheme: {asset_url}")
+        raise ServiceError(
+            status_code=400, 
+            msg=f"Unsupported URL scheme. Use HTTP URLs or s3://{output_bucket}/... URLs."
+        )
+
+    # The probe reads through ranges; the reader does too when hash
+    # verification is off, otherwise a signed asset is downloaded once into
+    # a workspace. Repeat reads of the same object version are served from
+    # the manifest cache
+    try:
+        with phase("asset_open"):
+            source = open_range_reader(asset_url, s3)
+            identity = source.identity
+    except RangeNotSupportedError:
+        logger.info("Origin does not support ranges, downloading the asset")
+        source, identity = None, None
+
+    with phase("manifest_cache"):
+        manifest_json = manifest_cache.get(identity) if identity else None
+    if manifest_json is None:
+        if source is None:
+            with phase("asset_download"):
+                asset = download()
+            add_bytes("asset_download", len(asset))
+            identity = content_identity(asset)
+            with phase("manifest_cache"):
+                manifest_json = manifest_cache.get(identity)
+            source = io.BytesIO(asset)
+        if manifest_json is None:
+            # Unsigned assets are answered from the container headers alone
+            with phase("probe"):
+                has_manifest = probe_manifest(source, extension[1:])
+            if has_manifest is False:
+                raise NoManifestError(f"No C2PA manifest found in {asset_url}")
+            with scratch.workspace() as workspace:
+                asset_path = None
+                if reads_whole_asset() and hasattr(source, "download"):
+                    # The reader passes over every byte more than once, which
+                    # the block cache can't hold, so fetch the asset once
+                    asset_path = os.path.join(workspace, f"asset{extension}")
+                    with phase("asset_download"):
+                        with open(asset_path, "wb") as f:
+                            source.download(f)
+                    add_bytes("asset_download", source.size)
+                # Read the C2PA data
+                try:
+                    with phase("read"):
+                        if asset_path is not None:
+                            with open(asset_path, "rb") as f:
+                                reader = c2pa.Reader(extension[1:], f)
+                                manifest_json = reader.json()
+                        else:
+                            reader = c2pa.Reader(extension[1:], source)
+                            manifest_json = reader.json()
+                except C2PA_NOT_FOUND_ERRORS:
+                    raise NoManifestError(f"No C2PA manifest found in {asset_url}")
+            if hasattr(source, "bytes_fetched"):
+                add_bytes("read", source.bytes_fetched)
+            manifest_cache.put(identity, manifest_json)
+        logger.info(
+            "Manifest read",
+            extra={"bytes_fetched": getattr(source, "bytes_fetched", None)},
+        )
+    else:
+        logger.info(f"Manifest cache hit for {asset_url}")
+
+    return manifest_json
+
+
+class ReadBatchEvent(BaseModel):
+    asset_urls: List[str]
+
+@app.post("/read_batch")
+def read_batch(readBatchEvent: ReadBatchEvent):
+    """
+    NDJSON, one line per asset in completion order. Python Function URLs
+    can't stream responses, so lines are buffered until the batch is done.
+    """
+    if len(readBatchEvent.asset_urls) > READ_BATCH_MAX_ITEMS:
         raise ServiceError(
-            status_code=500,
-            detail=f"Error reading file: {str(e)}"
+            status_code=413,
+            msg=f"A batch can contain at most {READ_BATCH_MAX_ITEMS} assets",
         )
 
+    def read_item(index, asset_url):
+        try:
+            return {
+                "index": index,
+                "asset_url": asset_url,
+                "has_manifest": True,
+                "manifest": json.loads(read_manifest(asset_url)),
+            }
+        except NoManifestError:
+            return {
+                "index": index,
+                "asset_url": asset_url,
+                "has_manifest": False,
+                "manifest": None,
+            }
+        except Exception as e:
+            logger.exception(f"Batch read failed: {asset_url}")
+            return {
+                "index": index,
+                "asset_url": asset_url,
+                "error": getattr(e, "msg", None) or str(e),
+            }
+
+    # Lambda has no /dev/shm for process pools; c2pa releases the GIL while
+    # parsing, so threads still spread the work over every vCPU
+    lines = []
+    with ThreadPoolExecutor(max_workers=READ_BATCH_CONCURRENCY) as pool:
+        futures = [
+            pool.submit(read_item, index, asset_url)
+            for index, asset_url in enumerate(readBatchEvent.asset_urls)
+        ]
+        for future in as_completed(futures):
+            lines.append(json.dumps(future.result()))
+
+    return Response(
+        status_code=200,
+        content_type="application/x-ndjson",
+        body="\n".join(lines) + "\n",
+    )
+
+class SignFileJobEvent(SignFileEvent):
+    # The finished job is POSTed here when set
+    callback_url: str | None = None
+
+class SignFmp4JobEvent(SignFmp4Event):
+    callback_url: str | None = None
+
+JOB_KINDS = {
+    "sign_file": (SignFileEvent, run_sign_file),
+    "sign_fmp4": (SignFmp4Event, run_sign_fmp4),
+}
+
+def submit_job(kind, event):
+    """
+    Record a queued job and hand it to an asynchronous invocation of this
+    function, which Lambda queues and runs with the full function timeout
+    """
+    job = new_job(kind, event.callback_url)
+    job_store.save(job)
+    lambda_client.invoke(
+        FunctionName=os.environ["AWS_LAMBDA_FUNCTION_NAME"],
+        InvocationType="Event",
+        Payload=json.dumps(
+            {
+                "c2pa_job": {
+                    "job_id": job["job_id"],
+                    "kind": kind,
+                    "event": event.model_dump(exclude={"callback_url"}),
+                }
+            }
+        ),
+    )
+    return Response(
+        status_code=202, content_type="application/json", body=json.dumps(job)
+    )
+
+@app.post("/jobs/sign_file")
+def submit_sign_file_job(signFileJobEvent: SignFileJobEvent):
+    return submit_job("sign_file", signFileJobEvent)
+
+@app.post("/jobs/sign_fmp4")
+def submit_sign_fmp4_job(signFmp4JobEvent: SignFmp4JobEvent):
+    return submit_job("sign_fmp4", signFmp4JobEvent)
+
+@app.get("/jobs/<job_id>")
+def get_job(job_id: str):
+    job = job_store.get(job_id)
+    if job is None:
+        raise ServiceError(status_code=404, msg=f"No job {job_id}")
+    return job
+
+def run_queued_job(payload):
+    job = job_store.get(payload["job_id"])
+    if job is None:
+        logger.error(f"Job {payload['job_id']} not found")
+        return
+    model, fn = JOB_KINDS[payload["kind"]]
+    logger.info(f"Running job {job['job_id']} ({payload['kind']})")
+    run_job(job_store, job, fn, model(**payload["event"]))
+
 @logger.inject_lambda_context(
     correlation_id_path=correlation_paths.LAMBDA_FUNCTION_URL, log_event=True
 )
@@ -441,20 +1117,21 @@ def handler(event: dict, context: LambdaContext) -> dict:
     # Log the event for debugging
     logger.info("Lambda handler invoked")
     logger.info(f"Event: {json.dumps(event)}")
-    
-    # Clean up temporary files
-    files = glob.glob("/tmp/*")
-    for file in files:
-        os.remove(file)
+    cold_start.report()
+
+    # Asynchronous self-invocation carrying a queued job
+    if "c2pa_job" in event:
+        run_queued_job(event["c2pa_job"])
+        return {"statusCode": 200}
 
     try:
         # Resolve the request using the Lambda Function URL resolver
         return app.resolve(event, context)
     except ServiceError as e:
-        logger.error(f"Service error: {e.message}")
+        logger.error(f"Service error: {e.msg}")
         return {
             "statusCode": e.status_code,
-            "body": json.dumps({"error": e.message})
+            "body": json.dumps({"error": e.msg})
         }
     except Exception as e:
         logger.exception("Unhandled exception")
@@ -0,0 +1,307 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from urllib.parse import urlparse
+
+import threading
+import logging
+import socket
+import json
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+# Any of log, emf, xray, prometheus
+METRICS_EXPORTERS = tuple(
+    exporter.strip()
+    for exporter in os.environ.get("metrics_exporters", "log").split(",")
+    if exporter.strip()
+)
+
+# Both are slow to import, so only when their exporter is configured
+xray_recorder = None
+if "xray" in METRICS_EXPORTERS:
+    try:
+        from aws_xray_sdk.core import xray_recorder
+    except ImportError:
+        pass
+
+prometheus_client = None
+if "prometheus" in METRICS_EXPORTERS:
+    try:
+        import prometheus_client
+    except ImportError:
+        pass
+METRICS_NAMESPACE = os.environ.get("metrics_namespace", "C2PA")
+METRICS_SERVICE = os.environ.get(
+    "metrics_service", os.environ.get("POWERTOOLS_SERVICE_NAME", "c2pa")
+)
+# Where EMF documents go: stdout when empty, which Lambda turns into metrics,
+# or the EMF listener of a CloudWatch agent, e.g. udp://127.0.0.1:25888 on ECS
+# where the awslogs driver ships stdout as plain log events
+METRICS_EMF_ENDPOINT = os.environ.get("metrics_emf_endpoint", "")
+# Log group the agent writes the documents to
+METRICS_LOG_GROUP = os.environ.get("metrics_log_group", "")
+
+# The timer of the operation running in this thread or task
+_current = ContextVar("phase_timer", default=None)
+
+
+class PhaseTimer:
+    """
+    Collects wall-clock durations (in seconds) and byte counts for named
+    phases of one operation. on_phase, when given, is called with each phase
+    name as it starts.
+
+    Used as a context manager the timer becomes the current one, so code
+    further down (the signer cache, the template cache) can time its own
+    phases with phase() without being handed the timer, and the timings are
+    exported when the operation ends.
+    """
+
+    def __init__(self, operation=None, on_phase=None, exporters=None):
+        self.operation = operation
+        self.on_phase = on_phase
+        self.exporters = METRICS_EXPORTERS if exporters is None else exporters
+        self.timings = {}
+        self.bytes = {}
+        self._lock = threading.Lock()
+        self._token = None
+        self._start = None
+        self._subsegment = None
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        if self.operation is not None and "xray" in self.exporters:
+            self._subsegment = _begin_subsegment(self.operation)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        total = time.perf_counter() - self._start
+        _current.reset(self._token)
+        if self._subsegment is not None:
+            _end_subsegment(self._subsegment, None)
+        self.export(total=total, error=exc_type is not None)
+
+    @contextmanager
+    def phase(self, name):
+        if self.on_phase is not None:
+            self.on_phase(name)
+        subsegment = _begin_subsegment(name) if "xray" in self.exporters else None
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+            if subsegment is not None:
+                _end_subsegment(subsegment, self.bytes.get(name))
+
+    def record(self, name, seconds):
+        with self._lock:
+            self.timings[name] = round(self.timings.get(name, 0) + seconds, 3)
+
+    def add_bytes(self, name, amount):
+        with self._lock:
+            self.bytes[name] = self.bytes.get(name, 0) + amount
+
+    def export(self, total=None, error=False):
+        """
+        Hand the timings to every configured exporter. Exporters never fail
+        the operation they measure. X-Ray has nothing to do here: its
+        subsegments were recorded while the phases ran.
+        """
+        if self.operation is None:
+            return
+        for name in self.exporters:
+            exporter = EXPORTERS.get(name)
+            if exporter is None:
+                continue
+            try:
+                exporter(self, total, error)
+            except Exception as e:
+                logger.warning(f"Exporting {self.operation} to {name} failed: {e}")
+
+
+def current():
+    """
+    The timer of the operation running in this context, or None
+    """
+    return _current.get()
+
+
+@contextmanager
+def phase(name):
+    """
+    Time a phase of the current operation; a no-op outside of one
+    """
+    timer = _current.get()
+    if timer is None:
+        yield
+        return
+    with timer.phase(name):
+        yield
+
+
+def add_bytes(name, amount):
+    timer = _current.get()
+    if timer is not None:
+        timer.add_bytes(name, amount)
+
+
+########################################################################
+############################## Exporters ###############################
+########################################################################
+def _export_log(timer, total, error):
+    print(
+        json.dumps(
+            {
+                "operation": timer.operation,
+                "total": round(total, 3) if total is not None else None,
+                "error": error,
+                "timings": timer.timings,
+                "bytes": timer.bytes,
+            }
+        ),
+        flush=True,
+    )
+
+
+def _export_emf(timer, total, error):
+    """
+    CloudWatch embedded metric format: one line on stdout that the Lambda
+    runtime or the CloudWatch agent turns into metrics
+    """
+    document = {
+        "Service": METRICS_SERVICE,
+        "Operation": timer.operation,
+        "Errors": int(error),
+    }
+    metrics = [{"Name": "Errors", "Unit": "Count"}]
+    if total is not None:
+        document["total"] = round(total * 1000, 1)
+        metrics.append({"Name": "total", "Unit": "Milliseconds"})
+    for name, seconds in timer.timings.items():
+        document[name] = round(seconds * 1000, 1)
+        metrics.append({"Name": name, "Unit": "Milliseconds"})
+    for name, amount in timer.bytes.items():
+        document[f"{name}_bytes"] = amount
+        metrics.append({"Name": f"{name}_bytes", "Unit": "Bytes"})
+    document["_aws"] = {
+        "Timestamp": int(time.time() * 1000),
+        "CloudWatchMetrics": [
+            {
+                "Namespace": METRICS_NAMESPACE,
+                "Dimensions": [["Service", "Operation"]],
+                "Metrics": metrics,
+            }
+        ],
+    }
+    if METRICS_LOG_GROUP:
+        document["_aws"]["LogGroupName"] = METRICS_LOG_GROUP
+    line = json.dumps(document)
+    if METRICS_EMF_ENDPOINT:
+        _send_to_agent(line)
+    else:
+        print(line, flush=True)
+
+
+_agent_lock = threading.Lock()
+_agent_socket = None
+
+
+def _send_to_agent(line):
+    """
+    Send one EMF document to the CloudWatch agent. TCP connections are
+    reopened once when the agent went away, UDP needs no connection.
+    """
+    global _agent_socket
+    endpoint = urlparse(METRICS_EMF_ENDPOINT)
+    address = (endpoint.hostname, endpoint.port or 25888)
+    data = (line + "\n").encode()
+    if endpoint.scheme == "udp":
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as udp:
+            udp.sendto(data, address)
+        return
+    with _agent_lock:
+        for attempt in range(2):
+            try:
+                if _agent_socket is None:
+                    _agent_socket = socket.create_connection(address, timeout=1)
+                _agent_socket.sendall(data)
+                return
+            except OSError:
+                if _agent_socket is not None:
+                    _agent_socket.close()
+                    _agent_socket = None
+                if attempt:
+                    raise
+
+
+def _xray_active():
+    # Lambda sets the trace header per invocation when tracing is active.
+    # Nothing opens a segment elsewhere, and the SDK logs an error for
+    # every subsegment begun without one.
+    return xray_recorder is not None and bool(os.environ.get("_X_AMZN_TRACE_ID"))
+
+
+def _begin_subsegment(name):
+    try:
+        if _xray_active():
+            return xray_recorder.begin_subsegment(name)
+    except Exception as e:
+        logger.debug(f"No X-Ray subsegment for {name}: {e}")
+    return None
+
+
+def _end_subsegment(subsegment, byte_count):
+    try:
+        if byte_count is not None:
+            subsegment.put_metadata("bytes", byte_count)
+        xray_recorder.end_subsegment()
+    except Exception as e:
+        logger.debug(f"Closing X-Ray subsegment failed: {e}")
+
+
+if prometheus_client is not None:
+    _PHASE_SECONDS = prometheus_client.Histogram(
+        "c2pa_phase_seconds",
+        "Duration of one phase of an operation",
+        ["operation", "phase"],
+        buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+    )
+    _PHASE_BYTES = prometheus_client.Counter(
+        "c2pa_phase_bytes", "Bytes moved by one phase", ["operation", "phase"]
+    )
+    _OPERATIONS = prometheus_client.Counter(
+        "c2pa_operations", "Finished operations", ["operation", "outcome"]
+    )
+
+
+def _export_prometheus(timer, total, error):
+    if prometheus_client is None:
+        return
+    for name, seconds in timer.timings.items():
+        _PHASE_SECONDS.labels(timer.operation, name).observe(seconds)
+    for name, amount in timer.bytes.items():
+        _PHASE_BYTES.labels(timer.operation, name).inc(amount)
+    if total is not None:
+        _PHASE_SECONDS.labels(timer.operation, "total").observe(total)
+    _OPERATIONS.labels(timer.operation, "error" if error else "ok").inc()
+
+
+def prometheus_exposition():
+    """
+    (body, content type) of the Prometheus metrics, or None when the
+    exporter is off or prometheus_client isn't installed
+    """
+    if "prometheus" not in METRICS_EXPORTERS or prometheus_client is None:
+        return None
+    return prometheus_client.generate_latest(), prometheus_client.CONTENT_TYPE_LATEST
+
+
+EXPORTERS = {
+    "log": _export_log,
+    "emf": _export_emf,
+    "prometheus": _export_prometheus,
+}
@@ -0,0 +1,144 @@
+from urllib.parse import urlparse, parse_qs
+from collections import OrderedDict
+from http_client import shared_client
+
+import threading
+import logging
+import time
+import json
+import os
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_CACHE_SIZE = int(os.environ.get("manifest_template_cache_size", "64"))
+TEMPLATE_REVALIDATE_SECONDS = int(
+    os.environ.get("manifest_template_revalidate_seconds", "60")
+)
+
+CREATIVE_WORK_ASSERTION = {
+    "label": "stds.schema-org.CreativeWork",
+    "data": {
+        "@context": "http://schema.org/",
+        "@type": "CreativeWork",
+        "author": [{"@type": "Person", "name": "AWS C2PA Guidance"}],
+    },
+    "kind": "Json",
+}
+CLAIM_GENERATOR_INFO = [{"name": "c2pa-python", "version": "0.6.1"}]
+
+
+class ManifestTemplate:
+    """
+    Manifest definition for one assertions document, validated and
+    serialized once. render() only serializes the per-asset fields.
+    """
+
+    def __init__(self, assertions):
+        if not isinstance(assertions, list) or not all(
+            isinstance(assertion, dict) and "label" in assertion
+            for assertion in assertions
+        ):
+            raise ValueError("The assertions document must be a list of assertions")
+        self.assertions = assertions
+        self._assertions_json = json.dumps([CREATIVE_WORK_ASSERTION, *assertions])
+        self._claim_generator_info_json = json.dumps(CLAIM_GENERATOR_INFO)
+
+    def render(self, title, thumbnail_format=None):
+        """
+        Manifest JSON for one asset; the thumbnail entry is only added when
+        a thumbnail resource is attached
+        """
+        parts = [
+            '{"title": ',
+            json.dumps(title),
+            ', "assertions": ',
+            self._assertions_json,
+            ', "claim_generator_info": ',
+            self._claim_generator_info_json,
+        ]
+        if thumbnail_format is not None:
+            parts += [
+                ', "thumbnail": ',
+                json.dumps({"format": thumbnail_format, "identifier": "thumbnail"}),
+            ]
+        parts.append("}")
+        return "".join(parts)
+
+
+class _Entry:
+    def __init__(self, template, etag, last_modified):
+        self.template = template
+        self.etag = etag
+        self.last_modified = last_modified
+        self.checked_at = time.monotonic()
+
+
+def _is_presigned(url):
+    query = parse_qs(urlparse(url).query)
+    return "X-Amz-Signature" in query or "Signature" in query
+
+
+class ManifestTemplateCache:
+    """
+    LRU of ManifestTemplates keyed by assertions URL and validated with the
+    origin's ETag / Last-Modified. Within revalidate_seconds a template is
+    served without contacting the origin; after that a conditional GET only
+    downloads and parses the document again when it changed.
+    Presigned URLs are keyed without their signature, so every request for
+    the same object shares one entry, but they are revalidated on every use
+    because the signature is what authorizes the caller.
+    """
+
+    def __init__(
+        self,
+        max_entries=TEMPLATE_CACHE_SIZE,
+        revalidate_seconds=TEMPLATE_REVALIDATE_SECONDS,
+        http=None,
+    ):
+        self.http = http or shared_client()
+        self.max_entries = max_entries
+        self.revalidate_seconds = revalidate_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.revalidations = 0
+        self.fetches = 0
+
+    def get(self, url):
+        presigned = _is_presigned(url)
+        key = urlparse(url)._replace(query="").geturl() if presigned else url
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                fresh = time.monotonic() - entry.checked_at < self.revalidate_seconds
+                if fresh and not presigned:
+                    self.hits += 1
+                    return entry.template
+
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+        response = self.http.request("GET", url, headers)
+        if response.status == 304 and entry is not None:
+            with self._lock:
+                entry.checked_at = time.monotonic()
+                self.revalidations += 1
+            return entry.template
+
+        assertions = json.loads(response.data)
+        entry = _Entry(
+            ManifestTemplate(assertions),
+            response.headers.get("ETag"),
+            response.headers.get("Last-Modified"),
+        )
+        with self._lock:
+            self.fetches += 1
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry.template
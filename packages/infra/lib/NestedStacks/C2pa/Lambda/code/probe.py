@@ -0,0 +1,141 @@
+import struct
+import c2pa
+import io
+
+# C2PA manifest store box UUID for ISO BMFF (MP4, fMP4, MOV, HEIF ...)
+C2PA_BMFF_UUID = bytes.fromhex("d8fec3d61b0e483c92975828877ec481")
+
+JPEG_FORMATS = {"jpg", "jpeg", "image/jpeg"}
+PNG_FORMATS = {"png", "image/png"}
+WEBP_FORMATS = {"webp", "image/webp"}
+BMFF_FORMATS = {
+    "mp4", "m4a", "m4v", "m4s", "mov", "3gp", "heic", "heif", "avif",
+    "video/mp4", "audio/mp4", "video/quicktime", "image/heic", "image/avif",
+}
+
+
+class NoManifestError(Exception):
+    """
+    The asset carries no embedded C2PA manifest
+    """
+
+
+# c2pa-python reports unsigned assets as Error.ManifestNotFound
+C2PA_NOT_FOUND_ERRORS = tuple(
+    error
+    for error in (getattr(getattr(c2pa, "Error", None), "ManifestNotFound", None),)
+    if isinstance(error, type)
+)
+
+
+def _read_exact(source, offset, size):
+    source.seek(offset)
+    data = source.read(size)
+    return data if len(data) == size else None
+
+
+def _probe_jpeg(source):
+    # Walk marker segments up to Start Of Scan, C2PA lives in APP11 (JUMBF)
+    if _read_exact(source, 0, 2) != b"\xff\xd8":
+        return None
+    offset = 2
+    while True:
+        header = _read_exact(source, offset, 4)
+        if header is None or header[0] != 0xFF:
+            return False
+        marker, length = header[1], struct.unpack(">H", header[2:])[0]
+        if marker == 0xDA:
+            return False
+        if marker == 0xEB:
+            segment = _read_exact(source, offset + 4, min(length - 2, 64)) or b""
+            if b"jumb" in segment and b"c2pa" in segment:
+                return True
+        offset += 2 + length
+
+
+def _probe_png(source):
+    # c2pa writes the caBX chunk ahead of the image data
+    if _read_exact(source, 0, 8) != b"\x89PNG\r\n\x1a\n":
+        return None
+    offset = 8
+    while True:
+        header = _read_exact(source, offset, 8)
+        if header is None:
+            return False
+        length, chunk_type = struct.unpack(">I4s", header)
+        if chunk_type == b"caBX":
+            return True
+        if chunk_type in (b"IDAT", b"IEND"):
+            return False
+        offset += 12 + length
+
+
+def _probe_webp(source):
+    header = _read_exact(source, 0, 12)
+    if header is None or header[:4] != b"RIFF" or header[8:] != b"WEBP":
+        return None
+    offset = 12
+    while True:
+        chunk = _read_exact(source, offset, 8)
+        if chunk is None:
+            return False
+        fourcc, length = struct.unpack("<4sI", chunk)
+        if fourcc == b"C2PA":
+            return True
+        offset += 8 + length + (length & 1)
+
+
+def _probe_bmff(source):
+    # Top-level boxes only; mdat and friends are skipped by their size
+    offset = 0
+    first = True
+    while True:
+        header = _read_exact(source, offset, 8)
+        if header is None:
+            return False
+        size, box_type = struct.unpack(">I4s", header)
+        if first and box_type not in (b"ftyp", b"styp", b"moof", b"uuid", b"sidx"):
+            return None
+        first = False
+        header_size = 8
+        if size == 1:
+            large = _read_exact(source, offset + 8, 8)
+            if large is None:
+                return False
+            size = struct.unpack(">Q", large)[0]
+            header_size = 16
+        if box_type == b"uuid":
+            if _read_exact(source, offset + header_size, 16) == C2PA_BMFF_UUID:
+                return True
+        if size == 0:
+            return False
+        if size < header_size:
+            return None
+        offset += size
+
+
+def probe_manifest(source, format):
+    """
+    Cheap presence check for an embedded C2PA manifest that only touches
+    container headers. Returns True or False for JPEG, PNG, WebP and ISO
+    BMFF assets, and None when the format is unknown or the container
+    doesn't look like the extension says, in which case callers fall back
+    to a full c2pa.Reader parse.
+    """
+    format = format.lower()
+    if format in JPEG_FORMATS:
+        probe = _probe_jpeg
+    elif format in PNG_FORMATS:
+        probe = _probe_png
+    elif format in WEBP_FORMATS:
+        probe = _probe_webp
+    elif format in BMFF_FORMATS:
+        probe = _probe_bmff
+    else:
+        return None
+    try:
+        return probe(source)
+    except (struct.error, ValueError, io.UnsupportedOperation):
+        return None
+    finally:
+        source.seek(0)
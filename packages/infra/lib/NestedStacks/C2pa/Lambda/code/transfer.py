@@ -0,0 +1,209 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+from urllib.parse import urlparse, unquote
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+
+import logging
+import boto3
+import re
+import os
+
+logger = logging.getLogger(__name__)
+
+MiB = 1024 * 1024
+
+# Objects transferred side by side (fragments, renditions, batch uploads)
+TRANSFER_CONCURRENCY = int(os.environ.get("transfer_concurrency", "16"))
+# Parts of one large object transferred side by side
+MULTIPART_CONCURRENCY = int(os.environ.get("s3_multipart_concurrency", "10"))
+MULTIPART_THRESHOLD = int(os.environ.get("s3_multipart_threshold_mb", "16")) * MiB
+MULTIPART_CHUNKSIZE = int(os.environ.get("s3_multipart_chunksize_mb", "16")) * MiB
+S3_MAX_POOL_CONNECTIONS = int(
+    os.environ.get(
+        "s3_max_pool_connections",
+        max(TRANSFER_CONCURRENCY, MULTIPART_CONCURRENCY) * 2,
+    )
+)
+S3_MAX_ATTEMPTS = int(os.environ.get("s3_max_attempts", "10"))
+# adaptive adds client-side rate limiting on throttling to standard retries
+S3_RETRY_MODE = os.environ.get("s3_retry_mode", "adaptive")
+
+# Buckets the service's role can read, so their presigned URLs can be read
+# through the S3 client instead
+OWNED_BUCKETS = frozenset(
+    bucket
+    for bucket in (os.environ.get("output_bucket"), os.environ.get("input_bucket"))
+    if bucket
+)
+
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=MULTIPART_THRESHOLD,
+    multipart_chunksize=MULTIPART_CHUNKSIZE,
+    max_concurrency=MULTIPART_CONCURRENCY,
+    use_threads=True,
+)
+
+# Virtual-hosted (bucket.s3[.region].amazonaws.com) and path-style
+# (s3[.region].amazonaws.com/bucket) S3 endpoints
+_S3_HOST = re.compile(
+    r"^(?:(?P<bucket>[a-z0-9.-]+)\.)?s3(?:[.-][a-z0-9-]+)?\.amazonaws\.com(?:\.cn)?$"
+)
+
+
+def create_s3_client():
+    """
+    S3 client whose connection pool is large enough for the transfer pool,
+    with adaptive retries so throttling backs off instead of failing.
+    boto3 clients are thread safe, so a single client is shared by all workers.
+    """
+    return boto3.client(
+        "s3",
+        config=Config(
+            max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+            retries={"max_attempts": S3_MAX_ATTEMPTS, "mode": S3_RETRY_MODE},
+            tcp_keepalive=True,
+        ),
+    )
+
+
+def s3_location(url):
+    """
+    (bucket, key) for an s3:// URL or an HTTPS URL pointing at S3, including
+    presigned URLs, otherwise None
+    """
+    url_config = urlparse(url)
+    if url_config.scheme == "s3":
+        return url_config.netloc, url_config.path.lstrip("/")
+    if url_config.scheme != "https":
+        return None
+    match = _S3_HOST.match(url_config.hostname or "")
+    if match is None:
+        return None
+    path = unquote(url_config.path.lstrip("/"))
+    if match.group("bucket"):
+        return match.group("bucket"), path
+    bucket, _, key = path.partition("/")
+    return (bucket, key) if bucket and key else None
+
+
+def download_fileobj(s3, bucket, key, f, callback=None):
+    """
+    Download one object into the writable file object f
+    """
+    s3.download_fileobj(bucket, key, f, Callback=callback, Config=TRANSFER_CONFIG)
+
+
+def download_object(s3, bucket, key, path, callback=None):
+    """
+    Download one object to path, returning the path
+    """
+    with open(path, "wb") as f:
+        download_fileobj(s3, bucket, key, f, callback)
+    return path
+
+
+def upload_file(s3, path, bucket, key, extra_args=None, callback=None):
+    """
+    Upload the file at path, in parallel parts when it is large
+    """
+    s3.upload_file(
+        path,
+        bucket,
+        key,
+        ExtraArgs=extra_args,
+        Callback=callback,
+        Config=TRANSFER_CONFIG,
+    )
+
+
+def upload_fileobj(s3, f, bucket, key, extra_args=None, callback=None):
+    """
+    Upload the readable file object f, in parallel parts when it is large
+    """
+    s3.upload_fileobj(
+        f,
+        bucket,
+        key,
+        ExtraArgs=extra_args,
+        Callback=callback,
+        Config=TRANSFER_CONFIG,
+    )
+
+
+def wait_all(futures):
+    """
+    Results of futures in order, raising the first failure as soon as it
+    happens
+    """
+    done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+    for future in done:
+        # Surface the first failure instead of silently dropping it
+        future.result()
+    return [future.result() for future in futures]
+
+
+def list_prefix(s3, bucket, prefix, suffixes, include=None):
+    """
+    Listing entries under prefix whose key ends with one of suffixes and,
+    when given, for which include(obj) is true
+    """
+    paginator = s3.get_paginator("list_objects_v2")
+    return [
+        obj
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix)
+        for obj in page.get("Contents", [])
+        if obj["Key"].endswith(tuple(suffixes)) and (include is None or include(obj))
+    ]
+
+
+def download_prefix(
+    s3,
+    bucket,
+    prefix,
+    dest_dir,
+    suffixes,
+    include=None,
+    concurrency=TRANSFER_CONCURRENCY,
+    callback=None,
+):
+    """
+    Download every object under prefix whose key ends with one of suffixes
+    and, when given, for which include(obj) is true.
+    Downloads are submitted as soon as each listing page arrives, so transfers
+    overlap with the listing of later pages. Returns the local paths.
+    callback is passed to boto3 and called with each chunk's byte count.
+    """
+    paginator = s3.get_paginator("list_objects_v2")
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = []
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                if obj["Key"].endswith(tuple(suffixes)) and (
+                    include is None or include(obj)
+                ):
+                    path = os.path.join(dest_dir, os.path.basename(obj["Key"]))
+                    futures.append(
+                        pool.submit(
+                            download_object, s3, bucket, obj["Key"], path, callback
+                        )
+                    )
+        paths = wait_all(futures)
+    logger.info(f"Downloaded {len(paths)} objects from s3://{bucket}/{prefix}")
+    return paths
+
+
+def upload_files(
+    s3, uploads, bucket, concurrency=TRANSFER_CONCURRENCY, callback=None
+):
+    """
+    Upload (local_path, key) pairs to bucket with bounded concurrency.
+    callback is passed to boto3 and called with each chunk's byte count.
+    """
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [
+            pool.submit(upload_file, s3, path, bucket, key, callback=callback)
+            for path, key in uploads
+        ]
+        wait_all(futures)
+    logger.info(f"Uploaded {len(futures)} objects to s3://{bucket}")
+    return len(futures)
@@ -1,60 +1,21 @@
-from fastapi.responses import PlainTextResponse
-from fastapi import Request
-
 import subprocess
-import datetime
-import glob
-import sys
 import os
 
 
-async def unhandled_exception_handler(
-    request: Request, exc: Exception
-) -> PlainTextResponse:
-    """
-    This middleware will log all unhandled exceptions.
-    Unhandled exceptions are all exceptions that are not HTTPExceptions or RequestValidationErrors.
-    """
-    print("Our custom unhandled_exception_handler was called")
-    host = getattr(getattr(request, "client", None), "host", None)
-    port = getattr(getattr(request, "client", None), "port", None)
-    url = (
-        f"{request.url.path}?{request.query_params}"
-        if request.query_params
-        else request.url.path
-    )
-    exception_type, exception_value, exception_traceback = sys.exc_info()
-    exception_name = getattr(exception_type, "__name__", None)
-    print(
-        f'{host}:{port} - "{request.method} {url}" 500 Internal Server Error <{exception_name}: {exception_value}>'
-    )
-    return PlainTextResponse(str(exc), status_code=500)
-
-
-def garbage_collect_folder(pattern):
-    print(f"{datetime.datetime.now()}: Cleaning up pattern {pattern}")
-    files = glob.glob(pattern)
-    for f in files:
-        os.remove(f)
-    print(f"{datetime.datetime.now()}: Finished!")
+c2patool_path = "/usr/local/bin/c2patool"
+_c2patool_checked = False
 
 
-def run_c2pa_command_for_fmp4(init_file, fragments_glob, output_dir, manifest_file):
+def check_c2patool():
     """
-    Run c2patool command for fragmented MP4 files with manifest
+    Make sure c2patool exists and is executable, returning an error message
+    when it can't be used
     """
-    # Create output directory if it doesn't exist
-    os.makedirs(output_dir, exist_ok=True)
-
-    # Build command exactly as specified
-    # Use full path to c2patool to avoid PATH issues
-    c2patool_path = "/usr/local/bin/c2patool"
-    
     # Check if c2patool exists and has execute permissions
     if not os.path.exists(c2patool_path):
         print(f"ERROR: {c2patool_path} does not exist")
-        return False, f"{c2patool_path} does not exist"
-    
+        return f"{c2patool_path} does not exist"
+
     if not os.access(c2patool_path, os.X_OK):
         print(f"ERROR: {c2patool_path} is not executable")
         # Try to fix permissions
@@ -63,8 +24,27 @@ def run_c2pa_command_for_fmp4(init_file, fragments_glob, output_dir, manifest_fi
             print(f"Fixed permissions for {c2patool_path}")
         except Exception as e:
             print(f"Failed to fix permissions: {str(e)}")
-            return False, f"Failed to fix permissions for {c2patool_path}: {str(e)}"
-    
+            return f"Failed to fix permissions for {c2patool_path}: {str(e)}"
+    return None
+
+
+def run_c2pa_command_for_fmp4(init_file, fragments_glob, output_dir, manifest_file):
+    """
+    Run c2patool command for fragmented MP4 files with manifest
+    """
+    # Create output directory if it doesn't exist
+    os.makedirs(output_dir, exist_ok=True)
+
+    # The binary only needs checking once per execution environment
+    global _c2patool_checked
+    if not _c2patool_checked:
+        error = check_c2patool()
+        if error:
+            return False, error
+        _c2patool_checked = True
+
+    # Build command exactly as specified
+    # Use full path to c2patool to avoid PATH issues
     command = [
         c2patool_path,
         "-m",
@@ -83,27 +63,16 @@ def run_c2pa_command_for_fmp4(init_file, fragments_glob, output_dir, manifest_fi
     print(f"{' '.join(command)}")
     print("=" * 50 + "\n")
 
-    # Run command and capture output in real-time
-    process = subprocess.Popen(
+    # Run command and log its output once it exits
+    completed = subprocess.run(
         command,
         stdout=subprocess.PIPE,
         stderr=subprocess.STDOUT,
         universal_newlines=True,
     )
-
-    # Store the complete output
-    full_output = []
-
-    # Print and store output in real-time
-    for line in process.stdout:
-        print(line, end="")  # Print in real-time
-        full_output.append(line)
-
-    # Wait for process to complete and get return code
-    return_code = process.wait()
-
-    # Join all output lines
-    output = "".join(full_output)
+    return_code = completed.returncode
+    output = completed.stdout
+    print(output, end="")
 
     if return_code != 0:
         error_message = (
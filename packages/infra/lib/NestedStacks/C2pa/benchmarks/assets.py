@@ -0,0 +1,198 @@
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.x509.oid import NameOID, ExtendedKeyUsageOID
+from cryptography import x509
+from PIL import Image
+
+import subprocess
+import datetime
+import shutil
+import json
+import os
+
+ASSERTIONS = [
+    {
+        "label": "c2pa.training-mining",
+        "data": {
+            "entries": {
+                "c2pa.ai_generative_training": {"use": "notAllowed"},
+                "c2pa.ai_inference": {"use": "notAllowed"},
+                "c2pa.ai_training": {"use": "notAllowed"},
+                "c2pa.data_mining": {"use": "notAllowed"},
+            }
+        },
+    }
+]
+
+# c2patool manifest for /sign_fmp4, signed with c2patool's built-in test key
+FMP4_MANIFEST = {
+    "claim_generator": "c2pa-benchmarks/1.0",
+    "assertions": ASSERTIONS,
+}
+
+
+def _name(common_name):
+    return x509.Name(
+        [
+            x509.NameAttribute(NameOID.ORGANIZATION_NAME, "C2PA Benchmarks"),
+            x509.NameAttribute(NameOID.COMMON_NAME, common_name),
+        ]
+    )
+
+
+def signing_material():
+    """
+    (private_key_pem, certificate_chain_pem) for a throwaway RSA CA and a
+    leaf that satisfies the C2PA certificate profile, for PS256 signing
+    """
+    now = datetime.datetime.now(datetime.timezone.utc)
+    validity = (now - datetime.timedelta(days=1), now + datetime.timedelta(days=30))
+
+    ca_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    ca_cert = (
+        x509.CertificateBuilder()
+        .subject_name(_name("C2PA Benchmarks Root"))
+        .issuer_name(_name("C2PA Benchmarks Root"))
+        .public_key(ca_key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(validity[0])
+        .not_valid_after(validity[1])
+        .add_extension(x509.BasicConstraints(ca=True, path_length=0), critical=True)
+        .add_extension(
+            x509.SubjectKeyIdentifier.from_public_key(ca_key.public_key()),
+            critical=False,
+        )
+        .add_extension(
+            x509.KeyUsage(
+                digital_signature=False,
+                content_commitment=False,
+                key_encipherment=False,
+                data_encipherment=False,
+                key_agreement=False,
+                key_cert_sign=True,
+                crl_sign=True,
+                encipher_only=False,
+                decipher_only=False,
+            ),
+            critical=True,
+        )
+        .sign(ca_key, hashes.SHA256())
+    )
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(_name("C2PA Benchmarks Signer"))
+        .issuer_name(ca_cert.subject)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(validity[0])
+        .not_valid_after(validity[1])
+        .add_extension(x509.BasicConstraints(ca=False, path_length=None), critical=True)
+        .add_extension(
+            x509.SubjectKeyIdentifier.from_public_key(key.public_key()),
+            critical=False,
+        )
+        .add_extension(
+            x509.AuthorityKeyIdentifier.from_issuer_public_key(ca_key.public_key()),
+            critical=False,
+        )
+        .add_extension(
+            x509.KeyUsage(
+                digital_signature=True,
+                content_commitment=False,
+                key_encipherment=False,
+                data_encipherment=False,
+                key_agreement=False,
+                key_cert_sign=False,
+                crl_sign=False,
+                encipher_only=False,
+                decipher_only=False,
+            ),
+            critical=True,
+        )
+        .add_extension(
+            x509.ExtendedKeyUsage([ExtendedKeyUsageOID.EMAIL_PROTECTION]),
+            critical=False,
+        )
+        .sign(ca_key, hashes.SHA256())
+    )
+
+    private_key_pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    chain_pem = cert.public_bytes(serialization.Encoding.PEM) + ca_cert.public_bytes(
+        serialization.Encoding.PEM
+    )
+    return private_key_pem.decode("utf-8"), chain_pem.decode("utf-8")
+
+
+def write_image(path, size, seed=0, quality=90):
+    """
+    JPEG of size x size pixels. Every seed renders a different part of the
+    Mandelbrot set plus noise, so the image compresses like a photo and no
+    two requests hit the same cache entries.
+    """
+    offset = seed * 0.013
+    fractal = Image.effect_mandelbrot(
+        (size, size), (-2.0 + offset, -1.25, 0.5 + offset, 1.25), 64
+    )
+    noise = Image.effect_noise((size, size), 24)
+    image = Image.merge("RGB", (fractal, noise, Image.blend(fractal, noise, 0.5)))
+    image.save(path, format="JPEG", quality=quality)
+    return os.path.getsize(path)
+
+
+def ffmpeg_available():
+    return shutil.which("ffmpeg") is not None
+
+
+def write_dash(directory, seconds, segment_seconds, renditions=1):
+    """
+    Encode a synthetic DASH presentation of the given length with ffmpeg:
+    init.mp4 (per rendition), segment_*.m4s and manifest.mpd. Returns the
+    number of media segments.
+    """
+    os.makedirs(directory, exist_ok=True)
+    heights = [360, 540, 720, 1080][:renditions]
+    command = [
+        "ffmpeg",
+        "-loglevel", "error",
+        "-y",
+        "-f", "lavfi",
+        "-i", f"testsrc2=duration={seconds}:size=1280x720:rate=30",
+    ]
+    for index, height in enumerate(heights):
+        command += [
+            "-map", "0:v",
+            f"-filter:v:{index}", f"scale=-2:{height}",
+            f"-b:v:{index}", f"{height * 3}k",
+        ]
+    command += [
+        "-c:v", "libx264",
+        "-preset", "veryfast",
+        "-g", str(30 * segment_seconds),
+        "-keyint_min", str(30 * segment_seconds),
+        "-sc_threshold", "0",
+        "-f", "dash",
+        "-seg_duration", str(segment_seconds),
+        "-use_template", "1",
+        "-use_timeline", "0",
+        "-init_seg_name",
+        "init.mp4" if renditions == 1 else "init-$RepresentationID$.mp4",
+        "-media_seg_name",
+        "segment_$Number%05d$.m4s"
+        if renditions == 1
+        else "segment-$RepresentationID$-$Number%05d$.m4s",
+        os.path.join(directory, "manifest.mpd"),
+    ]
+    subprocess.run(command, check=True)
+    return len([name for name in os.listdir(directory) if name.endswith(".m4s")])
+
+
+def write_json(path, document):
+    with open(path, "w") as f:
+        json.dump(document, f)
+    return os.path.getsize(path)
@@ -0,0 +1,370 @@
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from contextlib import redirect_stdout, contextmanager
+from urllib.request import urlopen
+from urllib.error import HTTPError
+from tsa import serve as serve_tsa
+
+import multiprocessing
+import subprocess
+import importlib
+import hashlib
+import logging
+import socket
+import shutil
+import json
+import time
+import uuid
+import sys
+import os
+
+C2PA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVICE_DIRS = {
+    "fargate": os.path.join(C2PA_DIR, "Fargate", "code"),
+    "lambda": os.path.join(C2PA_DIR, "Lambda", "code"),
+}
+
+INPUT_BUCKET = "c2pa-benchmarks-input"
+OUTPUT_BUCKET = "c2pa-benchmarks-output"
+PRIVATE_KEY_SECRET = "c2pa-benchmarks/private-key"
+CERTIFICATE_SECRET = "c2pa-benchmarks/certificate"
+# Tells the generated assets apart from other objects in the input bucket,
+# which may be shared when --s3-endpoint points at e.g. MinIO
+ASSET_PREFIX = "c2pa-bench-"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_for(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            urlopen(url, timeout=1).close()
+            return
+        except HTTPError:
+            # Answering at all means it is up
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.1)
+
+
+########################################################################
+############################ Local origin ##############################
+########################################################################
+class _OriginHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    directory = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        path = os.path.realpath(
+            os.path.join(self.directory, self.path.split("?")[0].lstrip("/"))
+        )
+        if not path.startswith(self.directory) or not os.path.isfile(path):
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        size = os.path.getsize(path)
+        stat = os.stat(path)
+        etag = f'"{stat.st_mtime_ns:x}-{size:x}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        start, end = 0, size - 1
+        ranged = self.headers.get("Range", "").startswith("bytes=")
+        if_range = self.headers.get("If-Range")
+        if ranged and (if_range is None or if_range == etag):
+            first, _, last = self.headers["Range"][6:].partition("-")
+            if first:
+                start, end = int(first), min(int(last or size - 1), size - 1)
+            else:
+                start = max(0, size - int(last))
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        else:
+            self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        with open(path, "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining:
+                chunk = f.read(min(remaining, 1024 * 1024))
+                self.wfile.write(chunk)
+                remaining -= len(chunk)
+
+
+def _serve_origin(directory, port):
+    _OriginHandler.directory = os.path.realpath(directory)
+    ThreadingHTTPServer(("127.0.0.1", port), _OriginHandler).serve_forever()
+
+
+class Origin:
+    """
+    Static HTTP origin with Range, If-Range and ETag support, standing in
+    for a CDN or a customer's web server. It runs in its own process so it
+    doesn't compete with the service under test for the GIL.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self._process = None
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._process = multiprocessing.get_context("spawn").Process(
+            target=_serve_origin, args=(self.directory, self.port), daemon=True
+        )
+        self._process.start()
+        _wait_for(f"{self.url}/")
+        return self
+
+    def stop(self):
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def url_for(self, name):
+        return f"{self.url}/{name}"
+
+
+class LocalTsa:
+    """
+    The stand-in RFC 3161 timestamp authority of tsa.py in its own process.
+    delay (seconds) is added to every answer, to stand in for the round trip
+    to a remote TSA, and fail_rate of the requests are answered with 503 to
+    exercise the services' failover.
+    """
+
+    def __init__(self, delay=0.0, fail_rate=0.0):
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}/"
+        self.delay = delay
+        self.fail_rate = fail_rate
+        self._process = None
+
+    def start(self):
+        self._process = multiprocessing.get_context("spawn").Process(
+            target=serve_tsa,
+            args=(self.port, self.delay, self.fail_rate),
+            daemon=True,
+        )
+        self._process.start()
+        _wait_for(self.url)
+        return self
+
+    def stop(self):
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+
+
+########################################################################
+############################## Local AWS ###############################
+########################################################################
+class LocalAws:
+    """
+    moto server standing in for S3 and Secrets Manager. s3_endpoint points
+    S3 at another server instead (e.g. MinIO); Secrets Manager stays on
+    moto. Configures the process environment so every boto3 client the
+    services create talks to the stand-ins.
+    """
+
+    def __init__(self, s3_endpoint=None):
+        self.port = free_port()
+        self.endpoint = f"http://127.0.0.1:{self.port}"
+        self.s3_endpoint = s3_endpoint or self.endpoint
+        self._process = None
+
+    def start(self):
+        self._process = subprocess.Popen(
+            [
+                sys.executable,
+                "-m", "moto.server",
+                "-H", "127.0.0.1",
+                "-p", str(self.port),
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        _wait_for(f"{self.endpoint}/moto-api/")
+        os.environ.setdefault("AWS_ACCESS_KEY_ID", "benchmarks")
+        os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "benchmarks")
+        os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+        os.environ["AWS_ENDPOINT_URL"] = self.endpoint
+        os.environ["AWS_ENDPOINT_URL_S3"] = self.s3_endpoint
+        return self
+
+    def stop(self):
+        if self._process is not None:
+            self._process.terminate()
+            self._process.wait()
+
+    def client(self, name):
+        import boto3
+
+        return boto3.client(name)
+
+    def provision(self, private_key_pem, certificate_pem):
+        s3 = self.client("s3")
+        for bucket in (INPUT_BUCKET, OUTPUT_BUCKET):
+            try:
+                s3.create_bucket(Bucket=bucket)
+            except s3.exceptions.BucketAlreadyOwnedByYou:
+                pass
+        secretsmanager = self.client("secretsmanager")
+        for name, value in (
+            (PRIVATE_KEY_SECRET, private_key_pem),
+            (CERTIFICATE_SECRET, certificate_pem),
+        ):
+            try:
+                secretsmanager.create_secret(Name=name, SecretString=value)
+            except secretsmanager.exceptions.ResourceExistsException:
+                secretsmanager.put_secret_value(SecretId=name, SecretString=value)
+
+
+########################################################################
+########################## Service under test ##########################
+########################################################################
+class _Context:
+    """
+    The attributes Powertools reads from a Lambda context
+    """
+
+    function_name = "c2pa-benchmarks"
+    function_version = "$LATEST"
+    memory_limit_in_mb = 10240
+    invoked_function_arn = (
+        "arn:aws:lambda:us-east-1:000000000000:function:c2pa-benchmarks"
+    )
+
+    def __init__(self):
+        self.aws_request_id = str(uuid.uuid4())
+
+    def get_remaining_time_in_millis(self):
+        return 900_000
+
+
+class Service:
+    """
+    One of the two services imported in this process and driven through
+    its real routing layer: FastAPI's TestClient for Fargate, the Function
+    URL resolver for Lambda. Only one can be loaded per process because both
+    ship modules with the same names.
+    """
+
+    def __init__(self, name, workspace, tsa_url=None, log_path=None):
+        self.name = name
+        self.workspace = workspace
+        self.tsa_url = tsa_url
+        self.log_path = log_path or os.path.join(workspace, f"{name}.log")
+        self._log = None
+        self._client = None
+        self.module = None
+
+    def load(self):
+        code_dir = SERVICE_DIRS[self.name]
+        sys.path.insert(0, code_dir)
+        os.environ.update(
+            {
+                "input_bucket": INPUT_BUCKET,
+                "output_bucket": OUTPUT_BUCKET,
+                "private_key": PRIVATE_KEY_SECRET,
+                "certificate": CERTIFICATE_SECRET,
+                "POWERTOOLS_TRACE_DISABLED": "true",
+                "POWERTOOLS_SERVICE_NAME": "c2pa-benchmarks",
+                "AWS_LAMBDA_FUNCTION_NAME": "c2pa-benchmarks",
+                # Read by signing pool workers too, so set before anything loads
+                "timestamp_authority_url": self.tsa_url or "",
+                "scratch_dir": os.path.join(self.workspace, "scratch"),
+            }
+        )
+        # A kept workspace must not start the run with warm disk caches
+        shutil.rmtree(os.path.join(self.workspace, "scratch"), ignore_errors=True)
+
+        self._log = open(self.log_path, "a")
+        with redirect_stdout(self._log):
+            if self.name == "fargate":
+                from fastapi.testclient import TestClient
+
+                self.module = importlib.import_module("main")
+                self._client = TestClient(self.module.app)
+                self._client.__enter__()
+            else:
+                self.module = importlib.import_module("index")
+                self.module.logger.setLevel(logging.WARNING)
+                # handler() isn't used, so report the init breakdown here
+                self.module.cold_start.report()
+                utils = importlib.import_module("utils")
+                utils.c2patool_path = shutil.which("c2patool") or utils.c2patool_path
+        return self
+
+    def close(self):
+        if self._client is not None:
+            with redirect_stdout(self._log):
+                self._client.__exit__(None, None, None)
+        if self._log is not None:
+            self._log.close()
+        if self.name == "lambda":
+            # Fargate's lifespan stops it; Lambda has no shutdown hook
+            self.module.scratch.shutdown()
+
+    @contextmanager
+    def quiet(self):
+        """
+        Send the services' prints to the log file while a workload runs
+        """
+        with redirect_stdout(self._log):
+            yield
+
+    def call(self, path, body):
+        """
+        POST body to path, returning (status_code, parsed JSON body)
+        """
+        if self.name == "fargate":
+            response = self._client.post(path, json=body)
+            try:
+                return response.status_code, response.json()
+            except ValueError:
+                return response.status_code, {"error": response.text}
+
+        payload = json.dumps(body)
+        event = {
+            "version": "2.0",
+            "routeKey": "$default",
+            "rawPath": path,
+            "rawQueryString": "",
+            "headers": {"content-type": "application/json"},
+            "requestContext": {
+                "http": {"method": "POST", "path": path, "sourceIp": "127.0.0.1"},
+                "requestId": hashlib.sha1(payload.encode()).hexdigest(),
+                "stage": "$default",
+            },
+            "body": payload,
+            "isBase64Encoded": False,
+        }
+        # The resolver, not handler(): handler() logs every event in full
+        response = self.module.app.resolve(event, _Context())
+        try:
+            return response["statusCode"], json.loads(response.get("body") or "{}")
+        except ValueError:
+            return response["statusCode"], {"error": response.get("body")}
@@ -0,0 +1,317 @@
+"""
+Offline benchmarks for /sign_file, /read_file and /sign_fmp4 of both
+services against local stand-ins for S3, Secrets Manager and the HTTP
+origin. See README.md.
+"""
+
+from environment import Origin, LocalAws, LocalTsa, Service
+from workloads import Setup, SkipWorkload, configurations, build_requests, measure
+from datetime import datetime, timezone
+
+import subprocess
+import platform
+import argparse
+import tempfile
+import assets
+import shutil
+import json
+import sys
+import os
+
+# Compared against a baseline; higher is worse unless listed in HIGHER_IS_BETTER
+COMPARED_METRICS = ("p50_ms", "p95_ms", "p99_ms", "throughput_rps", "peak_rss_mb")
+HIGHER_IS_BETTER = {"throughput_rps"}
+
+
+def _int_list(value):
+    return [int(item) for item in value.split(",") if item]
+
+
+def _str_list(value):
+    return [item for item in value.split(",") if item]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--service", choices=["fargate", "lambda", "all"], default="all"
+    )
+    parser.add_argument(
+        "--workloads", type=_str_list, default=["sign_file", "read_file", "sign_fmp4"]
+    )
+    parser.add_argument("--image-sizes", type=_int_list, default=[512, 2048, 4096])
+    parser.add_argument("--ingredients", type=_int_list, default=[0, 2])
+    parser.add_argument("--video-seconds", type=_int_list, default=[10, 60])
+    parser.add_argument("--segment-seconds", type=_int_list, default=[2])
+    parser.add_argument(
+        "--fmp4-modes", type=_str_list, default=["default", "pipelined"]
+    )
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 4])
+    parser.add_argument(
+        "--requests", type=int, default=20, help="Measured requests per configuration"
+    )
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument(
+        "--source",
+        choices=["origin", "s3"],
+        default="origin",
+        help="Serve assets from the local HTTP origin or presigned S3 URLs",
+    )
+    parser.add_argument(
+        "--s3-endpoint", help="Use this S3 endpoint (e.g. MinIO) instead of moto"
+    )
+    parser.add_argument(
+        "--tsa-url",
+        default=None,
+        help="Comma-separated timestamp authorities, tried in order; "
+        "none signs without a timestamp",
+    )
+    parser.add_argument(
+        "--local-tsa",
+        action="store_true",
+        help="Add the stand-in RFC 3161 TSA of tsa.py after --tsa-url",
+    )
+    parser.add_argument(
+        "--tsa-delay-ms",
+        type=float,
+        default=0.0,
+        help="Latency the local TSA adds to every answer",
+    )
+    parser.add_argument(
+        "--tsa-fail-rate",
+        type=float,
+        default=0.0,
+        help="Share of requests the local TSA answers with 503",
+    )
+    parser.add_argument("--workspace", help="Keep generated assets and logs here")
+    parser.add_argument("--save", help="Write the results to this baseline file")
+    parser.add_argument("--compare", help="Compare the results with this baseline")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.10,
+        help="Relative change reported as a regression (default 0.10)",
+    )
+    parser.add_argument(
+        "--fail-on-regression", action="store_true", help="Exit 1 on regressions"
+    )
+    parser.add_argument("--results", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def result_key(result):
+    parameters = ",".join(f"{k}={v}" for k, v in sorted(result["parameters"].items()))
+    return (
+        f"{result['service']}:{result['workload']}:{parameters}:"
+        f"c{result['concurrency']}"
+    )
+
+
+def run_service(args, name, workspace):
+    """
+    Benchmark one service in this process, returning its result records
+    """
+    out = sys.stdout
+    aws = LocalAws(args.s3_endpoint).start()
+    origin = Origin(os.path.join(workspace, "origin")).start()
+    tsa = None
+    service = None
+    results = []
+    try:
+        tsa_urls = [url for url in (args.tsa_url or "").split(",") if url]
+        if args.local_tsa:
+            tsa = LocalTsa(args.tsa_delay_ms / 1000, args.tsa_fail_rate).start()
+            tsa_urls.append(tsa.url)
+        aws.provision(*assets.signing_material())
+        service = Service(name, os.path.join(workspace, name), ",".join(tsa_urls))
+        os.makedirs(service.workspace, exist_ok=True)
+        service.load()
+        setup = Setup(service, origin, aws, args.source)
+        count = args.requests + args.warmup
+
+        for workload, parameters in configurations(args):
+            for level, concurrency in enumerate(args.concurrency):
+                try:
+                    with service.quiet():
+                        requests = build_requests(
+                            setup, workload, parameters, count, level * count
+                        )
+                        stats = measure(service, requests, concurrency, args.warmup)
+                except SkipWorkload as e:
+                    print(f"{name} {workload} {parameters}: skipped, {e}", file=out)
+                    break
+                record = {
+                    "service": name,
+                    "workload": workload,
+                    "parameters": parameters,
+                    "concurrency": concurrency,
+                    **stats,
+                }
+                print(format_row(record), file=out, flush=True)
+                results.append(record)
+    finally:
+        if service is not None:
+            service.close()
+        if tsa is not None:
+            tsa.stop()
+        origin.stop()
+        aws.stop()
+    return results
+
+
+def run_all(args, argv):
+    """
+    Both services, each in its own interpreter since their modules collide
+    """
+    results = []
+    for name in ("fargate", "lambda"):
+        with tempfile.NamedTemporaryFile(suffix=".json") as output:
+            child_argv = [a for a in argv if a not in ("--fail-on-regression",)]
+            child_argv = _without_option(child_argv, "--service")
+            child_argv = _without_option(child_argv, "--save")
+            child_argv = _without_option(child_argv, "--compare")
+            subprocess.run(
+                [
+                    sys.executable,
+                    os.path.abspath(__file__),
+                    *child_argv,
+                    "--service",
+                    name,
+                    "--results",
+                    output.name,
+                ],
+                check=True,
+            )
+            with open(output.name) as f:
+                results += json.load(f)
+    return results
+
+
+def _without_option(argv, option):
+    stripped, skip = [], False
+    for arg in argv:
+        if skip:
+            skip = False
+        elif arg == option:
+            skip = True
+        elif not arg.startswith(f"{option}="):
+            stripped.append(arg)
+    return stripped
+
+
+def format_row(record):
+    parameters = " ".join(f"{k}={v}" for k, v in record["parameters"].items())
+    if "p50_ms" not in record:
+        return (
+            f"{record['service']:8} {record['workload']:10} {parameters:40} "
+            f"c={record['concurrency']:<3} all {record['errors']} requests failed: "
+            f"{record.get('first_error', '')}"
+        )
+    return (
+        f"{record['service']:8} {record['workload']:10} {parameters:40} "
+        f"c={record['concurrency']:<3} p50={record['p50_ms']:>8.1f}ms "
+        f"p95={record['p95_ms']:>8.1f}ms p99={record['p99_ms']:>8.1f}ms "
+        f"{record['throughput_rps']:>7.2f} req/s "
+        f"{record['throughput_mbps']:>7.2f} MB/s "
+        f"rss={record['peak_rss_mb']:>7.1f}MB errors={record['errors']}"
+    )
+
+
+def metadata(args):
+    def version(package):
+        try:
+            from importlib.metadata import version as package_version
+
+            return package_version(package)
+        except Exception:
+            return None
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "c2pa_python": version("c2pa-python"),
+        "boto3": version("boto3"),
+        "tsa": {
+            "urls": args.tsa_url,
+            "local": args.local_tsa,
+            "delay_ms": args.tsa_delay_ms,
+            "fail_rate": args.tsa_fail_rate,
+        },
+    }
+
+
+def compare(results, baseline_path, tolerance):
+    """
+    Print each metric's change against the baseline, returning the number
+    of regressions beyond tolerance
+    """
+    with open(baseline_path) as f:
+        baseline = {result_key(r): r for r in json.load(f)["results"]}
+
+    regressions = 0
+    print(f"\nCompared with {baseline_path} (tolerance {tolerance:.0%})")
+    for result in results:
+        key = result_key(result)
+        previous = baseline.get(key)
+        if previous is None:
+            print(f"  {key}: not in baseline")
+            continue
+        changes = []
+        for metric in COMPARED_METRICS:
+            if metric not in result or not previous.get(metric):
+                continue
+            change = result[metric] / previous[metric] - 1
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            flag = ""
+            if worse > tolerance:
+                flag = " REGRESSION"
+                regressions += 1
+            changes.append(f"{metric} {change:+.1%}{flag}")
+        print(f"  {key}: {', '.join(changes)}")
+    return regressions
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    args = parse_args(argv)
+
+    if args.service == "all":
+        results = run_all(args, argv)
+    else:
+        workspace = args.workspace or tempfile.mkdtemp(prefix="c2pa-benchmarks-")
+        try:
+            results = run_service(args, args.service, workspace)
+        finally:
+            if args.workspace is None:
+                shutil.rmtree(workspace, ignore_errors=True)
+
+    if args.results:
+        with open(args.results, "w") as f:
+            json.dump(results, f)
+        return 0
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"metadata": metadata(args), "results": results}, f, indent=2)
+        print(f"\nSaved {len(results)} results to {args.save}")
+
+    regressions = 0
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
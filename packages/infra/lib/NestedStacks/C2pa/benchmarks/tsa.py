@@ -0,0 +1,232 @@
+"""
+Local RFC 3161 timestamp authority, standing in for a public or in-VPC
+TSA in benchmarks and tests. Run it on its own with
+
+    python tsa.py --port 3161 [--delay-ms 150] [--fail-rate 0.1]
+
+and point timestamp_authority_url at http://127.0.0.1:3161/.
+"""
+
+from cryptography.hazmat.primitives.asymmetric import rsa, padding
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.x509.oid import NameOID, ExtendedKeyUsageOID
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from asn1crypto import tsp, cms, x509 as asn1_x509
+from cryptography import x509
+
+import itertools
+import threading
+import argparse
+import datetime
+import hashlib
+import random
+import time
+
+# Arbitrary OID for the stand-in's timestamp policy
+POLICY_OID = "1.3.6.1.4.1.57264.3161.1"
+
+
+def _name(common_name):
+    return x509.Name(
+        [
+            x509.NameAttribute(NameOID.ORGANIZATION_NAME, "C2PA Benchmarks"),
+            x509.NameAttribute(NameOID.COMMON_NAME, common_name),
+        ]
+    )
+
+
+def tsa_material():
+    """
+    (private_key, [tsa_certificate, ca_certificate]) for a throwaway TSA
+    whose certificate carries the critical timeStamping extended key usage
+    """
+    now = datetime.datetime.now(datetime.timezone.utc)
+    validity = (now - datetime.timedelta(days=1), now + datetime.timedelta(days=30))
+
+    ca_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    ca_cert = (
+        x509.CertificateBuilder()
+        .subject_name(_name("C2PA Benchmarks TSA Root"))
+        .issuer_name(_name("C2PA Benchmarks TSA Root"))
+        .public_key(ca_key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(validity[0])
+        .not_valid_after(validity[1])
+        .add_extension(x509.BasicConstraints(ca=True, path_length=0), critical=True)
+        .add_extension(
+            x509.SubjectKeyIdentifier.from_public_key(ca_key.public_key()),
+            critical=False,
+        )
+        .sign(ca_key, hashes.SHA256())
+    )
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(_name("C2PA Benchmarks TSA"))
+        .issuer_name(ca_cert.subject)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(validity[0])
+        .not_valid_after(validity[1])
+        .add_extension(x509.BasicConstraints(ca=False, path_length=None), critical=True)
+        .add_extension(
+            x509.SubjectKeyIdentifier.from_public_key(key.public_key()),
+            critical=False,
+        )
+        .add_extension(
+            x509.AuthorityKeyIdentifier.from_issuer_public_key(ca_key.public_key()),
+            critical=False,
+        )
+        .add_extension(
+            x509.ExtendedKeyUsage([ExtendedKeyUsageOID.TIME_STAMPING]), critical=True
+        )
+        .sign(ca_key, hashes.SHA256())
+    )
+    return key, [cert, ca_cert]
+
+
+class TimestampSigner:
+    """
+    Answers DER TimeStampReqs with granted DER TimeStampResps: a TSTInfo
+    over the request's message imprint, signed as CMS SignedData with the
+    ESS signing-certificate-v2 attribute
+    """
+
+    def __init__(self, key=None, chain=None):
+        if key is None:
+            key, chain = tsa_material()
+        self._key = key
+        self._chain = [
+            asn1_x509.Certificate.load(cert.public_bytes(serialization.Encoding.DER))
+            for cert in chain
+        ]
+        self._serials = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def respond(self, query: bytes) -> bytes:
+        request = tsp.TimeStampReq.load(query)
+        with self._lock:
+            serial = next(self._serials)
+        tst_info = {
+            "version": "v1",
+            "policy": POLICY_OID,
+            "message_imprint": request["message_imprint"],
+            "serial_number": serial,
+            "gen_time": datetime.datetime.now(datetime.timezone.utc),
+            "accuracy": {"seconds": 1},
+        }
+        if request["nonce"].native is not None:
+            tst_info["nonce"] = request["nonce"]
+        tst_info = tsp.TSTInfo(tst_info)
+
+        certificate = self._chain[0]
+        signed_attrs = cms.CMSAttributes(
+            [
+                {"type": "content_type", "values": ["tst_info"]},
+                {
+                    "type": "message_digest",
+                    "values": [hashlib.sha256(tst_info.dump()).digest()],
+                },
+                {
+                    "type": "signing_certificate_v2",
+                    "values": [
+                        {
+                            "certs": [
+                                {
+                                    "cert_hash": hashlib.sha256(
+                                        certificate.dump()
+                                    ).digest()
+                                }
+                            ]
+                        }
+                    ],
+                },
+            ]
+        )
+        signature = self._key.sign(
+            signed_attrs.dump(), padding.PKCS1v15(), hashes.SHA256()
+        )
+        signed_data = {
+            "version": "v3",
+            "digest_algorithms": [{"algorithm": "sha256"}],
+            "encap_content_info": {"content_type": "tst_info", "content": tst_info},
+            "signer_infos": [
+                {
+                    "version": "v1",
+                    "sid": {
+                        "issuer_and_serial_number": {
+                            "issuer": certificate.issuer,
+                            "serial_number": certificate.serial_number,
+                        }
+                    },
+                    "digest_algorithm": {"algorithm": "sha256"},
+                    "signed_attrs": signed_attrs,
+                    "signature_algorithm": {"algorithm": "sha256_rsa"},
+                    "signature": signature,
+                }
+            ],
+        }
+        if request["cert_req"].native:
+            signed_data["certificates"] = self._chain
+        return tsp.TimeStampResp(
+            {
+                "status": {"status": "granted"},
+                "time_stamp_token": {
+                    "content_type": "signed_data",
+                    "content": cms.SignedData(signed_data),
+                },
+            }
+        ).dump()
+
+
+class _TsaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    signer = None
+    delay = 0.0
+    fail_rate = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        query = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        # Stands in for the network round trip to a remote TSA
+        if self.delay:
+            time.sleep(self.delay)
+        if self.fail_rate and random.random() < self.fail_rate:
+            self._reply(503, b"", "text/plain")
+            return
+        try:
+            reply = self.signer.respond(query)
+        except ValueError as e:
+            self._reply(400, str(e).encode(), "text/plain")
+            return
+        self._reply(200, reply, "application/timestamp-reply")
+
+
+def serve(port, delay=0.0, fail_rate=0.0, host="127.0.0.1"):
+    handler = type(
+        "TsaHandler",
+        (_TsaHandler,),
+        {"signer": TimestampSigner(), "delay": delay, "fail_rate": fail_rate},
+    )
+    ThreadingHTTPServer((host, port), handler).serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3161)
+    parser.add_argument("--delay-ms", type=float, default=0.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    print(f"Timestamp authority listening on http://{args.host}:{args.port}/")
+    serve(args.port, args.delay_ms / 1000, args.fail_rate, args.host)
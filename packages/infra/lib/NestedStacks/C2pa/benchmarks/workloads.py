@@ -0,0 +1,288 @@
+from concurrent.futures import ThreadPoolExecutor
+from environment import INPUT_BUCKET, ASSET_PREFIX
+
+import threading
+import resource
+import assets
+import shutil
+import math
+import time
+import os
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+class SkipWorkload(Exception):
+    """
+    Raised when a workload can't run here, e.g. ffmpeg or c2patool missing
+    """
+
+
+########################################################################
+############################# Measurement ##############################
+########################################################################
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile of values
+    """
+    ordered = sorted(values)
+    rank = max(1, math.ceil(fraction * len(ordered)))
+    return ordered[rank - 1]
+
+
+def _rss_bytes():
+    if psutil is not None:
+        process = psutil.Process()
+        total = process.memory_info().rss
+        # Signing and reading pools run in child processes
+        for child in process.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except psutil.NoSuchProcess:
+                pass
+        return total
+    # ru_maxrss is the lifetime peak (kB on Linux), the best we have
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class RssSampler:
+    """
+    Peak resident memory of this process and its children while the
+    sampler is active, polled every interval seconds
+    """
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.peak = _rss_bytes()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _rss_bytes())
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, _rss_bytes())
+
+
+def measure(service, requests, concurrency, warmup=1):
+    """
+    Send requests (a list of (path, body, input_bytes)) with concurrency
+    callers after warmup unmeasured ones, returning the statistics
+    """
+    for path, body, _ in requests[:warmup]:
+        service.call(path, body)
+    requests = requests[warmup:]
+
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def send(request):
+        path, body, _ = request
+        start = time.perf_counter()
+        status, response = service.call(path, body)
+        elapsed = time.perf_counter() - start
+        with lock:
+            if status >= 400:
+                errors.append(f"{status}: {response}")
+            else:
+                latencies.append(elapsed)
+
+    with RssSampler() as rss:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(send, requests))
+        wall = time.perf_counter() - start
+
+    input_bytes = sum(size for _, _, size in requests)
+    result = {
+        "requests": len(requests),
+        "errors": len(errors),
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(len(latencies) / wall, 3) if wall else 0.0,
+        "throughput_mbps": round(input_bytes / wall / 1e6, 3) if wall else 0.0,
+        "peak_rss_mb": round(rss.peak / 1e6, 1),
+    }
+    if latencies:
+        result.update(
+            {
+                "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+                "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+                "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+                "mean_ms": round(sum(latencies) / len(latencies) * 1000, 1),
+            }
+        )
+    if errors:
+        result["first_error"] = errors[0][:500]
+    return result
+
+
+########################################################################
+############################## Workloads ###############################
+########################################################################
+class Setup:
+    """
+    What the workloads share: the service, the origin, the S3 stand-in and
+    the assertions document
+    """
+
+    def __init__(self, service, origin, aws, source):
+        self.service = service
+        self.origin = origin
+        self.s3 = aws.client("s3")
+        self.source = source
+        self._assertions_url = None
+
+    def publish(self, name, path):
+        """
+        URL the service fetches the local file at path from: the origin, or
+        a presigned URL into the input bucket when source is s3
+        """
+        if self.source == "s3":
+            self.s3.upload_file(path, INPUT_BUCKET, name)
+            return self.s3.generate_presigned_url(
+                "get_object", Params={"Bucket": INPUT_BUCKET, "Key": name}
+            )
+        return self.origin.url_for(name)
+
+    @property
+    def assertions_url(self):
+        if self._assertions_url is None:
+            path = self.origin.path("assertions.json")
+            assets.write_json(path, assets.ASSERTIONS)
+            self._assertions_url = self.publish("assertions.json", path)
+        return self._assertions_url
+
+    def image(self, name, size, seed):
+        path = self.origin.path(name)
+        if not os.path.exists(path):
+            assets.write_image(path, size, seed)
+        return self.publish(name, path), os.path.getsize(path)
+
+
+def sign_file_requests(setup, count, offset, image_size, ingredients):
+    ingredient_urls = [
+        setup.image(f"{ASSET_PREFIX}ingredient-{index}.jpg", 512, 1000 + index)[0]
+        for index in range(ingredients)
+    ]
+    requests = []
+    for index in range(offset, offset + count):
+        url, size = setup.image(
+            f"{ASSET_PREFIX}image-{image_size}-{index}.jpg", image_size, index
+        )
+        body = {
+            "new_title": f"bench-{image_size}-{index}",
+            "asset_url": url,
+            "assertions_json_url": setup.assertions_url,
+        }
+        if ingredient_urls:
+            body["ingredients_url"] = ingredient_urls
+        requests.append(("/sign_file", body, size))
+    return requests
+
+
+def read_file_requests(setup, count, offset, image_size):
+    """
+    Signs count distinct images first, then reads each signed output once
+    """
+    requests = []
+    for path, body, size in sign_file_requests(setup, count, offset, image_size, 0):
+        status, response = setup.service.call(path, body)
+        if status >= 400:
+            raise RuntimeError(f"Signing the read_file inputs failed: {response}")
+        requests.append(
+            (
+                "/read_file",
+                {"asset_url": response["manifest"], "return_type": "json"},
+                size,
+            )
+        )
+    return requests
+
+
+def sign_fmp4_requests(setup, count, offset, seconds, segment_seconds, mode):
+    if not assets.ffmpeg_available():
+        raise SkipWorkload("ffmpeg is needed to encode the test video")
+    if shutil.which("c2patool") is None:
+        raise SkipWorkload("c2patool is not installed")
+
+    renditions = 3 if mode == "ladder" else 1
+    prefix = f"fmp4/{seconds}s-{segment_seconds}s-{renditions}r"
+    directory = setup.origin.path(prefix)
+    if not os.path.exists(os.path.join(directory, "manifest.mpd")):
+        assets.write_dash(directory, seconds, segment_seconds, renditions)
+        assets.write_json(os.path.join(directory, "c2pa.json"), assets.FMP4_MANIFEST)
+        for name in os.listdir(directory):
+            setup.s3.upload_file(
+                os.path.join(directory, name), INPUT_BUCKET, f"{prefix}/{name}"
+            )
+    media_bytes = sum(
+        os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory)
+    )
+    init = "init-0.mp4" if mode == "ladder" else "init.mp4"
+    pattern = "segment-*.m4s" if mode == "ladder" else "segment_*.m4s"
+
+    requests = []
+    for index in range(offset, offset + count):
+        body = {
+            "new_title": f"bench-{prefix.replace('/', '-')}-{mode}-{index}",
+            "init_file": f"s3://{INPUT_BUCKET}/{prefix}/{init}",
+            "fragments_pattern": f"s3://{INPUT_BUCKET}/{prefix}/{pattern}",
+            "manifest_file": f"s3://{INPUT_BUCKET}/{prefix}/c2pa.json",
+        }
+        if mode != "default":
+            body[mode] = True
+        requests.append(("/sign_fmp4", body, media_bytes))
+    return requests
+
+
+def configurations(args):
+    """
+    (workload, parameters) for every combination the arguments ask for
+    """
+    for workload in args.workloads:
+        if workload == "sign_file":
+            for image_size in args.image_sizes:
+                for ingredients in args.ingredients:
+                    yield workload, {
+                        "image_size": image_size,
+                        "ingredients": ingredients,
+                    }
+        elif workload == "read_file":
+            for image_size in args.image_sizes:
+                yield workload, {"image_size": image_size}
+        elif workload == "sign_fmp4":
+            for seconds in args.video_seconds:
+                for segment_seconds in args.segment_seconds:
+                    for mode in args.fmp4_modes:
+                        yield workload, {
+                            "seconds": seconds,
+                            "segment_seconds": segment_seconds,
+                            "mode": mode,
+                        }
+
+
+def build_requests(setup, workload, parameters, count, offset=0):
+    """
+    count requests for the workload. Requests with a different offset use
+    different assets, so one concurrency level doesn't warm the caches for
+    the next.
+    """
+    if workload == "sign_file":
+        return sign_file_requests(setup, count, offset, **parameters)
+    if workload == "read_file":
+        return read_file_requests(setup, count, offset, **parameters)
+    if workload == "sign_fmp4":
+        return sign_fmp4_requests(setup, count, offset, **parameters)
+    raise ValueError(f"Unknown workload {workload}")
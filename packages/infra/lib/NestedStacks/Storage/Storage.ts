@@ -92,6 +92,13 @@ export class Storage extends Construct {
       removalPolicy: cdk.RemovalPolicy.DESTROY,
       autoDeleteObjects: true,
       enforceSSL: true,
+      lifecycleRules: [
+        {
+          // Parts of streamed uploads that could not be aborted
+          enabled: true,
+          abortIncompleteMultipartUploadAfter: cdk.Duration.days(1),
+        },
+      ],
     });
 
     this.cpArtifactBucket = new s3.Bucket(